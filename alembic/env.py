@@ -16,7 +16,9 @@ config = context.config
 
 # Interpret the config file for Python logging.
 # This line sets up loggers basically.
-if config.config_file_name is not None:
+# Skipped when the application runs migrations in-process (app/migrations.py)
+# so that its own logging setup is kept.
+if config.config_file_name is not None and config.attributes.get("configure_logger", True):
     fileConfig(config.config_file_name)
 
 # add your model's MetaData object here
@@ -90,6 +92,14 @@ def run_migrations_online() -> None:
     and associate a connection with the context.
 
     """
+    # app/migrations.py passes in the connection that holds the migration lock
+    connection = config.attributes.get("connection")
+    if connection is not None:
+        context.configure(connection=connection, target_metadata=target_metadata)
+        with context.begin_transaction():
+            context.run_migrations()
+        return
+
     # Use DATABASE_URL environment variable if available
     database_url = os.getenv("DATABASE_URL")
     
@@ -0,0 +1,96 @@
+"""add authorization lookup indexes
+
+Revision ID: 3f9c2a7d5e14
+Revises: 6189e507aa73
+Create Date: 2026-10-19 09:12:44.318205
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3f9c2a7d5e14'
+down_revision: Union[str, Sequence[str], None] = '6189e507aa73'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def deduplicate_user_emails() -> None:
+    """Merge users that share an email into the oldest row (lowest user_id).
+
+    Group memberships of the duplicates are moved to the surviving user before
+    the duplicates are deleted, so nobody loses access.
+    """
+    bind = op.get_bind()
+    duplicates = bind.execute(sa.text("""
+        SELECT email, MIN(user_id) AS keep_id
+        FROM users
+        GROUP BY email
+        HAVING COUNT(*) > 1
+    """)).fetchall()
+
+    for row in duplicates:
+        extra_ids = [
+            r.user_id for r in bind.execute(
+                sa.text("SELECT user_id FROM users WHERE email = :email AND user_id <> :keep_id"),
+                {"email": row.email, "keep_id": row.keep_id},
+            )
+        ]
+        for user_id in extra_ids:
+            group_ids = [
+                r.user_group_id for r in bind.execute(
+                    sa.text("""
+                        SELECT m.user_group_id
+                        FROM user_group_members m
+                        WHERE m.user_id = :user_id
+                        AND NOT EXISTS (
+                            SELECT 1 FROM user_group_members k
+                            WHERE k.user_group_id = m.user_group_id AND k.user_id = :keep_id
+                        )
+                    """),
+                    {"user_id": user_id, "keep_id": row.keep_id},
+                )
+            ]
+            for group_id in group_ids:
+                bind.execute(
+                    sa.text("INSERT INTO user_group_members (user_group_id, user_id) VALUES (:group_id, :keep_id)"),
+                    {"group_id": group_id, "keep_id": row.keep_id},
+                )
+            bind.execute(sa.text("DELETE FROM user_group_members WHERE user_id = :user_id"), {"user_id": user_id})
+            bind.execute(sa.text("DELETE FROM users WHERE user_id = :user_id"), {"user_id": user_id})
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    deduplicate_user_emails()
+
+    # Authorization: user by email, application by host, group memberships by user
+    op.create_index('ix_users_email', 'users', ['email'], unique=True)
+    op.create_index('ix_applications_host', 'applications', ['host'], unique=False)
+    op.create_index('ix_user_group_members_user_id', 'user_group_members', ['user_id'], unique=False)
+    # Protected system groups and per-application URL groups
+    op.create_index('ix_url_groups_name_protected', 'url_groups', ['name', 'protected'], unique=False)
+    op.create_index('ix_url_groups_app_id', 'url_groups', ['app_id'], unique=False)
+    # Admin lookups: URLs of a group, user groups linked to a URL group.
+    # urls.path is already the leading column of uq_url_path_per_group.
+    op.create_index('ix_urls_url_group_id', 'urls', ['url_group_id'], unique=False)
+    op.create_index(
+        'ix_user_group_url_group_associations_url_group_id',
+        'user_group_url_group_associations',
+        ['url_group_id'],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_user_group_url_group_associations_url_group_id', table_name='user_group_url_group_associations')
+    op.drop_index('ix_urls_url_group_id', table_name='urls')
+    op.drop_index('ix_url_groups_app_id', table_name='url_groups')
+    op.drop_index('ix_url_groups_name_protected', table_name='url_groups')
+    op.drop_index('ix_user_group_members_user_id', table_name='user_group_members')
+    op.drop_index('ix_applications_host', table_name='applications')
+    op.drop_index('ix_users_email', table_name='users')
@@ -0,0 +1,33 @@
+"""add policy state table
+
+Revision ID: 5d2e8f1a9c47
+Revises: 9b41d2c7a8f3
+Create Date: 2026-10-19 16:41:03.218744
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5d2e8f1a9c47'
+down_revision: Union[str, Sequence[str], None] = '9b41d2c7a8f3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    policy_state = op.create_table('policy_state',
+    sa.Column('id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('version', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.bulk_insert(policy_state, [{'id': 1, 'version': 0}])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('policy_state')
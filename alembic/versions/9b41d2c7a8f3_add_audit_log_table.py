@@ -0,0 +1,40 @@
+"""add audit log table
+
+Revision ID: 9b41d2c7a8f3
+Revises: 3f9c2a7d5e14
+Create Date: 2026-10-19 14:02:17.552904
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9b41d2c7a8f3'
+down_revision: Union[str, Sequence[str], None] = '3f9c2a7d5e14'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('audit_log',
+    sa.Column('audit_id', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('decided_at', sa.DateTime(), nullable=False),
+    sa.Column('user', sa.String(length=255), nullable=False),
+    sa.Column('host', sa.String(length=255), nullable=False),
+    sa.Column('path', sa.String(length=2048), nullable=False),
+    sa.Column('allowed', sa.Integer(), nullable=False),
+    sa.Column('rule', sa.String(length=32), nullable=False),
+    sa.Column('app', sa.String(length=255), nullable=False),
+    sa.PrimaryKeyConstraint('audit_id')
+    )
+    op.create_index(op.f('ix_audit_log_decided_at'), 'audit_log', ['decided_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_audit_log_decided_at'), table_name='audit_log')
+    op.drop_table('audit_log')
@@ -1,6 +1,27 @@
-from .auth import router as auth_router
-from .user_groups import router as user_groups_router
-from .url_groups import router as url_groups_router
-from .associations import router as associations_router
-from .authorize import router as authorize_router
-from .applications import router as applications_router
+"""
+API routers. Each one is imported on first access, so that importing a single
+endpoint module (as the slim decision node does) does not import them all.
+"""
+import importlib
+
+_ROUTER_MODULES = {
+    "auth_router": "auth",
+    "user_groups_router": "user_groups",
+    "url_groups_router": "url_groups",
+    "associations_router": "associations",
+    "authorize_router": "authorize",
+    "applications_router": "applications",
+    "metrics_router": "metrics",
+    "policy_router": "policy",
+    "users_router": "users",
+    "health_router": "health",
+    "oauth_router": "oauth",
+}
+
+__all__ = list(_ROUTER_MODULES)
+
+def __getattr__(name):
+    module = _ROUTER_MODULES.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    return importlib.import_module(f".{module}", __name__).router
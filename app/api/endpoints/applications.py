@@ -1,8 +1,9 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
 from sqlalchemy.ext.asyncio import AsyncSession
-from app.db import get_async_session
-from app import schemas, crud
-from typing import List
+from app.db import get_async_session, get_read_session
+from app import schemas, crud, bulk
+from typing import List, Optional
+import json
 
 router = APIRouter(tags=["applications"])
 
@@ -48,7 +49,7 @@ async def create_application(
         )
 
 @router.get("/api/applications", response_model=List[schemas.ApplicationRead])
-async def list_applications(session: AsyncSession = Depends(get_async_session)):
+async def list_applications(session: AsyncSession = Depends(get_read_session)):
     """List all applications."""
     applications = await crud.get_all_applications(session)
     return [
@@ -65,7 +66,7 @@ async def list_applications(session: AsyncSession = Depends(get_async_session)):
 @router.get("/api/applications/{app_id}", response_model=schemas.ApplicationRead)
 async def get_application(
     app_id: int,
-    session: AsyncSession = Depends(get_async_session)
+    session: AsyncSession = Depends(get_read_session)
 ):
     """Get a specific application by ID."""
     app = await crud.get_application(session, app_id)
@@ -142,7 +143,7 @@ async def delete_application(
     return {"message": "Application deleted successfully"}
 
 @router.get("/api/applications/{app_id}/url-groups", response_model=List[schemas.UrlGroupRead])
-async def get_application_url_groups(app_id: int, session: AsyncSession = Depends(get_async_session)):
+async def get_application_url_groups(app_id: int, session: AsyncSession = Depends(get_read_session)):
     """Get all URL groups for a specific application."""
     # Verify application exists
     application = await crud.get_application(session, app_id)
@@ -163,4 +164,44 @@ async def get_application_url_groups(app_id: int, session: AsyncSession = Depend
             urls=None
         )
         for group in url_groups
-    ] 
\ No newline at end of file
+    ]
+
+@router.post("/api/applications/{app_id}/urls/import", response_model=schemas.UrlImportReport)
+async def import_application_urls(
+    app_id: int,
+    request: Request,
+    rule: List[str] = Query([], description="tag:<tag>=<group> or prefix:<prefix>=<group>; the first matching rule wins"),
+    default_group: Optional[str] = Query(None, description="URL group for paths that match no rule"),
+    format: Optional[str] = Query(None, pattern="^(paths|ndjson|openapi)$", description="Defaults from the Content-Type header"),
+    session: AsyncSession = Depends(get_async_session),
+):
+    """Register many paths of an application at once, from a path list, NDJSON or an OpenAPI document."""
+    application = await crud.get_application(session, app_id)
+    if not application:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Application with ID {app_id} not found"
+        )
+    try:
+        rules = [bulk.UrlRule.parse(spec) for spec in rule]
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    if not rules and not default_group:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="At least one rule or a default_group is required")
+
+    content_type = request.headers.get("content-type", "")
+    if format is None:
+        format = "ndjson" if "ndjson" in content_type else "openapi" if "json" in content_type else "paths"
+    if format == "openapi":
+        # An OpenAPI document has to be parsed whole; path lists are streamed
+        try:
+            entries = list(bulk.openapi_paths(json.loads(await request.body())))
+        except ValueError as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Invalid OpenAPI document: {e}")
+    else:
+        entries = bulk.iter_path_entries(bulk.iter_lines(request.stream()), format)
+
+    try:
+        return await bulk.import_urls(session, app_id, entries, rules, default_group)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
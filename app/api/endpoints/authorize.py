@@ -1,24 +1,56 @@
 from fastapi import APIRouter, Depends, Query, Cookie, HTTPException, Response
 from sqlalchemy.ext.asyncio import AsyncSession
-from app.db import get_async_session
+from app.db import get_read_session
 from app import schemas, crud
+from app.querystats import query_budget
+from app.admission import authorize_admission, AdmissionRejected, AUTHORIZE_SHED_MODE
+from app.breaker import DecisionUnavailable
+from app.decisionlog import SHED, UNAVAILABLE
 from sqlalchemy import select
 from app.models import UrlGroup, Url
+import logging
+
+from app.utils import SanitizedLogger
+logger = SanitizedLogger(logging.getLogger(__name__))
 
 router = APIRouter(tags=["authorize"])
 
+def shed_decision(url: str) -> bool:
+    """Decide a shed request from memory only, without touching the database."""
+    if AUTHORIZE_SHED_MODE == "fail-open-public":
+        return crud.is_known_public_url(url)
+    # Web assets never need the database, so they are allowed even when failing closed
+    scheme, host, path = crud.parse_full_url(url)
+    return crud.is_web_asset(path)
+
 @router.get("/api/authorize", response_model=schemas.AuthorizeResponse)
+@query_budget(1)
 async def authorize(
     url: str = Query(..., alias="url"),
     x_auth_email: str = Cookie(None, alias="x-auth-email"),
-    session: AsyncSession = Depends(get_async_session),
+    session: AsyncSession = Depends(get_read_session),
     response: Response = None,
 ):
-    # Use the new full URL authorization function
-    allowed = await crud.is_user_allowed_full_url(session, x_auth_email, url)
-    
+    try:
+        async with authorize_admission.slot():
+            # Use the new full URL authorization function
+            allowed = await crud.is_user_allowed_full_url(session, x_auth_email, url)
+    except (AdmissionRejected, DecisionUnavailable) as e:
+        allowed = shed_decision(url)
+        if isinstance(e, AdmissionRejected):
+            logger.warning("Authorize request shed (%s), answering allowed=%s for '%s'", e.reason, allowed, url)
+            rule = SHED
+        else:
+            logger.warning("Database unavailable (%s), answering allowed=%s for '%s'", e.reason, allowed, url)
+            rule = UNAVAILABLE
+        crud.record_decision_from_memory(x_auth_email, url, allowed, rule)
+        if not allowed:
+            response.status_code = 503
+            response.headers["Retry-After"] = "1"
+            return schemas.AuthorizeResponse(allowed=False)
+
     if allowed:
         response.status_code = 200
     else:
         response.status_code = 403
-    return schemas.AuthorizeResponse(allowed=allowed) 
\ No newline at end of file
+    return schemas.AuthorizeResponse(allowed=allowed)
@@ -0,0 +1,16 @@
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+from app.startup import readiness
+
+router = APIRouter(tags=["health"])
+
+@router.get("/healthz")
+async def healthz():
+    """Liveness: the process is up and serving. Touches no dependencies."""
+    return {"status": "ok"}
+
+@router.get("/readyz")
+async def readyz():
+    """Readiness: 200 once startup warm-up has finished, 503 until then."""
+    snapshot = readiness.snapshot()
+    return JSONResponse(snapshot, status_code=200 if snapshot["ready"] else 503)
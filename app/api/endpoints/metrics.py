@@ -0,0 +1,29 @@
+from fastapi import APIRouter
+from app import crud
+from app.admission import authorize_admission
+from app.audit import audit_log
+from app.breaker import authorize_breaker
+from app.decisionlog import decision_log
+from app.db import get_pool_status
+from app import logpipeline
+from app.policy import get_policy_version
+from app.stats import stats_cache
+
+router = APIRouter(tags=["metrics"])
+
+@router.get("/api/metrics")
+async def metrics():
+    """Runtime counters for the authorization path."""
+    return {
+        "admission": authorize_admission.stats(),
+        "audit": audit_log.stats(),
+        "breaker": authorize_breaker.stats(),
+        "db_pool": get_pool_status(),
+        "decisions": decision_log.stats(),
+        "logging": logpipeline.log_pipeline.stats() if logpipeline.log_pipeline else None,
+        "policy_version": get_policy_version(),
+        "singleflight": {
+            "authorize": crud.authorize_flight.stats(),
+        },
+        "stats_cache": stats_cache.stats(),
+    }
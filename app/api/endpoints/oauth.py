@@ -0,0 +1,195 @@
+"""
+OAuth2 login, callback and logout, and the JWKS cache.
+
+Served by both the full application and the slim decision node
+(app/decision.py). ``requests`` and ``jose`` are imported on first use so that
+importing this module stays cheap, and calls to the identity provider share one
+connection-pooling session.
+"""
+import logging
+import os
+import time
+from urllib.parse import urlencode, quote, unquote, urlparse
+
+from fastapi import APIRouter, Cookie, HTTPException, Request
+from fastapi.responses import HTMLResponse, RedirectResponse
+
+from app.utils import SanitizedLogger, sanitize_url, sanitize_email
+
+logger = SanitizedLogger(logging.getLogger("authfilter"))
+
+router = APIRouter(tags=["oauth"])
+
+OAUTH2_CLIENT_ID = os.getenv("OAUTH2_CLIENT_ID", "your-client-id")
+OAUTH2_CLIENT_SECRET = os.getenv("OAUTH2_CLIENT_SECRET", "your-client-secret")
+OAUTH2_AUTH_URL = os.getenv("OAUTH2_AUTH_URL", "https://example.com/oauth2/v2/auth")
+OAUTH2_TOKEN_URL = os.getenv("OAUTH2_TOKEN_URL", "https://example.com/oauth2/token")
+OAUTH2_JWKS_URL = os.getenv("OAUTH2_JWKS_URL", "https://example.com/.well-known/jwks.json")
+OAUTH2_AUDIENCE = os.getenv("OAUTH2_AUDIENCE", OAUTH2_CLIENT_ID)
+OAUTH2_ISSUER = os.getenv("OAUTH2_ISSUER", "https://example.com")
+COOKIE_NAME = os.getenv("OAUTH2_COOKIE_NAME", "auth_token")
+REDIRECT_URI = os.getenv("OAUTH2_REDIRECT_URI", "http://localhost:8000/auth/callback")
+OAUTH2_SCOPE = os.getenv("OAUTH2_SCOPE", "openid email profile")
+
+# One pooled HTTP session for the identity provider, created on first use
+_http = None
+
+def http_session():
+    global _http
+    if _http is None:
+        import requests
+        _http = requests.Session()
+    return _http
+
+def close_http_session():
+    global _http
+    if _http is not None:
+        _http.close()
+        _http = None
+
+# Helper to fetch and cache JWKS
+_jwks_cache = None
+_jwks_cache_time = 0
+_JWKS_CACHE_TTL = 3600
+
+def get_jwks():
+    global _jwks_cache, _jwks_cache_time
+    now = time.time()
+    if _jwks_cache and (now - _jwks_cache_time) < _JWKS_CACHE_TTL:
+        return _jwks_cache
+    resp = http_session().get(OAUTH2_JWKS_URL)
+    resp.raise_for_status()
+    _jwks_cache = resp.json()
+    _jwks_cache_time = now
+    return _jwks_cache
+
+async def get_current_user_from_cookie(auth_token: str = Cookie(None)):
+    from jose import jwt, JWTError
+    if not auth_token:
+        raise HTTPException(status_code=401, detail="Not authenticated")
+    jwks = get_jwks()
+    try:
+        payload = jwt.decode(
+            auth_token,
+            jwks,
+            algorithms=["RS256"],
+            audience=OAUTH2_AUDIENCE,
+            issuer=OAUTH2_ISSUER,
+            options={"verify_at_hash": False}
+        )
+        return payload
+    except JWTError as e:
+        raise HTTPException(status_code=401, detail="Invalid token")
+
+def is_safe_next_path(url: str) -> bool:
+    return url.startswith("/") or url.startswith("http://") or url.startswith("https://")
+
+@router.get("/auth/login")
+def auth_login(request: Request):
+    next_path = request.query_params.get("next", "/")
+    logger.debug("/auth/login: received next param: %s", next_path)
+    if not is_safe_next_path(next_path):
+        logger.debug("/auth/login: next_path '%s' is not safe, defaulting to '/'", next_path)
+        next_path = "/"
+    else:
+        logger.debug("/auth/login: using next_path: %s", next_path)
+    params = {
+        "client_id": OAUTH2_CLIENT_ID,
+        "response_type": "code",
+        "scope": OAUTH2_SCOPE,
+        "redirect_uri": REDIRECT_URI,
+        "access_type": "offline",
+        "prompt": "consent",
+        "state": quote(next_path),
+    }
+    url = f"{OAUTH2_AUTH_URL}?{urlencode(params)}"
+    logger.debug("/auth/login: redirecting to OAuth2 URL: %s", sanitize_url(url, ['code', 'state']))
+    return RedirectResponse(url)
+
+@router.get("/auth/callback")
+def auth_callback(request: Request):
+    code = request.query_params.get("code")
+    state = request.query_params.get("state", "%2F")
+    next_path = unquote(unquote(state))
+    logger.debug("/auth/callback: received state param: ***, decoded next_path: %s", next_path)
+    if not is_safe_next_path(next_path):
+        logger.debug("/auth/callback: next_path '%s' is not safe, defaulting to '/'", next_path)
+        next_path = "/"
+    else:
+        logger.debug("/auth/callback: using next_path: %s", next_path)
+    if not code:
+        logger.error("/auth/callback: Missing code parameter")
+        return HTMLResponse("Missing code", status_code=400)
+    data = {
+        "code": code,
+        "client_id": OAUTH2_CLIENT_ID,
+        "client_secret": OAUTH2_CLIENT_SECRET,
+        "redirect_uri": REDIRECT_URI,
+        "grant_type": "authorization_code",
+    }
+    from jose import jwt
+    logger.debug("/auth/callback: exchanging code for token at %s", sanitize_url(OAUTH2_TOKEN_URL))
+    token_resp = http_session().post(OAUTH2_TOKEN_URL, data=data)
+    if not token_resp.ok:
+        logger.error("/auth/callback: OAuth2 token exchange error: ***")
+        return HTMLResponse("Token exchange failed", status_code=400)
+    token_data = token_resp.json()
+    id_token = token_data.get("id_token")
+    if not id_token:
+        logger.error("/auth/callback: No id_token in token response")
+        return HTMLResponse("No id_token", status_code=400)
+    # Extract email from id_token
+    try:
+        jwks = get_jwks()
+        payload = jwt.decode(
+            id_token,
+            jwks,
+            algorithms=["RS256"],
+            audience=OAUTH2_AUDIENCE,
+            issuer=OAUTH2_ISSUER,
+            options={"verify_at_hash": False}
+        )
+        email = payload.get("email")
+        if not email:
+            logger.error("/auth/callback: No email in token payload")
+            return HTMLResponse("No email in token", status_code=400)
+        logger.debug("/auth/callback: extracted email: %s", sanitize_email(email))
+    except Exception as e:
+        logger.error("/auth/callback: Token decode error: ***")
+        return HTMLResponse("Token decode error", status_code=400)
+    # Determine cookie domain
+    cookie_domain = None
+    if next_path.startswith("http://") or next_path.startswith("https://"):
+        parsed = urlparse(next_path)
+        cookie_domain = parsed.hostname
+        logger.debug("/auth/callback: setting cookie domain to %s", cookie_domain)
+    # Set cookies and redirect to next_path
+    response = RedirectResponse(url=next_path)
+    APP_ENV = os.getenv("APP_ENV", "development")
+    COOKIE_SECURE = APP_ENV == "production"
+    response.set_cookie(
+        COOKIE_NAME,
+        id_token,
+        httponly=True,
+        secure=COOKIE_SECURE,
+        samesite="lax",
+        max_age=3600,
+        domain=cookie_domain
+    )
+    response.set_cookie(
+        "x-auth-email",
+        email,
+        httponly=True,
+        secure=COOKIE_SECURE,
+        samesite="lax",
+        max_age=3600,
+        domain=cookie_domain
+    )
+    logger.debug("/auth/callback: set cookies and redirecting to: %s", next_path)
+    return response
+
+@router.get("/logout")
+def logout():
+    response = RedirectResponse(url="/")
+    response.delete_cookie(COOKIE_NAME)
+    return response
@@ -0,0 +1,24 @@
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.db import get_async_session, get_read_session
+from app import schemas, backup, bulk
+
+router = APIRouter(prefix="/api/policy", tags=["policy"])
+
+@router.get("/export")
+async def export_policy(session: AsyncSession = Depends(get_read_session)):
+    """Stream the whole policy (applications, groups, users, URLs, memberships, associations) as NDJSON."""
+    return StreamingResponse(
+        backup.export_policy(session.bind),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": 'attachment; filename="authfilter-policy.ndjson"'},
+    )
+
+@router.post("/import", response_model=schemas.PolicyImportReport)
+async def import_policy(request: Request, session: AsyncSession = Depends(get_async_session)):
+    """Replay a policy export. Rows that already exist are kept as they are."""
+    try:
+        return await backup.import_policy(session, bulk.iter_lines(request.stream()))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
@@ -1,6 +1,6 @@
 from fastapi import APIRouter, Depends, HTTPException, Path, Query
 from sqlalchemy.ext.asyncio import AsyncSession
-from app.db import get_async_session
+from app.db import get_async_session, get_read_session
 from app import schemas, crud
 from typing import List, Optional
 
@@ -39,7 +39,7 @@ async def create_url_group(
 @router.get("", response_model=List[schemas.UrlGroupRead])
 async def list_url_groups(
     app_id: Optional[int] = Query(None, description="Filter by application ID"),
-    session: AsyncSession = Depends(get_async_session),
+    session: AsyncSession = Depends(get_read_session),
 ):
     """List URL groups, optionally filtered by application."""
     if app_id:
@@ -67,7 +67,7 @@ async def list_url_groups(
 @router.get("/{group_id}", response_model=schemas.UrlGroupRead)
 async def get_url_group(
     group_id: int = Path(..., description="URL group ID"),
-    session: AsyncSession = Depends(get_async_session),
+    session: AsyncSession = Depends(get_read_session),
 ):
     """Get a specific URL group by ID."""
     db_group = await crud.get_url_group(session, group_id)
@@ -1,7 +1,8 @@
-from fastapi import APIRouter, Depends, HTTPException, Path
+from fastapi import APIRouter, Depends, HTTPException, Path, Query, Request
 from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Optional
 from app.db import get_async_session
-from app import schemas, crud
+from app import schemas, crud, bulk
 
 router = APIRouter(prefix="/api/user-groups", tags=["user-groups"])
 
@@ -34,4 +35,27 @@ async def add_user_to_group(
     if not db_user:
         db_user = await crud.create_user(session, user.email)
     await crud.add_user_to_group(session, group_id, user.email)
-    return schemas.SuccessResponse(success=True) 
\ No newline at end of file
+    return schemas.SuccessResponse(success=True)
+
+@router.put("/{group_id}/members", response_model=schemas.MembershipSyncReport)
+async def set_group_members(
+    sync: schemas.MembershipSync,
+    group_id: int = Path(..., description="User group ID"),
+    dry_run: bool = Query(False, description="Only report the difference"),
+    session: AsyncSession = Depends(get_async_session),
+):
+    """Replace the group's members with the given list of emails, writing only the difference."""
+    db_group = await crud.get_user_group(session, group_id)
+    if not db_group:
+        raise HTTPException(status_code=404, detail="User group not found")
+    return await bulk.sync_group_members(session, group_id, sync.emails, dry_run=dry_run)
+
+@router.post("/import", response_model=schemas.BulkImportReport)
+async def import_memberships(
+    request: Request,
+    format: Optional[str] = Query(None, pattern="^(csv|ndjson)$", description="Defaults from the Content-Type header"),
+    session: AsyncSession = Depends(get_async_session),
+):
+    """Stream CSV (email,group) or NDJSON rows and upsert users and group memberships."""
+    fmt = format or bulk.detect_format(request.headers.get("content-type"))
+    return await bulk.import_memberships(session, bulk.iter_lines(request.stream()), fmt)
@@ -0,0 +1,14 @@
+from fastapi import APIRouter, Depends
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.db import get_async_session
+from app import schemas, bulk
+
+router = APIRouter(prefix="/api/users", tags=["users"])
+
+@router.post("/offboard", response_model=schemas.OffboardReport)
+async def offboard_users(
+    offboard: schemas.OffboardRequest,
+    session: AsyncSession = Depends(get_async_session),
+):
+    """Remove users from every group (optionally deleting them); takes effect immediately."""
+    return await bulk.offboard_users(session, offboard.emails, delete_users=offboard.delete_users)
@@ -0,0 +1,290 @@
+"""
+Append-only audit log of authorization decisions.
+
+``audit_log.record()`` only appends the decision to an in-memory buffer, so it
+adds no I/O to ``/api/authorize``. A background task flushes the buffer every
+``AUDIT_FLUSH_INTERVAL`` seconds, or as soon as ``AUDIT_BATCH_SIZE`` records are
+waiting, in batches of at most ``AUDIT_BATCH_SIZE``:
+
+- ``AUDIT_SINK=file`` appends each batch as one gzip member to NDJSON files in
+  ``AUDIT_DIR``, starting a new file once the current one reaches
+  ``AUDIT_ROTATE_BYTES`` (compressed)
+- ``AUDIT_SINK=db`` writes each batch to the ``audit_log`` table with one
+  multi-row INSERT
+- ``AUDIT_SINK=off`` (default) records nothing
+
+The buffer holds at most ``AUDIT_BUFFER_SIZE`` records. When it is full, new
+decisions are dropped and counted rather than slowing authorization down. A
+batch stays in the buffer until the sink has written it, so a failed flush is
+retried on the next one. The buffer is flushed on shutdown.
+
+Outages (connection loss, timeouts, a full disk) are retried for as long as
+they last. Any other error means the sink rejects something in the batch:
+after ``AUDIT_MAX_ATTEMPTS`` failures in a row the batch is split in halves
+until the rejected records are isolated. Those records are appended to
+``rejected.ndjson`` in ``AUDIT_DIR`` with the error, so one bad record cannot
+stop the records behind it from being written.
+"""
+import asyncio
+import gzip
+import itertools
+import json
+import logging
+import os
+import time
+from collections import deque
+from datetime import datetime, timezone
+from typing import Awaitable, Callable, Deque, List, Optional
+
+from sqlalchemy import insert
+
+from app.breaker import is_database_failure
+from app.decisionlog import Decision
+from app.models import AuditEvent
+from app.utils import SanitizedLogger, sanitize_email
+
+logger = SanitizedLogger(logging.getLogger(__name__))
+
+AUDIT_SINK = os.getenv("AUDIT_SINK", "off").strip().lower()
+AUDIT_DIR = os.getenv("AUDIT_DIR", "audit")
+AUDIT_BUFFER_SIZE = int(os.getenv("AUDIT_BUFFER_SIZE", "10000"))
+AUDIT_BATCH_SIZE = int(os.getenv("AUDIT_BATCH_SIZE", "500"))
+AUDIT_FLUSH_INTERVAL = float(os.getenv("AUDIT_FLUSH_INTERVAL", "1"))
+AUDIT_ROTATE_BYTES = int(os.getenv("AUDIT_ROTATE_BYTES", str(64 * 1024 * 1024)))
+AUDIT_MAX_ATTEMPTS = int(os.getenv("AUDIT_MAX_ATTEMPTS", "3"))
+
+# Column widths of the audit_log table
+MAX_NAME_LENGTH = 255
+MAX_PATH_LENGTH = 2048
+
+Sink = Callable[[List[dict]], Awaitable[None]]
+
+def to_json(record: dict) -> str:
+    return json.dumps({**record, "ts": record["ts"].isoformat(timespec="milliseconds")}, separators=(",", ":"))
+
+class FileSink:
+    """Gzip-compressed NDJSON files, one gzip member per batch, rotated by size."""
+
+    name = "file"
+
+    def __init__(self, directory: str, rotate_bytes: int):
+        self.directory = directory
+        self.rotate_bytes = rotate_bytes
+        self.path: Optional[str] = None
+        self._sequence = 0
+
+    async def __call__(self, records: List[dict]) -> None:
+        await asyncio.to_thread(self.write, records)
+
+    def write(self, records: List[dict]) -> None:
+        if self.path is None or os.path.getsize(self.path) >= self.rotate_bytes:
+            self.path = self._next_path()
+        data = "".join(to_json(record) + "\n" for record in records).encode()
+        with open(self.path, "ab") as raw:
+            with gzip.GzipFile(fileobj=raw, mode="wb") as compressed:
+                compressed.write(data)
+            raw.flush()
+            os.fsync(raw.fileno())
+
+    def _next_path(self) -> str:
+        os.makedirs(self.directory, exist_ok=True)
+        self._sequence += 1
+        stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S")
+        return os.path.join(self.directory, f"audit-{stamp}-{os.getpid()}-{self._sequence}.ndjson.gz")
+
+class DatabaseSink:
+    """The ``audit_log`` table. Uses a Core connection, so audit writes do not bump the policy version."""
+
+    name = "db"
+
+    def __init__(self, get_engine: Optional[Callable] = None):
+        self.get_engine = get_engine or _primary_engine
+
+    async def __call__(self, records: List[dict]) -> None:
+        rows = [
+            {
+                "decided_at": record["ts"].replace(tzinfo=None),
+                "user": record["user"],
+                "host": record["host"],
+                "path": record["path"],
+                "allowed": int(record["allowed"]),
+                "rule": record["rule"],
+                "app": record["app"],
+            }
+            for record in records
+        ]
+        async with self.get_engine().begin() as conn:
+            await conn.execute(insert(AuditEvent.__table__).values(rows))
+
+def _primary_engine():
+    from app.db import get_engine
+    return get_engine()
+
+def make_sink(kind: str) -> Optional[Sink]:
+    if kind == "off":
+        return None
+    if kind == "file":
+        return FileSink(AUDIT_DIR, AUDIT_ROTATE_BYTES)
+    if kind == "db":
+        return DatabaseSink()
+    raise ValueError(f"AUDIT_SINK must be 'off', 'file' or 'db', not '{kind}'")
+
+class AuditLog:
+    def __init__(
+        self,
+        sink: Optional[Sink],
+        capacity: int,
+        batch_size: int,
+        flush_interval: float,
+        max_attempts: int = AUDIT_MAX_ATTEMPTS,
+        rejected_path: Optional[str] = None,
+    ):
+        self.sink = sink
+        self.capacity = capacity
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_attempts = max_attempts
+        self.rejected_path = rejected_path or os.path.join(AUDIT_DIR, "rejected.ndjson")
+        self._attempts = 0
+        self._buffer: Deque[dict] = deque()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._closing = False
+        self.recorded = 0
+        self.written = 0
+        self.dropped = 0
+        self.flushes = 0
+        self.flush_errors = 0
+        self.rejected = 0
+        self.last_flush_ms = 0.0
+
+    def record(self, decision: Decision, email: str, host: str, path: str) -> None:
+        if self.sink is None:
+            return
+        if len(self._buffer) >= self.capacity:
+            self.dropped += 1
+            return
+        self._buffer.append({
+            "ts": datetime.now(timezone.utc),
+            "user": (sanitize_email(email) or "")[:MAX_NAME_LENGTH],
+            # Never keep credentials from a user:password@host URL
+            "host": (host or "").rpartition("@")[2][:MAX_NAME_LENGTH],
+            "path": path[:MAX_PATH_LENGTH],
+            "allowed": decision.allowed,
+            "rule": decision.rule,
+            "app": decision.app[:MAX_NAME_LENGTH],
+        })
+        self.recorded += 1
+        if len(self._buffer) >= self.batch_size and self._wakeup is not None:
+            self._wakeup.set()
+
+    def start(self) -> None:
+        """Start the background flusher on the running event loop."""
+        if self.sink is None or self._task is not None:
+            return
+        self._closing = False
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+        logger.info("Audit log writing to the %s sink", self.sink.name)
+
+    async def _run(self) -> None:
+        while not self._closing:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+
+    async def flush(self) -> int:
+        """Write everything buffered, batch by batch. Returns the number of records written."""
+        written = 0
+        while self._buffer and self.sink is not None:
+            batch = list(itertools.islice(self._buffer, self.batch_size))
+            started = time.perf_counter()
+            try:
+                await self.sink(batch)
+                accepted = len(batch)
+            except Exception as e:
+                self.flush_errors += 1
+                self._attempts += 1
+                logger.error("Audit flush of %s records failed, %s buffered: %s", len(batch), len(self._buffer), e)
+                if is_database_failure(e) or self._attempts < self.max_attempts:
+                    break
+                try:
+                    accepted = await self._isolate_rejected(batch, e)
+                except Exception as outage:
+                    logger.error("Audit flush interrupted while isolating rejected records: %s", outage)
+                    break
+            self._attempts = 0
+            # Records appended during the write are behind the batch
+            for _ in batch:
+                self._buffer.popleft()
+            self.last_flush_ms = round((time.perf_counter() - started) * 1000, 1)
+            self.flushes += 1
+            self.written += accepted
+            written += accepted
+        return written
+
+    async def _isolate_rejected(self, records: List[dict], error: Exception) -> int:
+        """Write a batch the sink rejected in halves, setting aside the records it
+        still rejects on their own. Returns the number written.
+
+        An outage during the search is raised, and the whole batch retried later.
+        """
+        if len(records) == 1:
+            await asyncio.to_thread(self._write_rejected, records[0], error)
+            return 0
+        middle = len(records) // 2
+        written = 0
+        for half in (records[:middle], records[middle:]):
+            try:
+                await self.sink(half)
+            except Exception as e:
+                if is_database_failure(e):
+                    raise
+                written += await self._isolate_rejected(half, e)
+            else:
+                written += len(half)
+        return written
+
+    def _write_rejected(self, record: dict, error: Exception) -> None:
+        self.rejected += 1
+        line = to_json({**record, "error": (str(error).splitlines() or [type(error).__name__])[0]})
+        try:
+            os.makedirs(os.path.dirname(self.rejected_path) or ".", exist_ok=True)
+            with open(self.rejected_path, "a") as f:
+                f.write(line + "\n")
+        except OSError as e:
+            logger.error("Could not set aside rejected audit record: %s", e)
+
+    async def close(self) -> None:
+        """Stop the background flusher and write what is left."""
+        if self._task is not None:
+            # Let the flusher finish its last pass rather than cancelling it
+            # mid-write, which could write a batch twice
+            self._closing = True
+            self._wakeup.set()
+            await self._task
+            self._task = None
+        await self.flush()
+        if self.sink is not None:
+            logger.info("Audit log closed: %s records written, %s unwritten, %s dropped", self.written, len(self._buffer), self.dropped)
+
+    def stats(self) -> dict:
+        oldest = self._buffer[0]["ts"] if self._buffer else None
+        return {
+            "sink": self.sink.name if self.sink is not None else "off",
+            "buffered": len(self._buffer),
+            "capacity": self.capacity,
+            "oldest_seconds": round((datetime.now(timezone.utc) - oldest).total_seconds(), 3) if oldest else 0,
+            "recorded": self.recorded,
+            "written": self.written,
+            "dropped": self.dropped,
+            "flushes": self.flushes,
+            "flush_errors": self.flush_errors,
+            "rejected": self.rejected,
+            "last_flush_ms": self.last_flush_ms,
+        }
+
+audit_log = AuditLog(make_sink(AUDIT_SINK), AUDIT_BUFFER_SIZE, AUDIT_BATCH_SIZE, AUDIT_FLUSH_INTERVAL)
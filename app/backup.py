@@ -0,0 +1,334 @@
+"""
+Full-policy export and restore as NDJSON.
+
+The export pages through every table with keyset pagination and writes one
+record per line. Records refer to each other by natural keys (application host,
+group names, user email), never by database IDs, so a dump can be restored into
+a database that already has data. Applications, groups and URL groups are kept in
+small lookup maps during a restore. Users, URLs, memberships and associations
+are resolved chunk by chunk, so memory stays constant however many there are.
+
+Record types, in dependency order::
+
+    {"type": "header", "format": "authfilter-policy", "version": 1}
+    {"type": "application", "name": ..., "host": ..., "description": ...}
+    {"type": "user_group", "name": ..., "protected": 0}
+    {"type": "user", "email": ...}
+    {"type": "url_group", "name": ..., "protected": 0, "app": <host or null>}
+    {"type": "url", "path": ..., "url_group": ..., "app": <host or null>}
+    {"type": "membership", "user_group": ..., "email": ...}
+    {"type": "association", "user_group": ..., "url_group": ..., "app": <host or null>}
+"""
+import json
+import logging
+import os
+from typing import AsyncIterable, AsyncIterator, Dict, List, Optional, Tuple
+
+from sqlalchemy import insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app import schemas
+from app.bulk import insert_ignore
+from app.models import Application, User, UserGroup, UrlGroup, Url, user_group_members, user_group_url_group_associations
+from app.pagination import after
+from app.policy import deferred_policy_bump
+from app.utils import SanitizedLogger
+
+logger = SanitizedLogger(logging.getLogger(__name__))
+
+EXPORT_FORMAT = "authfilter-policy"
+EXPORT_VERSION = 1
+POLICY_EXPORT_PAGE_SIZE = int(os.getenv("POLICY_EXPORT_PAGE_SIZE", "1000"))
+POLICY_IMPORT_CHUNK_SIZE = int(os.getenv("POLICY_IMPORT_CHUNK_SIZE", "1000"))
+POLICY_IMPORT_MAX_ERRORS = int(os.getenv("POLICY_IMPORT_MAX_ERRORS", "1000"))
+
+# Record type -> fields it must carry, in dependency order
+RECORD_FIELDS = {
+    "application": ("name", "host"),
+    "user_group": ("name",),
+    "user": ("email",),
+    "url_group": ("name",),
+    "url": ("path", "url_group"),
+    "membership": ("user_group", "email"),
+    "association": ("user_group", "url_group"),
+}
+RECORD_TYPES = tuple(RECORD_FIELDS)
+
+async def _keyset(session: AsyncSession, stmt, keys, page_size: int) -> AsyncIterator:
+    last = None
+    while True:
+        page = stmt if last is None else stmt.where(after(keys, last))
+        rows = (await session.execute(page.order_by(*keys).limit(page_size))).all()
+        for row in rows:
+            yield row
+        if len(rows) < page_size:
+            return
+        last = tuple(rows[-1][:len(keys)])
+
+def _export_queries():
+    """(record type, select whose leading columns are the keyset key, key columns, row -> record)."""
+    ug = UserGroup.__table__.alias("ug")
+    members = user_group_members
+    assoc = user_group_url_group_associations
+    return [
+        ("application",
+         select(Application.app_id, Application.name, Application.host, Application.description),
+         [Application.app_id],
+         lambda r: {"name": r.name, "host": r.host, "description": r.description}),
+        ("user_group",
+         select(UserGroup.group_id, UserGroup.name, UserGroup.protected),
+         [UserGroup.group_id],
+         lambda r: {"name": r.name, "protected": r.protected}),
+        ("user",
+         select(User.user_id, User.email),
+         [User.user_id],
+         lambda r: {"email": r.email}),
+        ("url_group",
+         select(UrlGroup.group_id, UrlGroup.name, UrlGroup.protected, Application.host)
+         .outerjoin(Application, UrlGroup.app_id == Application.app_id),
+         [UrlGroup.group_id],
+         lambda r: {"name": r.name, "protected": r.protected, "app": r.host}),
+        ("url",
+         select(Url.url_id, Url.path, UrlGroup.name, Application.host)
+         .join(UrlGroup, Url.url_group_id == UrlGroup.group_id)
+         .outerjoin(Application, UrlGroup.app_id == Application.app_id),
+         [Url.url_id],
+         lambda r: {"path": r.path, "url_group": r.name, "app": r.host}),
+        ("membership",
+         select(members.c.user_group_id, members.c.user_id, UserGroup.name, User.email)
+         .join(UserGroup, members.c.user_group_id == UserGroup.group_id)
+         .join(User, members.c.user_id == User.user_id),
+         [members.c.user_group_id, members.c.user_id],
+         lambda r: {"user_group": r.name, "email": r.email}),
+        ("association",
+         select(assoc.c.user_group_id, assoc.c.url_group_id, ug.c.name.label("user_group"), UrlGroup.name, Application.host)
+         .join(ug, assoc.c.user_group_id == ug.c.group_id)
+         .join(UrlGroup, assoc.c.url_group_id == UrlGroup.group_id)
+         .outerjoin(Application, UrlGroup.app_id == Application.app_id),
+         [assoc.c.user_group_id, assoc.c.url_group_id],
+         lambda r: {"user_group": r.user_group, "url_group": r.name, "app": r.host}),
+    ]
+
+async def export_policy(bind, page_size: Optional[int] = None) -> AsyncIterator[str]:
+    """Yield the whole policy as NDJSON lines (each ending in a newline).
+
+    Opens its own session on ``bind`` so it can outlive the request session when
+    used as a streaming response body. All pages are read in one transaction.
+    """
+    page_size = page_size or POLICY_EXPORT_PAGE_SIZE
+    header = {"type": "header", "format": EXPORT_FORMAT, "version": EXPORT_VERSION}
+    yield json.dumps(header) + "\n"
+    counts = {}
+    async with AsyncSession(bind) as session:
+        for record_type, stmt, keys, to_record in _export_queries():
+            counts[record_type] = 0
+            async for row in _keyset(session, stmt, keys, page_size):
+                counts[record_type] += 1
+                yield json.dumps({"type": record_type, **to_record(row)}) + "\n"
+    logger.info("Policy export finished: %s", counts)
+
+class _Restorer:
+    def __init__(self, session: AsyncSession):
+        self.session = session
+        self.dialect_name = session.get_bind().dialect.name
+        # Small lookup maps: one entry per application / group
+        self.app_ids: Dict[str, int] = {}
+        self.user_group_ids: Dict[str, int] = {}
+        self.url_group_ids: Dict[Tuple[Optional[str], str], int] = {}
+        self.report = schemas.PolicyImportReport(created={t: 0 for t in RECORD_TYPES})
+
+    def fail(self, line: int, error: str) -> None:
+        self.report.failed += 1
+        if len(self.report.errors) < POLICY_IMPORT_MAX_ERRORS:
+            self.report.errors.append(schemas.BulkImportError(line=line, error=error))
+
+    async def load_apps(self, hosts) -> None:
+        missing = sorted({h for h in hosts if h and h not in self.app_ids})
+        if missing:
+            result = await self.session.execute(
+                select(Application.host, Application.app_id).where(Application.host.in_(missing))
+            )
+            self.app_ids.update(result.all())
+
+    async def load_user_groups(self, names) -> None:
+        missing = sorted({n for n in names if n not in self.user_group_ids})
+        if missing:
+            result = await self.session.execute(
+                select(UserGroup.name, UserGroup.group_id).where(UserGroup.name.in_(missing))
+            )
+            self.user_group_ids.update(result.all())
+
+    async def load_url_groups(self, keys) -> None:
+        missing = {k for k in keys if k not in self.url_group_ids}
+        if not missing:
+            return
+        await self.load_apps(host for host, _ in missing)
+        result = await self.session.execute(
+            select(UrlGroup.name, UrlGroup.app_id, UrlGroup.group_id)
+            .where(UrlGroup.name.in_(sorted({name for _, name in missing})))
+        )
+        hosts = {app_id: host for host, app_id in self.app_ids.items()}
+        for name, app_id, group_id in result.all():
+            if app_id is None or app_id in hosts:
+                self.url_group_ids[(hosts.get(app_id), name)] = group_id
+
+    def url_group_id(self, line: int, record: dict) -> Optional[int]:
+        app = record.get("app")
+        if app and app not in self.app_ids:
+            self.fail(line, f"unknown application '{app}'")
+            return None
+        group_id = self.url_group_ids.get((app, record["url_group"]))
+        if group_id is None:
+            self.fail(line, f"unknown URL group '{record['url_group']}'")
+        return group_id
+
+    def user_group_id(self, line: int, record: dict) -> Optional[int]:
+        group_id = self.user_group_ids.get(record["user_group"])
+        if group_id is None:
+            self.fail(line, f"unknown user group '{record['user_group']}'")
+        return group_id
+
+    async def insert_rows(self, record_type: str, table, rows: List[dict], ignore: bool = True) -> None:
+        if not rows:
+            return
+        stmt = insert_ignore(self.dialect_name, table, rows) if ignore else insert(table).values(rows)
+        result = await self.session.execute(stmt)
+        self.report.created[record_type] += max(result.rowcount, 0) if ignore else len(rows)
+
+    async def apply(self, record_type: str, chunk: List[Tuple[int, dict]]) -> None:
+        records = [r for _, r in chunk]
+        if record_type == "application":
+            await self.load_apps(r["host"] for r in records)
+            new = {r["host"]: r for r in records if r["host"] not in self.app_ids}
+            await self.insert_rows(record_type, Application.__table__, [
+                {"name": r["name"], "host": r["host"], "description": r.get("description")} for r in new.values()
+            ], ignore=False)
+            await self.load_apps(new)
+        elif record_type == "user_group":
+            await self.insert_rows(record_type, UserGroup.__table__, [
+                {"name": r["name"], "protected": r.get("protected", 0)} for r in records
+            ])
+            await self.load_user_groups(r["name"] for r in records)
+        elif record_type == "user":
+            await self.insert_rows(record_type, User.__table__, [{"email": r["email"]} for r in records])
+        elif record_type == "url_group":
+            await self.load_url_groups((r.get("app"), r["name"]) for r in records)
+            rows, seen = [], set()
+            for line, r in chunk:
+                key = (r.get("app"), r["name"])
+                if key in self.url_group_ids or key in seen:
+                    continue
+                seen.add(key)
+                if r.get("app") and r["app"] not in self.app_ids:
+                    self.fail(line, f"unknown application '{r['app']}'")
+                    continue
+                rows.append({"name": r["name"], "protected": r.get("protected", 0), "app_id": self.app_ids.get(r.get("app"))})
+            # (name, app_id) with a NULL app_id is not covered by the unique constraint,
+            # so new URL groups are found by the lookup above rather than INSERT IGNORE
+            await self.insert_rows(record_type, UrlGroup.__table__, rows, ignore=False)
+            await self.load_url_groups((r.get("app"), r["name"]) for r in records)
+        elif record_type == "url":
+            await self.load_url_groups((r.get("app"), r["url_group"]) for r in records)
+            rows = []
+            for line, r in chunk:
+                group_id = self.url_group_id(line, r)
+                if group_id is not None:
+                    rows.append({"path": r["path"], "url_group_id": group_id})
+            await self.insert_rows(record_type, Url.__table__, rows)
+        elif record_type == "membership":
+            await self.load_user_groups(r["user_group"] for r in records)
+            emails = sorted({r["email"] for r in records})
+            result = await self.session.execute(select(User.email, User.user_id).where(User.email.in_(emails)))
+            user_ids = dict(result.all())
+            rows = set()
+            for line, r in chunk:
+                group_id = self.user_group_id(line, r)
+                if group_id is None:
+                    continue
+                if r["email"] not in user_ids:
+                    self.fail(line, f"unknown user '{r['email']}'")
+                    continue
+                rows.add((group_id, user_ids[r["email"]]))
+            await self.insert_rows(record_type, user_group_members, [
+                {"user_group_id": g, "user_id": u} for g, u in sorted(rows)
+            ])
+        elif record_type == "association":
+            await self.load_user_groups(r["user_group"] for r in records)
+            await self.load_url_groups((r.get("app"), r["url_group"]) for r in records)
+            rows = set()
+            for line, r in chunk:
+                user_group_id = self.user_group_id(line, r)
+                url_group_id = self.url_group_id(line, r) if user_group_id is not None else None
+                if url_group_id is not None:
+                    rows.add((user_group_id, url_group_id))
+            await self.insert_rows(record_type, user_group_url_group_associations, [
+                {"user_group_id": g, "url_group_id": u} for g, u in sorted(rows)
+            ])
+        await self.session.commit()
+
+async def import_policy(
+    session: AsyncSession,
+    lines: AsyncIterable[str],
+    chunk_size: Optional[int] = None,
+) -> schemas.PolicyImportReport:
+    """Replay an export produced by ``export_policy``.
+
+    Rows that already exist (by natural key) are left untouched. Records are
+    applied in chunks of one type, one transaction each. Raises ValueError if the
+    stream is not a policy export.
+    """
+    chunk_size = chunk_size or POLICY_IMPORT_CHUNK_SIZE
+    restorer = _Restorer(session)
+    report = restorer.report
+    chunk: List[Tuple[int, dict]] = []
+    chunk_type = None
+
+    async def flush():
+        nonlocal chunk
+        if not chunk:
+            return
+        try:
+            await restorer.apply(chunk_type, chunk)
+        except Exception as e:
+            await session.rollback()
+            logger.error("Policy import chunk of %s %s records failed: %s", len(chunk), chunk_type, e)
+            for line, _ in chunk:
+                restorer.fail(line, f"database error: {e.__class__.__name__}")
+        chunk = []
+
+    line_no = 0
+    header_seen = False
+    with deferred_policy_bump():
+        async for line in lines:
+            line_no += 1
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+                record_type = record.get("type") if isinstance(record, dict) else None
+            except ValueError:
+                record, record_type = None, None
+            if not header_seen:
+                if record_type != "header" or record.get("format") != EXPORT_FORMAT:
+                    raise ValueError("not an authfilter policy export (missing header)")
+                if record.get("version") != EXPORT_VERSION:
+                    raise ValueError(f"unsupported policy export version {record.get('version')}")
+                header_seen = True
+                continue
+            report.records += 1
+            if record_type not in RECORD_FIELDS:
+                restorer.fail(line_no, "invalid record")
+                continue
+            missing = [f for f in RECORD_FIELDS[record_type] if not record.get(f)]
+            if missing:
+                restorer.fail(line_no, f"{record_type} record is missing {', '.join(missing)}")
+                continue
+            if record_type != chunk_type or len(chunk) >= chunk_size:
+                await flush()
+                chunk_type = record_type
+            chunk.append((line_no, record))
+        await flush()
+
+    report.errors.sort(key=lambda e: e.line)
+    logger.info("Policy import finished: %s records, created %s, %s failed", report.records, report.created, report.failed)
+    return report
@@ -0,0 +1,255 @@
+"""
+Circuit breaker and last-known-good decisions for the authorization path.
+
+Every decision read from the database is remembered in a bounded LRU
+``DecisionCache``. When an evaluation fails (a database error, or no answer
+within ``AUTHORIZE_QUERY_TIMEOUT`` seconds) the request is answered from that
+cache if its entry is younger than ``AUTHORIZE_STALE_SECONDS``. After
+``AUTHORIZE_BREAKER_FAILURES`` consecutive failures the breaker opens: requests
+stop touching the database and are answered from the cache only, while a
+background task pings the database every ``AUTHORIZE_BREAKER_PROBE_SECONDS``
+and closes the breaker once it answers. A request with no usable cached
+decision raises ``DecisionUnavailable``.
+
+Cached decisions are dropped for users whose access was changed on purpose
+(offboarding, membership sync). When such a change was made by another process,
+it reaches this one through the shared policy version within
+``POLICY_POLL_SECONDS`` and every cached decision is dropped. Other admin
+changes do not touch the cache, so an outage right after one still has
+decisions to fall back on; they are bounded by the staleness window.
+
+A timed-out evaluation is cancelled. Its connection, from
+``cancellable_connection``, is then invalidated rather than returned to the
+pool in an unknown state.
+"""
+import asyncio
+import logging
+import os
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError, DisconnectionError, OperationalError
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+
+from app.policy import get_policy_version, on_users_invalidated
+from app.utils import SanitizedLogger
+
+logger = SanitizedLogger(logging.getLogger(__name__))
+
+AUTHORIZE_QUERY_TIMEOUT = float(os.getenv("AUTHORIZE_QUERY_TIMEOUT", "2"))
+AUTHORIZE_BREAKER_FAILURES = int(os.getenv("AUTHORIZE_BREAKER_FAILURES", "5"))
+AUTHORIZE_BREAKER_PROBE_SECONDS = float(os.getenv("AUTHORIZE_BREAKER_PROBE_SECONDS", "2"))
+AUTHORIZE_STALE_SECONDS = float(os.getenv("AUTHORIZE_STALE_SECONDS", "300"))
+AUTHORIZE_DECISION_CACHE_SIZE = int(os.getenv("AUTHORIZE_DECISION_CACHE_SIZE", "100000"))
+
+# What counts as the database failing, as opposed to a bug in the caller (a
+# missing table, a bad statement), which should surface rather than be hidden
+# behind stale decisions
+DATABASE_FAILURES = (OperationalError, DisconnectionError, PoolTimeoutError, OSError, asyncio.TimeoutError)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+class DecisionUnavailable(Exception):
+    """Raised when the database cannot decide and no fresh cached decision exists."""
+
+    def __init__(self, reason: str):
+        super().__init__(reason)
+        self.reason = reason
+
+class DecisionCache:
+    """The most recent decision per key, with the time it was read from the database."""
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def put(self, key: Hashable, decision: Any) -> None:
+        self._entries[key] = (time.monotonic(), decision)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def get(self, key: Hashable, max_age: float) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None or time.monotonic() - entry[0] > max_age:
+            return None
+        return entry[1]
+
+    def forget_where(self, predicate: Callable[[Hashable], bool]) -> None:
+        for key in [k for k in self._entries if predicate(k)]:
+            del self._entries[key]
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+class CircuitBreaker:
+    """Stop calling a failing database and answer from the last known good decisions."""
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int = AUTHORIZE_BREAKER_FAILURES,
+        probe_interval: float = AUTHORIZE_BREAKER_PROBE_SECONDS,
+        timeout: float = AUTHORIZE_QUERY_TIMEOUT,
+        stale_seconds: float = AUTHORIZE_STALE_SECONDS,
+        cache_size: int = AUTHORIZE_DECISION_CACHE_SIZE,
+    ):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.probe_interval = probe_interval
+        self.timeout = timeout
+        self.stale_seconds = stale_seconds
+        self.cache = DecisionCache(cache_size)
+        self._probe: Optional[Callable[[], Awaitable[Any]]] = None
+        self._probe_task: Optional[asyncio.Task] = None
+        self.reset()
+
+    def reset(self) -> None:
+        """Close the breaker and forget every cached decision and counter."""
+        if self._probe_task is not None:
+            self._probe_task.cancel()
+            self._probe_task = None
+        self.cache.clear()
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.failures = 0
+        self.timeouts = 0
+        self.opened = 0
+        self.stale_served = 0
+        self.unavailable = 0
+
+    async def with_timeout(self, awaitable: Awaitable[Any]) -> Any:
+        """Await ``awaitable``, giving up after ``timeout`` seconds (0 waits forever)."""
+        if self.timeout <= 0:
+            return await awaitable
+        return await asyncio.wait_for(awaitable, self.timeout)
+
+    async def call(
+        self,
+        key: Hashable,
+        evaluate: Callable[[], Awaitable[Any]],
+        probe: Callable[[], Awaitable[Any]],
+    ) -> Any:
+        """Decide ``key`` with ``evaluate``, or from the cache while the database is failing.
+
+        ``probe`` is what the background task runs to check that the database
+        has recovered.
+        """
+        if self.state != CLOSED:
+            return self._fallback(key, f"circuit {self.state}")
+        version = get_policy_version()
+        try:
+            decision = await evaluate()
+        except Exception as e:
+            if not is_database_failure(e):
+                raise
+            self._record_failure(e, probe)
+            return self._fallback(key, _describe(e))
+        self.consecutive_failures = 0
+        # A policy change committed during the evaluation may already contradict it
+        if get_policy_version() == version:
+            self.cache.put(key, decision)
+        return decision
+
+    def _fallback(self, key: Hashable, reason: str) -> Any:
+        decision = self.cache.get(key, self.stale_seconds)
+        if decision is None:
+            self.unavailable += 1
+            raise DecisionUnavailable(reason)
+        self.stale_served += 1
+        logger.warning("Serving last known %s decision %r (%s)", self.name, decision, reason)
+        return decision
+
+    def _record_failure(self, error: BaseException, probe: Callable[[], Awaitable[Any]]) -> None:
+        self.failures += 1
+        if isinstance(error, asyncio.TimeoutError):
+            self.timeouts += 1
+        self.consecutive_failures += 1
+        self._probe = probe
+        logger.error("%s evaluation failed (%s in a row): %s", self.name, self.consecutive_failures, _describe(error))
+        if self.state == CLOSED and self.consecutive_failures >= self.failure_threshold:
+            self.trip()
+
+    def trip(self) -> None:
+        """Open the breaker and start probing the database in the background."""
+        self.state = OPEN
+        self.opened += 1
+        logger.error("%s circuit opened after %s consecutive failures", self.name, self.consecutive_failures)
+        if self._probe_task is None or self._probe_task.done():
+            self._probe_task = asyncio.get_running_loop().create_task(self._probe_until_recovered())
+
+    async def _probe_until_recovered(self) -> None:
+        while self.state != CLOSED:
+            await asyncio.sleep(self.probe_interval)
+            self.state = HALF_OPEN
+            try:
+                await self.with_timeout(self._probe())
+            except Exception as e:
+                if not is_database_failure(e):
+                    raise
+                self.state = OPEN
+                logger.warning("%s probe failed, circuit stays open: %s", self.name, _describe(e))
+                continue
+            self.state = CLOSED
+            self.consecutive_failures = 0
+            logger.info("%s probe succeeded, circuit closed", self.name)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "consecutive_failures": self.consecutive_failures,
+            "failures": self.failures,
+            "timeouts": self.timeouts,
+            "opened": self.opened,
+            "stale_served": self.stale_served,
+            "unavailable": self.unavailable,
+            "cached_decisions": len(self.cache),
+        }
+
+def is_database_failure(error: BaseException) -> bool:
+    """True for connection loss, timeouts and other operational failures."""
+    if isinstance(error, DBAPIError) and error.connection_invalidated:
+        return True
+    return isinstance(error, DATABASE_FAILURES)
+
+def _describe(error: BaseException) -> str:
+    if isinstance(error, asyncio.TimeoutError):
+        return "timed out"
+    return (str(error).splitlines() or [type(error).__name__])[0]
+
+@asynccontextmanager
+async def cancellable_connection(engine) -> AsyncIterator[Any]:
+    """A pool connection for work that ``with_timeout`` may cancel.
+
+    If the work is cancelled, the connection may be in the middle of a
+    statement, so it is invalidated instead of going back to the pool.
+    """
+    async with engine.connect() as conn:
+        try:
+            yield conn
+        except asyncio.CancelledError:
+            if not conn.invalidated:
+                await conn.invalidate()
+            raise
+
+async def ping(engine) -> None:
+    """The probe: one trivial statement on a fresh pool connection."""
+    async with cancellable_connection(engine) as conn:
+        await conn.execute(text("SELECT 1"))
+
+authorize_breaker = CircuitBreaker("authorize")
+
+@on_users_invalidated
+def _forget_user_decisions(emails) -> None:
+    if emails is None:
+        authorize_breaker.cache.clear()
+    else:
+        authorize_breaker.cache.forget_where(lambda key: key[0] in emails)
@@ -0,0 +1,480 @@
+"""
+Bulk import of users, user group memberships and application URLs.
+
+Rows are streamed and applied in chunks: each chunk is one transaction with a
+handful of multi-row statements, instead of several round trips and commits per
+row.
+"""
+import csv
+import json
+import logging
+import os
+from typing import AsyncIterable, AsyncIterator, Dict, Iterable, List, Optional, Tuple
+
+from pydantic import EmailStr, ValidationError
+from sqlalchemy import delete, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app import schemas
+from app.models import User, UserGroup, UrlGroup, Url, user_group_members
+from app.policy import deferred_policy_bump, invalidate_users, shared_policy
+from app.utils import SanitizedLogger
+
+logger = SanitizedLogger(logging.getLogger(__name__))
+
+BULK_IMPORT_CHUNK_SIZE = int(os.getenv("BULK_IMPORT_CHUNK_SIZE", "500"))
+BULK_IMPORT_MAX_ERRORS = int(os.getenv("BULK_IMPORT_MAX_ERRORS", "1000"))
+
+try:
+    from pydantic import TypeAdapter
+except ImportError:  # pydantic 1.x
+    from pydantic import parse_obj_as
+
+    def validate_email(value: str) -> str:
+        return parse_obj_as(EmailStr, value)
+else:
+    validate_email = TypeAdapter(EmailStr).validate_python
+
+# (line number, email, group name or None)
+Record = Tuple[int, str, Optional[str]]
+
+def insert_ignore(dialect_name: str, table, rows: List[dict]):
+    """Multi-row INSERT that silently skips rows violating a unique constraint."""
+    if dialect_name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as pg_insert
+        return pg_insert(table).values(rows).on_conflict_do_nothing()
+    stmt = insert(table).values(rows)
+    if dialect_name == "sqlite":
+        return stmt.prefix_with("OR IGNORE")
+    if dialect_name in ("mysql", "mariadb"):
+        return stmt.prefix_with("IGNORE")
+    raise ValueError(f"insert_ignore is not supported for dialect '{dialect_name}'")
+
+def detect_format(content_type: Optional[str], filename: Optional[str] = None) -> str:
+    """Return 'ndjson' or 'csv' from a content type or file name."""
+    if content_type and ("ndjson" in content_type or "json" in content_type):
+        return "ndjson"
+    if filename and filename.endswith((".ndjson", ".jsonl", ".json")):
+        return "ndjson"
+    return "csv"
+
+async def iter_lines(chunks: AsyncIterable[bytes]) -> AsyncIterator[str]:
+    """Split a stream of byte chunks into decoded lines."""
+    buffer = b""
+    async for chunk in chunks:
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            yield line.decode("utf-8").rstrip("\r")
+    if buffer:
+        yield buffer.decode("utf-8").rstrip("\r")
+
+async def iter_records(lines: AsyncIterable[str], fmt: str) -> AsyncIterator[Tuple[int, Optional[Record], Optional[str]]]:
+    """Parse lines into records. Yields (line, record, None) or (line, None, error)."""
+    columns = None
+    line_no = 0
+    async for line in lines:
+        line_no += 1
+        if not line.strip():
+            continue
+        try:
+            if fmt == "ndjson":
+                data = json.loads(line)
+                if not isinstance(data, dict):
+                    raise ValueError("expected a JSON object")
+                email, group = data.get("email"), data.get("group")
+            else:
+                values = [v.strip() for v in next(csv.reader([line]))]
+                if columns is None:
+                    lowered = [v.lower() for v in values]
+                    if "email" in lowered:
+                        columns = lowered
+                        continue
+                    columns = ["email", "group"]
+                row = dict(zip(columns, values))
+                email, group = row.get("email"), row.get("group") or row.get("group_name")
+            if not email:
+                raise ValueError("missing email")
+            email = validate_email(str(email).strip())
+        except (ValueError, ValidationError) as e:
+            message = e.errors()[0]["msg"] if isinstance(e, ValidationError) else str(e)
+            yield line_no, None, message
+            continue
+        yield line_no, (line_no, email, (str(group).strip() or None) if group else None), None
+
+class _Importer:
+    def __init__(self, session: AsyncSession, chunk_size: int):
+        self.session = session
+        self.chunk_size = chunk_size
+        self.dialect_name = session.get_bind().dialect.name
+        self.group_ids: Dict[str, Optional[int]] = {}
+        self.report = schemas.BulkImportReport()
+
+    def fail(self, line: int, error: str) -> None:
+        self.report.failed += 1
+        if len(self.report.errors) < BULK_IMPORT_MAX_ERRORS:
+            self.report.errors.append(schemas.BulkImportError(line=line, error=error))
+
+    async def resolve_groups(self, names: Iterable[str]) -> None:
+        missing = sorted({n for n in names if n not in self.group_ids})
+        if not missing:
+            return
+        result = await self.session.execute(
+            select(UserGroup.name, UserGroup.group_id).where(UserGroup.name.in_(missing))
+        )
+        found = dict(result.all())
+        for name in missing:
+            self.group_ids[name] = found.get(name)
+
+    async def apply(self, chunk: List[Record]) -> None:
+        await self.resolve_groups(group for _, _, group in chunk if group)
+        valid = []
+        for line, email, group in chunk:
+            if group and self.group_ids.get(group) is None:
+                self.fail(line, f"unknown user group '{group}'")
+            else:
+                valid.append((line, email, group))
+        if not valid:
+            return
+
+        emails = sorted({email for _, email, _ in valid})
+        try:
+            result = await self.session.execute(
+                insert_ignore(self.dialect_name, User.__table__, [{"email": e} for e in emails])
+            )
+            users_created = max(result.rowcount, 0)
+            result = await self.session.execute(select(User.email, User.user_id).where(User.email.in_(emails)))
+            user_ids = dict(result.all())
+            # A case-insensitive collation (MySQL) returns the stored spelling
+            folded_ids = {e.lower(): user_id for e, user_id in user_ids.items()}
+
+            memberships = sorted({
+                (self.group_ids[group], user_ids.get(email) or folded_ids[email.lower()])
+                for _, email, group in valid if group
+            })
+            memberships_created = 0
+            if memberships:
+                result = await self.session.execute(insert_ignore(
+                    self.dialect_name,
+                    user_group_members,
+                    [{"user_group_id": g, "user_id": u} for g, u in memberships],
+                ))
+                memberships_created = max(result.rowcount, 0)
+            await self.session.commit()
+        except Exception as e:
+            await self.session.rollback()
+            logger.error("Bulk import chunk of %s rows failed: %s", len(valid), e)
+            for line, _, _ in valid:
+                self.fail(line, f"database error: {e.__class__.__name__}")
+            return
+
+        self.report.users_created += users_created
+        self.report.memberships_created += memberships_created
+
+async def import_memberships(
+    session: AsyncSession,
+    lines: AsyncIterable[str],
+    fmt: str = "csv",
+    chunk_size: Optional[int] = None,
+) -> schemas.BulkImportReport:
+    """Upsert users and group memberships from CSV or NDJSON lines.
+
+    Each chunk is committed on its own, so a failing chunk does not undo earlier
+    ones. The policy version is bumped once for the whole import.
+    """
+    importer = _Importer(session, chunk_size or BULK_IMPORT_CHUNK_SIZE)
+    chunk: List[Record] = []
+    with deferred_policy_bump():
+        async for line, record, error in iter_records(lines, fmt):
+            importer.report.rows += 1
+            if error:
+                importer.fail(line, error)
+                continue
+            chunk.append(record)
+            if len(chunk) >= importer.chunk_size:
+                await importer.apply(chunk)
+                chunk = []
+        if chunk:
+            await importer.apply(chunk)
+
+    report = importer.report
+    report.errors.sort(key=lambda e: e.line)
+    logger.info(
+        "Bulk import: %s rows, %s users created, %s memberships created, %s failed",
+        report.rows, report.users_created, report.memberships_created, report.failed,
+    )
+    return report
+
+
+def _batches(items: List, size: int) -> Iterable[List]:
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+async def sync_group_members(
+    session: AsyncSession,
+    group_id: int,
+    emails: Iterable[str],
+    dry_run: bool = False,
+) -> schemas.MembershipSyncReport:
+    """Make the members of a user group exactly ``emails``.
+
+    The current membership is read in one query and only the difference is
+    written: memberships are deleted, missing users are created and memberships
+    are inserted in multi-row batches, all in a single transaction. Emails are
+    normalized like ``import_memberships`` does and compared case-insensitively,
+    so ``Alice@example.com`` and ``alice@example.com`` are the same member. The
+    same transaction bumps the shared policy version, and after the commit the
+    users whose membership changed are invalidated in this process. Nothing is
+    written (and the policy version is not bumped) when the group is already in
+    sync.
+    """
+    desired: Dict[str, str] = {}
+    for email in emails:
+        email = validate_email(str(email).strip())
+        desired.setdefault(email.lower(), email)
+    result = await session.execute(
+        select(User.email, User.user_id)
+        .join(user_group_members, user_group_members.c.user_id == User.user_id)
+        .where(user_group_members.c.user_group_id == group_id)
+    )
+    current = {email.lower(): (email, user_id) for email, user_id in result.all()}
+    to_add = sorted(email for folded, email in desired.items() if folded not in current)
+    removed = sorted(entry for folded, entry in current.items() if folded not in desired)
+    report = schemas.MembershipSyncReport(
+        added=len(to_add),
+        removed=len(removed),
+        unchanged=len(current) - len(removed),
+        dry_run=dry_run,
+    )
+    if dry_run or (not to_add and not removed):
+        return report
+
+    dialect_name = session.get_bind().dialect.name
+    try:
+        # Deletions first: with a case-insensitive collation an insert for a
+        # member's other spelling would be ignored, and a later delete would
+        # then remove them
+        for batch in _batches([user_id for _, user_id in removed], BULK_IMPORT_CHUNK_SIZE):
+            await session.execute(
+                delete(user_group_members).where(
+                    user_group_members.c.user_group_id == group_id,
+                    user_group_members.c.user_id.in_(batch),
+                )
+            )
+        for batch in _batches(to_add, BULK_IMPORT_CHUNK_SIZE):
+            result = await session.execute(insert_ignore(dialect_name, User.__table__, [{"email": e} for e in batch]))
+            report.users_created += max(result.rowcount, 0)
+            result = await session.execute(select(User.email, User.user_id).where(User.email.in_(batch)))
+            user_ids = dict(result.all())
+            # A case-insensitive collation (MySQL) returns the stored spelling
+            folded_ids = {e.lower(): user_id for e, user_id in user_ids.items()}
+            await session.execute(insert_ignore(dialect_name, user_group_members, [
+                {"user_group_id": group_id, "user_id": user_ids.get(email) or folded_ids[email.lower()]}
+                for email in batch
+            ]))
+        await shared_policy.bump(session)
+        await session.commit()
+    except Exception:
+        await session.rollback()
+        raise
+    invalidate_users(to_add + [email for email, _ in removed])
+
+    logger.info(
+        "Synced members of user group %s: %s added, %s removed, %s unchanged, %s users created",
+        group_id, report.added, report.removed, report.unchanged, report.users_created,
+    )
+    return report
+
+async def offboard_users(
+    session: AsyncSession,
+    emails: Iterable[str],
+    delete_users: bool = False,
+) -> schemas.OffboardReport:
+    """Remove users from every group, and optionally delete them, in one transaction.
+
+    Memberships are removed with one set-based DELETE per batch of emails rather
+    than one request per group. After the commit every per-user cache in this
+    process is told to drop its state for these emails, so the change applies to
+    the next request. The same transaction bumps the shared policy version, so
+    other workers and replicas drop their cached decisions within
+    ``POLICY_POLL_SECONDS``.
+    """
+    emails = sorted(set(emails))
+    report = schemas.OffboardReport()
+    found = set()
+    try:
+        for batch in _batches(emails, BULK_IMPORT_CHUNK_SIZE):
+            user_ids = select(User.user_id).where(User.email.in_(batch))
+            found.update((await session.execute(select(User.email).where(User.email.in_(batch)))).scalars())
+            result = await session.execute(
+                delete(user_group_members).where(user_group_members.c.user_id.in_(user_ids))
+            )
+            report.memberships_removed += max(result.rowcount, 0)
+            if delete_users:
+                result = await session.execute(delete(User.__table__).where(User.__table__.c.email.in_(batch)))
+                report.users_deleted += max(result.rowcount, 0)
+        await shared_policy.bump(session)
+        await session.commit()
+    except Exception:
+        await session.rollback()
+        raise
+    invalidate_users(emails)
+
+    report.users_found = len(found)
+    report.not_found = [e for e in emails if e not in found]
+    logger.info(
+        "Offboarded %s users: %s memberships removed, %s users deleted",
+        report.users_found, report.memberships_removed, report.users_deleted,
+    )
+    return report
+
+# URL import: (line number or None, path, tags)
+PathEntry = Tuple[Optional[int], str, List[str]]
+
+HTTP_METHODS = ("get", "put", "post", "delete", "options", "head", "patch", "trace")
+
+class UrlRule:
+    """Assign paths to a URL group by OpenAPI tag (``tag:<tag>=<group>``) or
+    path prefix (``prefix:<prefix>=<group>``)."""
+
+    def __init__(self, kind: str, match: str, group: str):
+        self.kind = kind
+        self.match = match
+        self.group = group
+
+    @classmethod
+    def parse(cls, spec: str) -> "UrlRule":
+        kind, sep, rest = spec.partition(":")
+        match, sep2, group = rest.rpartition("=")
+        if not sep or not sep2 or kind not in ("tag", "prefix") or not match or not group.strip():
+            raise ValueError(f"invalid rule '{spec}', expected tag:<tag>=<group> or prefix:<prefix>=<group>")
+        return cls(kind, match, group.strip())
+
+    def matches(self, path: str, tags: List[str]) -> bool:
+        if self.kind == "tag":
+            return self.match in tags
+        return path.startswith(self.match)
+
+def openapi_paths(document: dict) -> Iterable[PathEntry]:
+    """Yield (None, path, tags) for every path of an OpenAPI document."""
+    paths = document.get("paths") if isinstance(document, dict) else None
+    if not isinstance(paths, dict):
+        raise ValueError("OpenAPI document has no 'paths' object")
+    for path, item in paths.items():
+        tags = set()
+        if isinstance(item, dict):
+            for method in HTTP_METHODS:
+                operation = item.get(method)
+                if isinstance(operation, dict):
+                    tags.update(t for t in operation.get("tags", []) if isinstance(t, str))
+        yield None, path, sorted(tags)
+
+async def iter_path_entries(lines: AsyncIterable[str], fmt: str) -> AsyncIterator[Tuple[Optional[PathEntry], Optional[str]]]:
+    """Parse a path list (one path per line) or NDJSON (``{"path": ..., "tags": [...]}``)."""
+    line_no = 0
+    async for line in lines:
+        line_no += 1
+        if not line.strip() or line.lstrip().startswith("#"):
+            continue
+        if fmt == "ndjson":
+            try:
+                data = json.loads(line)
+                if not isinstance(data, dict) or not isinstance(data.get("path"), str):
+                    raise ValueError("expected an object with a 'path'")
+                tags = data.get("tags") or []
+                if not isinstance(tags, list):
+                    raise ValueError("'tags' must be a list")
+            except ValueError as e:
+                yield (line_no, line.strip(), []), str(e)
+                continue
+            yield (line_no, data["path"], [str(t) for t in tags]), None
+        else:
+            yield (line_no, line.strip(), []), None
+
+async def _from_iterable(entries: Iterable[PathEntry]) -> AsyncIterator[Tuple[Optional[PathEntry], Optional[str]]]:
+    for entry in entries:
+        yield entry, None
+
+async def import_urls(
+    session: AsyncSession,
+    app_id: int,
+    entries,
+    rules: List[UrlRule],
+    default_group: Optional[str] = None,
+    chunk_size: Optional[int] = None,
+) -> schemas.UrlImportReport:
+    """Register paths in the application's URL groups, chosen by the first matching rule.
+
+    ``entries`` is what ``iter_path_entries`` yields, or an iterable of path
+    entries such as ``openapi_paths(document)``. Existing (path, url_group_id)
+    pairs are left alone. Raises ValueError if a rule names a URL group that
+    does not exist in the application.
+    """
+    if not hasattr(entries, "__aiter__"):
+        entries = _from_iterable(entries)
+    chunk_size = chunk_size or BULK_IMPORT_CHUNK_SIZE
+    dialect_name = session.get_bind().dialect.name
+
+    names = {rule.group for rule in rules} | ({default_group} if default_group else set())
+    result = await session.execute(
+        select(UrlGroup.name, UrlGroup.group_id).where(UrlGroup.app_id == app_id, UrlGroup.name.in_(sorted(names)))
+    )
+    group_ids = dict(result.all())
+    missing = sorted(names - group_ids.keys())
+    if missing:
+        raise ValueError(f"URL groups not found in application {app_id}: {', '.join(missing)}")
+
+    report = schemas.UrlImportReport()
+
+    def fail(line, path, error):
+        report.failed += 1
+        if len(report.errors) < BULK_IMPORT_MAX_ERRORS:
+            report.errors.append(schemas.UrlImportError(line=line, path=path, error=error))
+
+    async def apply(rows):
+        try:
+            result = await session.execute(insert_ignore(
+                dialect_name,
+                Url.__table__,
+                [{"path": path, "url_group_id": group_id} for path, group_id in sorted(rows)],
+            ))
+            await session.commit()
+        except Exception as e:
+            await session.rollback()
+            logger.error("URL import chunk of %s paths failed: %s", len(rows), e)
+            for path, _ in sorted(rows):
+                fail(None, path, f"database error: {e.__class__.__name__}")
+            return
+        report.urls_created += max(result.rowcount, 0)
+
+    chunk = set()
+    with deferred_policy_bump():
+        async for entry, error in entries:
+            line, path, tags = entry
+            report.paths += 1
+            if error:
+                fail(line, path, error)
+                continue
+            if not path.startswith("/") or len(path) > 255:
+                fail(line, path, "path must start with '/' and be at most 255 characters")
+                continue
+            if "{" in path:
+                # Authorization matches paths exactly, so a template would never match
+                fail(line, path, "path templates are not supported")
+                continue
+            group = next((rule.group for rule in rules if rule.matches(path, tags)), default_group)
+            if group is None:
+                report.unassigned += 1
+                continue
+            chunk.add((path, group_ids[group]))
+            if len(chunk) >= chunk_size:
+                await apply(chunk)
+                chunk = set()
+        if chunk:
+            await apply(chunk)
+
+    logger.info(
+        "URL import for app %s: %s paths, %s URLs created, %s unassigned, %s failed",
+        app_id, report.paths, report.urls_created, report.unassigned, report.failed,
+    )
+    return report
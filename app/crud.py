@@ -1,6 +1,6 @@
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from sqlalchemy import insert, update, delete, and_
+from sqlalchemy import insert, update, delete, bindparam, text
 from .models import User, UserGroup, UrlGroup, Url, Application, user_group_members, user_group_url_group_associations
 from typing import Optional, List
 import os
@@ -8,14 +8,124 @@ import logging
 from sqlalchemy.exc import IntegrityError
 from urllib.parse import urlparse
 import re
+from collections import OrderedDict
 
 # Set up logger
 logger = logging.getLogger(__name__)
 
 # Use sanitized logger to automatically mask sensitive information
-from app.utils import SanitizedLogger, sanitize_email
+from app.utils import SanitizedLogger, MaskedEmail
+from app.singleflight import SingleFlight
+from app.breaker import authorize_breaker, cancellable_connection, ping
+from app.db import get_engine, get_read_engine
+from app.decisionlog import Decision, decision_log, NO_APP, UNKNOWN_HOST, WEB_ASSET
+from app.audit import audit_log
+from app.policy import on_policy_change, on_users_invalidated
+from app.pagination import Page, keyset_page
+from app.stats import get_url_group_counts
 logger = SanitizedLogger(logger)
 
+# Concurrent identical authorization checks share one evaluation
+authorize_flight = SingleFlight("authorize")
+
+# (host, path) pairs recently seen in an 'Everyone' group. Only consulted when the
+# authorize route is shedding load in fail-open mode, so entries may lag behind
+# policy changes.
+PUBLIC_URL_MEMO_SIZE = int(os.getenv("AUTHORIZE_PUBLIC_MEMO_SIZE", "10000"))
+_public_urls: "OrderedDict[tuple[str, str], None]" = OrderedDict()
+
+@on_policy_change
+def _forget_public_urls(version: int) -> None:
+    # A URL may have left its 'Everyone' group
+    _public_urls.clear()
+
+@on_users_invalidated
+def _forget_user_evaluations(emails) -> None:
+    # Requests arriving after an offboarding must not join an evaluation that
+    # started before it
+    authorize_flight.forget_where(lambda key: emails is None or key[0] in emails)
+
+def remember_public_url(host: str, path: str) -> None:
+    key = (host or "", path)
+    _public_urls[key] = None
+    _public_urls.move_to_end(key)
+    while len(_public_urls) > PUBLIC_URL_MEMO_SIZE:
+        _public_urls.popitem(last=False)
+
+def is_known_public_url(full_url: str) -> bool:
+    """Answer from memory only: is this URL known to be in an 'Everyone' group?"""
+    scheme, host, path = parse_full_url(full_url)
+    return is_web_asset(path) or (host or "", path) in _public_urls
+
+# Lookup and authorization statements are built once and reused with bound
+# parameters, so SQLAlchemy does not rebuild and re-key them on every check.
+APPLICATION_BY_HOST_STMT = select(Application).where(Application.host == bindparam("host"))
+
+# The authorize route answers with one of these, so a check costs one round
+# trip. CASE stops at the first matching branch, so the rules apply in order:
+# a URL in the 'Everyone' group, a URL in the 'Authenticated' group for a
+# signed-in user, a member of the 'Internal User Group', then a grant through
+# one of the user's groups. ``:email <> ''`` is NULL (false) for anonymous
+# requests.
+APP_DECISION_STMT = text("""
+    SELECT a.app_id, a.name, CASE
+        WHEN EXISTS (
+            SELECT 1 FROM url_groups g JOIN urls u ON u.url_group_id = g.group_id
+            WHERE g.name = 'Everyone' AND g.protected = 1 AND g.app_id = a.app_id AND u.path = :path
+        ) THEN 'everyone'
+        WHEN :email <> '' AND EXISTS (
+            SELECT 1 FROM url_groups g JOIN urls u ON u.url_group_id = g.group_id
+            WHERE g.name = 'Authenticated' AND g.protected = 1 AND g.app_id = a.app_id AND u.path = :path
+        ) THEN 'authenticated'
+        WHEN EXISTS (
+            SELECT 1 FROM users u
+            JOIN user_group_members m ON m.user_id = u.user_id
+            JOIN user_groups g ON g.group_id = m.user_group_id
+            WHERE u.email = :email AND g.name = 'Internal User Group' AND g.protected = 1
+        ) THEN 'internal'
+        WHEN EXISTS (
+            SELECT 1 FROM users u
+            JOIN user_group_members m ON m.user_id = u.user_id
+            JOIN user_group_url_group_associations a2 ON a2.user_group_id = m.user_group_id
+            JOIN url_groups g ON g.group_id = a2.url_group_id
+            JOIN urls p ON p.url_group_id = g.group_id
+            WHERE u.email = :email AND p.path = :path AND g.app_id = a.app_id
+        ) THEN 'group'
+    END AS reason
+    FROM applications a
+    WHERE a.host = :host
+""")
+
+# The same decision for an application chosen by id instead of host
+APP_ID_DECISION_STMT = text(APP_DECISION_STMT.text.replace("WHERE a.host = :host", "WHERE a.app_id = :app_id"))
+
+PATH_DECISION_STMT = text("""
+    SELECT CASE
+        WHEN EXISTS (
+            SELECT 1 FROM url_groups g JOIN urls u ON u.url_group_id = g.group_id
+            WHERE g.name = 'Everyone' AND g.protected = 1 AND u.path = :path
+        ) THEN 'everyone'
+        WHEN :email <> '' AND EXISTS (
+            SELECT 1 FROM url_groups g JOIN urls u ON u.url_group_id = g.group_id
+            WHERE g.name = 'Authenticated' AND g.protected = 1 AND u.path = :path
+        ) THEN 'authenticated'
+        WHEN EXISTS (
+            SELECT 1 FROM users u
+            JOIN user_group_members m ON m.user_id = u.user_id
+            JOIN user_groups g ON g.group_id = m.user_group_id
+            WHERE u.email = :email AND g.name = 'Internal User Group' AND g.protected = 1
+        ) THEN 'internal'
+        WHEN EXISTS (
+            SELECT 1 FROM users u
+            JOIN user_group_members m ON m.user_id = u.user_id
+            JOIN user_group_url_group_associations a ON a.user_group_id = m.user_group_id
+            JOIN url_groups g ON g.group_id = a.url_group_id
+            JOIN urls p ON p.url_group_id = g.group_id
+            WHERE u.email = :email AND p.path = :path
+        ) THEN 'group'
+    END AS reason
+""")
+
 # Web asset file extensions that should bypass authentication/authorization checks
 ALLOWED_WEB_ASSET_EXTENSIONS = os.getenv("ALLOWED_WEB_ASSET_EXTENSIONS", "css,js,png,jpg,jpeg,gif,svg,ico,woff,woff2,ttf,eot,map").split(",")
 
@@ -35,12 +145,12 @@ def is_web_asset(url_path: str) -> bool:
     
     # Remove query parameters and fragments
     clean_path = url_path.split('?')[0].split('#')[0]
-    logger.debug(f"Checking if '{clean_path}' is a web asset")
+    logger.debug("Checking if '%s' is a web asset", clean_path)
     
     # Extract file extension from URL path
     path_parts = clean_path.split('.')
     if len(path_parts) < 2:
-        logger.debug(f"No file extension found in '{clean_path}', not a web asset")
+        logger.debug("No file extension found in '%s', not a web asset", clean_path)
         return False
     
     file_extension = path_parts[-1].lower()
@@ -48,9 +158,9 @@ def is_web_asset(url_path: str) -> bool:
     is_asset = file_extension in allowed_extensions
     
     if is_asset:
-        logger.debug(f"'{clean_path}' is a web asset (extension: {file_extension})")
+        logger.debug("'%s' is a web asset (extension: %s)", clean_path, file_extension)
     else:
-        logger.debug(f"'{clean_path}' is not a web asset (extension: {file_extension}, allowed: {allowed_extensions})")
+        logger.debug("'%s' is not a web asset (extension: %s, allowed: %s)", clean_path, file_extension, allowed_extensions)
     
     return is_asset
 
@@ -70,150 +180,134 @@ async def is_user_allowed_full_url(session: AsyncSession, email: str, full_url:
     """
     Check if user is allowed to access a full URL (including scheme and host).
     This function handles application-based authorization by matching the host.
+
+    Concurrent checks for the same (email, host, path) share a single evaluation,
+    which runs on its own connection from the session's engine and gives up
+    after AUTHORIZE_QUERY_TIMEOUT. While the database is failing,
+    decisions come from the circuit breaker's last known good ones. Every
+    decision is counted, and a sample of them logged, by app.decisionlog, and
+    recorded in the audit log (app.audit).
     """
-    logger.info(f"Checking authorization for user '{sanitize_email(email)}' accessing URL '{full_url}'")
+    logger.debug("Checking authorization for user '%s' accessing URL '%s'", MaskedEmail(email), full_url)
     
     scheme, host, path = parse_full_url(full_url)
     
     # Check if URL is a web asset (should bypass auth)
     if is_web_asset(path):
-        logger.info(f"URL '{full_url}' is a web asset, allowing access")
-        return True
-    
-    # If we have a host, check if it matches any application
-    if host:
-        app = await get_application_by_host(session, host)
-        if app:
-            logger.info(f"Found application '{app.name}' for host '{host}'")
-            # For application URLs, we need to check if the path is allowed
-            return await is_user_allowed_for_application(session, email, path, app.app_id)
-        else:
-            logger.warning(f"No application found for host '{host}', denying access")
-            return False
-    
-    # If no host (relative path), fall back to the original logic
-    logger.info(f"No host in URL '{full_url}', using path-based authorization")
-    return await is_user_allowed(session, email, path)
+        decision = WEB_ASSET
+    else:
+        key = (email, host, path)
+        # The breaker runs inside the shared evaluation, so one failure counts
+        # once however many requests were waiting on it
+        decision = await authorize_flight.do(
+            key,
+            lambda: authorize_breaker.call(
+                key,
+                lambda: authorize_breaker.with_timeout(_evaluate_full_url(session, email, host, path)),
+                probe=_probe_database,
+            ),
+        )
+    _record(decision, email, host, path)
+    return decision.allowed
+
+def record_decision_from_memory(email: str, full_url: str, allowed: bool, rule: str) -> None:
+    """Count and audit a decision the authorize route made without the database (``shed`` or ``unavailable``)."""
+    scheme, host, path = parse_full_url(full_url)
+    _record(Decision(allowed, rule), email, host, path)
+
+def _record(decision: Decision, email: str, host: str, path: str) -> None:
+    decision_log.record(decision, email, host, path)
+    audit_log.record(decision, email, host, path)
+
+def _probe_database():
+    # Not through the request's session, which must not outlive the request
+    return ping(get_read_engine() or get_engine())
+
+async def _evaluate_full_url(session: AsyncSession, email: str, host: str, path: str) -> Decision:
+    # Requests coalesced onto this evaluation must not depend on the first
+    # caller's session and transaction, so it checks out a connection of its
+    # own from the same engine (the read replica or SQLite read pool when the
+    # request was routed there)
+    async with cancellable_connection(session.bind) as conn:
+        params = {"email": email, "path": path}
+        # If we have a host, check if it matches any application
+        if host:
+            row = (await conn.execute(APP_DECISION_STMT, {**params, "host": host})).first()
+            if row is None:
+                logger.debug("No application found for host '%s'", host)
+                return UNKNOWN_HOST
+            return _decided(row.reason, row.name, host, path)
+
+        # If no host (relative path), fall back to the original logic
+        row = (await conn.execute(PATH_DECISION_STMT, params)).first()
+        return _decided(row.reason, NO_APP, "", path)
+
+async def warm_authorization(session: AsyncSession) -> None:
+    """Run the decision statements once, with parameters that match nothing.
+
+    This compiles them and checks the read path works. No policy data is loaded.
+    """
+    params = {"email": "", "path": ""}
+    await session.execute(APP_DECISION_STMT, {**params, "host": ""})
+    await session.execute(PATH_DECISION_STMT, params)
+
+def _decided(reason: Optional[str], app: str, host: str, path: str) -> Decision:
+    """The decision for a reason returned by one of the *_DECISION_STMT statements."""
+    if reason == "everyone":
+        remember_public_url(host, path)
+    return Decision(reason is not None, reason or "no_match", app)
 
-async def is_user_allowed_for_application(session: AsyncSession, email: str, path: str, app_id: int) -> bool:
+async def is_user_allowed_for_application(session: AsyncSession, email: str, path: str, app_id: int, host: str = "") -> bool:
     """
     Check if user is allowed to access a path within a specific application.
     This function only checks URL groups that belong to the specified application.
+    It applies the same rules as is_user_allowed_full_url, without coalescing,
+    the circuit breaker or the decision and audit logs.
     """
-    logger.info(f"Checking application-specific authorization for user '{sanitize_email(email)}' accessing path '{path}' in app ID {app_id}")
-    
-    # Check if URL is in 'Everyone' group for this application
-    logger.debug("Checking if URL is in 'Everyone' group for this application")
-    q = (
-        select(UrlGroup)
-        .join(Url, UrlGroup.group_id == Url.url_group_id)
-        .where(
-            UrlGroup.name == "Everyone", 
-            UrlGroup.protected == 1, 
-            UrlGroup.app_id == app_id,
-            Url.path == path
-        )
-    )
-    result = await session.execute(q)
-    if result.scalar_one_or_none():
-        logger.info(f"URL '{path}' is in 'Everyone' group for app {app_id}, allowing access")
-        return True
-
-    # Check if URL is in 'Authenticated' group for this application
-    logger.debug("Checking if URL is in 'Authenticated' group for this application")
-    q = (
-        select(UrlGroup)
-        .join(Url, UrlGroup.group_id == Url.url_group_id)
-        .where(
-            UrlGroup.name == "Authenticated", 
-            UrlGroup.protected == 1, 
-            UrlGroup.app_id == app_id,
-            Url.path == path
-        )
-    )
-    result = await session.execute(q)
-    if result.scalar_one_or_none() and email:
-        logger.info(f"URL '{path}' is in 'Authenticated' group for app {app_id} and user '{sanitize_email(email)}' is logged in, allowing access")
-        return True
-
-    # Check if user is in Internal User Group (superuser)
-    logger.debug("Checking if user is in 'Internal User Group'")
-    q = (
-        select(User)
-        .join(user_group_members, User.user_id == user_group_members.c.user_id)
-        .join(UserGroup, user_group_members.c.user_group_id == UserGroup.group_id)
-        .where(User.email == email, UserGroup.name == "Internal User Group", UserGroup.protected == 1)
-    )
-    result = await session.execute(q)
-    if result.scalar_one_or_none():
-        logger.info(f"User '{sanitize_email(email)}' is in 'Internal User Group', allowing access to '{path}' in app {app_id}")
-        return True
-
-    # Default: normal group-based check within the application
-    logger.debug("Performing normal group-based authorization check within application")
-    q = (
-        select(User)
-        .join(user_group_members, User.user_id == user_group_members.c.user_id)
-        .join(UserGroup, user_group_members.c.user_group_id == UserGroup.group_id)
-        .join(user_group_url_group_associations, UserGroup.group_id == user_group_url_group_associations.c.user_group_id)
-        .join(UrlGroup, user_group_url_group_associations.c.url_group_id == UrlGroup.group_id)
-        .join(Url, UrlGroup.group_id == Url.url_group_id)
-        .where(
-            and_(
-                User.email == email, 
-                Url.path == path,
-                UrlGroup.app_id == app_id
-            )
-        )
-    )
-    result = await session.execute(q)
-    user_found = result.scalar_one_or_none() is not None
-    
-    if user_found:
-        logger.info(f"User '{sanitize_email(email)}' has access to '{path}' in app {app_id} through group membership")
-    else:
-        logger.warning(f"User '{sanitize_email(email)}' denied access to '{path}' in app {app_id} - no matching group permissions found")
-    
-    return user_found
+    row = (await session.execute(APP_ID_DECISION_STMT, {"email": email, "path": path, "app_id": app_id})).first()
+    if row is None:
+        logger.debug("No application found with ID %s", app_id)
+        return False
+    return _decided(row.reason, row.name, host, path).allowed
 
 # User CRUD
 async def create_user(session: AsyncSession, email: str) -> User:
-    logger.info(f"Creating new user with email: {sanitize_email(email)}")
+    logger.info("Creating new user with email: %s", MaskedEmail(email))
     user = User(email=email)
     session.add(user)
     await session.commit()
     await session.refresh(user)
-    logger.info(f"Created user with ID: {user.user_id}")
+    logger.info("Created user with ID: %s", user.user_id)
     return user
 
 async def get_user(session: AsyncSession, email: str) -> Optional[User]:
-    logger.debug(f"Looking up user with email: {sanitize_email(email)}")
+    logger.debug("Looking up user with email: %s", MaskedEmail(email))
     result = await session.execute(select(User).where(User.email == email))
     user = result.scalar_one_or_none()
     if user:
-        logger.debug(f"Found user with ID: {user.user_id}")
+        logger.debug("Found user with ID: %s", user.user_id)
     else:
-        logger.debug(f"User not found for email: {sanitize_email(email)}")
+        logger.debug("User not found for email: %s", MaskedEmail(email))
     return user
 
 # UserGroup CRUD
 async def create_user_group(session: AsyncSession, name: str) -> UserGroup:
-    logger.info(f"Creating new user group: {name}")
+    logger.info("Creating new user group: %s", name)
     group = UserGroup(name=name)
     session.add(group)
     await session.commit()
     await session.refresh(group)
-    logger.info(f"Created user group with ID: {group.group_id}")
+    logger.info("Created user group with ID: %s", group.group_id)
     return group
 
 async def get_user_group(session: AsyncSession, group_id: int) -> Optional[UserGroup]:
-    logger.debug(f"Looking up user group with ID: {group_id}")
+    logger.debug("Looking up user group with ID: %s", group_id)
     result = await session.execute(select(UserGroup).where(UserGroup.group_id == group_id))
     group = result.scalar_one_or_none()
     if group:
-        logger.debug(f"Found user group: {group.name}")
+        logger.debug("Found user group: %s", group.name)
     else:
-        logger.debug(f"User group not found for ID: {group_id}")
+        logger.debug("User group not found for ID: %s", group_id)
     return group
 
 async def get_all_user_groups(session: AsyncSession) -> List[UserGroup]:
@@ -221,24 +315,24 @@ async def get_all_user_groups(session: AsyncSession) -> List[UserGroup]:
     logger.debug("Fetching all user groups")
     result = await session.execute(select(UserGroup).order_by(UserGroup.name))
     groups = result.scalars().all()
-    logger.debug(f"Found {len(groups)} user groups")
+    logger.debug("Found %s user groups", len(groups))
     return groups
 
 async def get_user_count_in_group(session: AsyncSession, group_id: int) -> int:
     """Get the number of users in a user group."""
-    logger.debug(f"Counting users in group {group_id}")
+    logger.debug("Counting users in group %s", group_id)
     from sqlalchemy import func
     result = await session.execute(
         select(func.count(user_group_members.c.user_id))
         .where(user_group_members.c.user_group_id == group_id)
     )
     count = result.scalar()
-    logger.debug(f"Found {count} users in group {group_id}")
+    logger.debug("Found %s users in group %s", count, group_id)
     return count
 
 async def get_users_in_group(session: AsyncSession, group_id: int) -> List[str]:
     """Get all user emails in a user group."""
-    logger.debug(f"Fetching users in group {group_id}")
+    logger.debug("Fetching users in group %s", group_id)
     from sqlalchemy import text
     result = await session.execute(text("""
         SELECT u.email 
@@ -248,12 +342,81 @@ async def get_users_in_group(session: AsyncSession, group_id: int) -> List[str]:
         ORDER BY u.email
     """), {"group_id": group_id})
     users = [row.email for row in result.fetchall()]
-    logger.debug(f"Found {len(users)} users in group {group_id}")
+    logger.debug("Found %s users in group %s", len(users), group_id)
     return users
 
+def _prefix(q: Optional[str]) -> Optional[str]:
+    """LIKE pattern for a prefix search, so an index on the column can be used."""
+    q = (q or "").strip()
+    if not q:
+        return None
+    return q.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+
+async def get_users_in_group_page(session: AsyncSession, group_id: int, q: Optional[str] = None, cursor: Optional[str] = None) -> Page:
+    """One page of member emails, ordered by email, optionally filtered by email prefix."""
+    stmt = (
+        select(User.email)
+        .join(user_group_members, User.user_id == user_group_members.c.user_id)
+        .where(user_group_members.c.user_group_id == group_id)
+    )
+    pattern = _prefix(q)
+    if pattern:
+        stmt = stmt.where(User.email.like(pattern, escape="\\"))
+    page = await keyset_page(session, stmt, [User.email], cursor)
+    page.items = [row.email for row in page.items]
+    return page
+
+async def get_associations_page(
+    session: AsyncSession,
+    sort: str = "user_group",
+    order: str = "asc",
+    q: Optional[str] = None,
+    cursor: Optional[str] = None,
+) -> Page:
+    """One page of (user group, URL group) associations sorted by either group name.
+
+    ``q`` is a prefix match on the group name being sorted by, so the search and
+    the order can both use that name's index.
+    """
+    url_group = UrlGroup.__table__.alias("ugg")
+    assoc = user_group_url_group_associations
+    sort_column = url_group.c.name if sort == "url_group" else UserGroup.name
+    stmt = (
+        select(
+            sort_column.label("sort_name"),
+            assoc.c.user_group_id,
+            assoc.c.url_group_id,
+            UserGroup.name.label("user_group_name"),
+            url_group.c.name.label("url_group_name"),
+        )
+        .join(UserGroup, assoc.c.user_group_id == UserGroup.group_id)
+        .join(url_group, assoc.c.url_group_id == url_group.c.group_id)
+    )
+    pattern = _prefix(q)
+    if pattern:
+        stmt = stmt.where(sort_column.like(pattern, escape="\\"))
+    keys = [sort_column, assoc.c.user_group_id, assoc.c.url_group_id]
+    return await keyset_page(session, stmt, keys, cursor, descending=(order == "desc"))
+
+async def get_url_groups_page(session: AsyncSession, q: Optional[str] = None, cursor: Optional[str] = None) -> Page:
+    """One page of URL groups (name, id, protected), ordered by name, optionally filtered by name prefix."""
+    # Leads with the name so the page is a range scan of the url_groups name index
+    stmt = select(UrlGroup.name, UrlGroup.group_id, UrlGroup.protected)
+    pattern = _prefix(q)
+    if pattern:
+        stmt = stmt.where(UrlGroup.name.like(pattern, escape="\\"))
+    return await keyset_page(session, stmt, [UrlGroup.name, UrlGroup.group_id], cursor)
+
+async def get_urls_in_group_page(session: AsyncSession, group_id: int, cursor: Optional[str] = None) -> Page:
+    """One page of the paths in a URL group, ordered by path."""
+    stmt = select(Url.path).where(Url.url_group_id == group_id)
+    page = await keyset_page(session, stmt, [Url.path], cursor)
+    page.items = [row.path for row in page.items]
+    return page
+
 async def get_url_groups_for_user_group(session: AsyncSession, user_group_id: int) -> List[UrlGroup]:
     """Get all URL groups associated with a user group."""
-    logger.debug(f"Fetching URL groups for user group {user_group_id}")
+    logger.debug("Fetching URL groups for user group %s", user_group_id)
     from sqlalchemy import text
     result = await session.execute(text("""
         SELECT ug.group_id, ug.name, ug.created_at, ug.protected, ug.app_id
@@ -274,15 +437,15 @@ async def get_url_groups_for_user_group(session: AsyncSession, user_group_id: in
         )
         url_groups.append(url_group)
     
-    logger.debug(f"Found {len(url_groups)} URL groups for user group {user_group_id}")
+    logger.debug("Found %s URL groups for user group %s", len(url_groups), user_group_id)
     return url_groups
 
 async def update_user_group(session: AsyncSession, group_id: int, name: Optional[str] = None) -> Optional[UserGroup]:
     """Update a user group."""
-    logger.info(f"Updating user group {group_id}")
+    logger.info("Updating user group %s", group_id)
     group = await get_user_group(session, group_id)
     if not group:
-        logger.warning(f"User group {group_id} not found for update")
+        logger.warning("User group %s not found for update", group_id)
         return None
     
     if name is not None:
@@ -290,20 +453,20 @@ async def update_user_group(session: AsyncSession, group_id: int, name: Optional
     
     await session.commit()
     await session.refresh(group)
-    logger.info(f"Updated user group {group_id}")
+    logger.info("Updated user group %s", group_id)
     return group
 
 async def delete_user_group(session: AsyncSession, group_id: int) -> bool:
     """Delete a user group."""
-    logger.info(f"Deleting user group {group_id}")
+    logger.info("Deleting user group %s", group_id)
     group = await get_user_group(session, group_id)
     if not group:
-        logger.warning(f"User group {group_id} not found for deletion")
+        logger.warning("User group %s not found for deletion", group_id)
         return False
     
     # Prevent deletion if protected
     if getattr(group, 'protected', False):
-        logger.warning(f"Cannot delete protected user group {group_id}")
+        logger.warning("Cannot delete protected user group %s", group_id)
         return False
     
     # Only allow deletion if there are no associations
@@ -314,47 +477,47 @@ async def delete_user_group(session: AsyncSession, group_id: int) -> bool:
     )).scalar()
     
     if assoc_count > 0:
-        logger.warning(f"Cannot delete user group {group_id} with existing associations")
+        logger.warning("Cannot delete user group %s with existing associations", group_id)
         return False
     
     await session.delete(group)
     await session.commit()
-    logger.info(f"Deleted user group {group_id}")
+    logger.info("Deleted user group %s", group_id)
     return True
 
 # Add user to user group
 async def add_user_to_group(session: AsyncSession, group_id: int, email: str) -> bool:
-    logger.info(f"Adding user '{sanitize_email(email)}' to group ID: {group_id}")
+    logger.info("Adding user '%s' to group ID: %s", MaskedEmail(email), group_id)
     # First get the user by email
     user = await get_user(session, email)
     if not user:
-        logger.warning(f"User '{sanitize_email(email)}' not found, cannot add to group")
+        logger.warning("User '%s' not found, cannot add to group", MaskedEmail(email))
         return False
     
     try:
         stmt = insert(user_group_members).values(user_group_id=group_id, user_id=user.user_id)
         await session.execute(stmt)
         await session.commit()
-        logger.info(f"Successfully added user '{sanitize_email(email)}' to group ID: {group_id}")
+        logger.info("Successfully added user '%s' to group ID: %s", MaskedEmail(email), group_id)
         return True
     except IntegrityError:
         await session.rollback()
-        logger.info(f"User '{sanitize_email(email)}' is already in group ID: {group_id}")
+        logger.info("User '%s' is already in group ID: %s", MaskedEmail(email), group_id)
         return True  # Consider this a success since the user is already in the group
 
 # Application CRUD
 async def create_application(session: AsyncSession, name: str, host: str, description: Optional[str] = None) -> Application:
-    logger.info(f"Creating new application: {name} with host: {host}")
+    logger.info("Creating new application: %s with host: %s", name, host)
     try:
         app = Application(name=name, host=host, description=description)
         session.add(app)
         await session.commit()
         await session.refresh(app)
-        logger.info(f"Created application with ID: {app.app_id}")
+        logger.info("Created application with ID: %s", app.app_id)
         return app
     except IntegrityError:
         await session.rollback()
-        logger.warning(f"Failed to create application '{name}' with host '{host}' - duplicate name/host")
+        logger.warning("Failed to create application '%s' with host '%s' - duplicate name/host", name, host)
         raise ValueError(f"Application with name '{name}' or host '{host}' already exists")
 
 async def get_application(session: AsyncSession, app_id: int) -> Optional[Application]:
@@ -366,7 +529,7 @@ async def get_application_by_name(session: AsyncSession, name: str) -> Optional[
     return result.scalar_one_or_none()
 
 async def get_application_by_host(session: AsyncSession, host: str) -> Optional[Application]:
-    result = await session.execute(select(Application).where(Application.host == host))
+    result = await session.execute(APPLICATION_BY_HOST_STMT, {"host": host})
     return result.scalar_one_or_none()
 
 async def get_all_applications(session: AsyncSession) -> List[Application]:
@@ -376,38 +539,12 @@ async def get_all_applications(session: AsyncSession) -> List[Application]:
 async def get_all_applications_with_url_groups_count(session: AsyncSession) -> List[Application]:
     """Get all applications with URL groups count."""
     logger.debug("Fetching all applications with URL groups count")
-    from sqlalchemy import text
-    
-    # Get applications with URL groups count
-    result = await session.execute(
-        text("""
-            SELECT 
-                a.app_id, 
-                a.name, 
-                a.host, 
-                a.description, 
-                a.created_at,
-                COUNT(ug.group_id) as url_groups_count
-            FROM applications a
-            LEFT JOIN url_groups ug ON a.app_id = ug.app_id
-            GROUP BY a.app_id, a.name, a.host, a.description, a.created_at
-            ORDER BY a.name
-        """)
-    )
-    
-    applications = []
-    for row in result.fetchall():
-        app = Application(
-            app_id=row.app_id,
-            name=row.name,
-            host=row.host,
-            description=row.description,
-            created_at=row.created_at
-        )
-        app.url_groups_count = row.url_groups_count
-        applications.append(app)
-    
-    logger.debug(f"Found {len(applications)} applications with URL groups count")
+    applications = await get_all_applications(session)
+    # Counts come from the stats cache instead of a join per page load
+    counts = await get_url_group_counts(session)
+    for app in applications:
+        app.url_groups_count = counts.get(app.app_id, 0)
+    logger.debug("Found %s applications with URL groups count", len(applications))
     return applications
 
 async def update_application(session: AsyncSession, app_id: int, name: Optional[str] = None, host: Optional[str] = None, description: Optional[str] = None) -> Optional[Application]:
@@ -441,145 +578,90 @@ async def delete_application(session: AsyncSession, app_id: int) -> bool:
 
 # UrlGroup CRUD
 async def create_url_group(session: AsyncSession, name: str, app_id: Optional[int] = None) -> UrlGroup:
-    logger.info(f"Creating new URL group: {name} for application ID: {app_id}")
+    logger.info("Creating new URL group: %s for application ID: %s", name, app_id)
     try:
         group = UrlGroup(name=name, app_id=app_id)
         session.add(group)
         await session.commit()
         await session.refresh(group)
-        logger.info(f"Created URL group with ID: {group.group_id}")
+        logger.info("Created URL group with ID: %s", group.group_id)
         return group
     except IntegrityError:
         await session.rollback()
-        logger.warning(f"Failed to create URL group '{name}' for application ID {app_id} - duplicate name")
+        logger.warning("Failed to create URL group '%s' for application ID %s - duplicate name", name, app_id)
         raise ValueError(f"URL group with name '{name}' already exists for this application")
 
 async def get_url_group(session: AsyncSession, group_id: int) -> Optional[UrlGroup]:
-    logger.debug(f"Looking up URL group with ID: {group_id}")
+    logger.debug("Looking up URL group with ID: %s", group_id)
     result = await session.execute(select(UrlGroup).where(UrlGroup.group_id == group_id))
     group = result.scalar_one_or_none()
     if group:
-        logger.debug(f"Found URL group: {group.name}")
+        logger.debug("Found URL group: %s", group.name)
     else:
-        logger.debug(f"URL group not found for ID: {group_id}")
+        logger.debug("URL group not found for ID: %s", group_id)
     return group
 
 async def list_url_groups_by_application(session: AsyncSession, app_id: Optional[int] = None) -> List[UrlGroup]:
-    logger.debug(f"Listing URL groups for application ID: {app_id}")
+    logger.debug("Listing URL groups for application ID: %s", app_id)
     if app_id is None:
         # Get URL groups that don't belong to any application (system groups)
         result = await session.execute(select(UrlGroup).where(UrlGroup.app_id.is_(None)).order_by(UrlGroup.name))
     else:
         result = await session.execute(select(UrlGroup).where(UrlGroup.app_id == app_id).order_by(UrlGroup.name))
     groups = result.scalars().all()
-    logger.debug(f"Found {len(groups)} URL groups")
+    logger.debug("Found %s URL groups", len(groups))
     return groups
 
 # Add URL to URL group
 async def add_url_to_group(session: AsyncSession, group_id: int, path: str) -> bool:
-    logger.info(f"Adding URL '{path}' to group ID: {group_id}")
+    logger.info("Adding URL '%s' to group ID: %s", path, group_id)
     url = Url(path=path, url_group_id=group_id)
     session.add(url)
     await session.commit()
-    logger.info(f"Successfully added URL '{path}' to group ID: {group_id}")
+    logger.info("Successfully added URL '%s' to group ID: %s", path, group_id)
     return True
 
 # Link user group to url group
 async def link_user_group_to_url_group(session: AsyncSession, user_group_id: int, url_group_id: int) -> bool:
-    logger.info(f"Linking user group ID: {user_group_id} to URL group ID: {url_group_id}")
+    logger.info("Linking user group ID: %s to URL group ID: %s", user_group_id, url_group_id)
     try:
         stmt = insert(user_group_url_group_associations).values(user_group_id=user_group_id, url_group_id=url_group_id)
         await session.execute(stmt)
         await session.commit()
-        logger.info(f"Successfully linked user group ID: {user_group_id} to URL group ID: {url_group_id}")
+        logger.info("Successfully linked user group ID: %s to URL group ID: %s", user_group_id, url_group_id)
         return True
     except IntegrityError:
         await session.rollback()
-        logger.info(f"User group ID: {user_group_id} is already linked to URL group ID: {url_group_id}")
+        logger.info("User group ID: %s is already linked to URL group ID: %s", user_group_id, url_group_id)
         return True  # Consider this a success since the association already exists
 
 # Authorization check
 async def is_user_allowed(session: AsyncSession, email: str, url_path: str) -> bool:
-    logger.info(f"Checking authorization for user '{sanitize_email(email)}' accessing path '{url_path}'")
-    
-    # Check if URL is a web asset (should bypass auth)
+    """
+    Check if user is allowed to access a path in any application. Applies the
+    same rules as is_user_allowed_full_url for a relative path, without
+    coalescing, the circuit breaker or the decision and audit logs.
+    """
     if is_web_asset(url_path):
-        logger.info(f"URL '{url_path}' is a web asset, allowing access")
         return True
-    
-    # Check if URL is in 'Everyone' group (public)
-    logger.debug("Checking if URL is in 'Everyone' group")
-    q = (
-        select(UrlGroup)
-        .join(Url, UrlGroup.group_id == Url.url_group_id)
-        .where(UrlGroup.name == "Everyone", UrlGroup.protected == 1, Url.path == url_path)
-    )
-    result = await session.execute(q)
-    if result.scalar_one_or_none():
-        logger.info(f"URL '{url_path}' is in 'Everyone' group, allowing access")
-        return True
-
-    # Check if URL is in 'Authenticated' group (any logged-in user)
-    logger.debug("Checking if URL is in 'Authenticated' group")
-    q = (
-        select(UrlGroup)
-        .join(Url, UrlGroup.group_id == Url.url_group_id)
-        .where(UrlGroup.name == "Authenticated", UrlGroup.protected == 1, Url.path == url_path)
-    )
-    result = await session.execute(q)
-    if result.scalar_one_or_none() and email:
-        logger.info(f"URL '{url_path}' is in 'Authenticated' group and user '{sanitize_email(email)}' is logged in, allowing access")
-        return True
-
-    # Check if user is in Internal User Group (superuser)
-    logger.debug("Checking if user is in 'Internal User Group'")
-    q = (
-        select(User)
-        .join(user_group_members, User.user_id == user_group_members.c.user_id)
-        .join(UserGroup, user_group_members.c.user_group_id == UserGroup.group_id)
-        .where(User.email == email, UserGroup.name == "Internal User Group", UserGroup.protected == 1)
-    )
-    result = await session.execute(q)
-    if result.scalar_one_or_none():
-        logger.info(f"User '{sanitize_email(email)}' is in 'Internal User Group', allowing access to '{url_path}'")
-        return True
-
-    # Default: normal group-based check
-    logger.debug("Performing normal group-based authorization check")
-    q = (
-        select(User)
-        .join(user_group_members, User.user_id == user_group_members.c.user_id)
-        .join(UserGroup, user_group_members.c.user_group_id == UserGroup.group_id)
-        .join(user_group_url_group_associations, UserGroup.group_id == user_group_url_group_associations.c.user_group_id)
-        .join(UrlGroup, user_group_url_group_associations.c.url_group_id == UrlGroup.group_id)
-        .join(Url, UrlGroup.group_id == Url.url_group_id)
-        .where(and_(User.email == email, Url.path == url_path))
-    )
-    result = await session.execute(q)
-    user_found = result.scalar_one_or_none() is not None
-    
-    if user_found:
-        logger.info(f"User '{sanitize_email(email)}' has access to '{url_path}' through group membership")
-    else:
-        logger.warning(f"User '{sanitize_email(email)}' denied access to '{url_path}' - no matching group permissions found")
-    
-    return user_found
+    row = (await session.execute(PATH_DECISION_STMT, {"email": email, "path": url_path})).first()
+    return _decided(row.reason, NO_APP, "", url_path).allowed
 
 async def get_url(session: AsyncSession, path: str) -> Optional[Url]:
-    logger.debug(f"Looking up URL with path: {path}")
+    logger.debug("Looking up URL with path: %s", path)
     result = await session.execute(select(Url).where(Url.path == path))
     url = result.scalar_one_or_none()
     if url:
-        logger.debug(f"Found URL with ID: {url.url_id} in group ID: {url.url_group_id}")
+        logger.debug("Found URL with ID: %s in group ID: %s", url.url_id, url.url_group_id)
     else:
-        logger.debug(f"URL not found for path: {path}")
+        logger.debug("URL not found for path: %s", path)
     return url
 
 async def create_url(session: AsyncSession, path: str, url_group_id: int) -> Url:
-    logger.info(f"Creating new URL '{path}' in group ID: {url_group_id}")
+    logger.info("Creating new URL '%s' in group ID: %s", path, url_group_id)
     url = Url(path=path, url_group_id=url_group_id)
     session.add(url)
     await session.commit()
     await session.refresh(url)
-    logger.info(f"Created URL with ID: {url.url_id}")
+    logger.info("Created URL with ID: %s", url.url_id)
     return url
@@ -1,6 +1,16 @@
+import asyncio
 import os
+import time
+from contextvars import ContextVar
+from typing import Optional
+from fastapi import Depends, Request
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from sqlalchemy.engine import make_url
 from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 from sqlalchemy.orm import declarative_base
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from sqlalchemy.util.queue import AsyncAdaptedQueue, Empty
 
 DATABASE_URL = os.getenv(
     "DATABASE_URL",
@@ -15,14 +25,164 @@ if DATABASE_URL is None:
 if DATABASE_URL and DATABASE_URL.startswith("mysql+pymysql://"):
     DATABASE_URL = DATABASE_URL.replace("mysql+pymysql://", "mysql+aiomysql://")
 
+# Optional read replica for authorization checks, the dashboard and list pages
+DATABASE_READ_URL = os.getenv("DATABASE_READ_URL") or None
+if DATABASE_READ_URL and DATABASE_READ_URL.startswith("mysql+pymysql://"):
+    DATABASE_READ_URL = DATABASE_READ_URL.replace("mysql+pymysql://", "mysql+aiomysql://")
+
+# Per-dialect pool defaults; any of them can be overridden with the DB_* settings below.
+# SQLite serialises writers anyway, so a small pool is enough. Networked databases
+# get pre-ping and a recycle interval below typical server/proxy idle timeouts.
+_DIALECT_DEFAULTS = {
+    "sqlite": {"pool_size": 5, "max_overflow": 5, "pool_timeout": 30, "pool_recycle": -1, "pool_pre_ping": False},
+    "mysql": {"pool_size": 10, "max_overflow": 20, "pool_timeout": 10, "pool_recycle": 1800, "pool_pre_ping": True},
+    "postgresql": {"pool_size": 10, "max_overflow": 20, "pool_timeout": 10, "pool_recycle": 1800, "pool_pre_ping": True},
+}
+
+def _env_bool(name: str, default: bool) -> bool:
+    value = os.getenv(name)
+    if value is None or value == "":
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+def _env_int(name: str, default: int) -> int:
+    value = os.getenv(name)
+    return int(value) if value not in (None, "") else default
+
+
+class PoolStats:
+    """Counters for connection checkouts from an instrumented pool."""
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.checkouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.timeouts = 0
+
+    def record_wait(self, seconds: float):
+        self.checkouts += 1
+        self.wait_total += seconds
+        if seconds > self.wait_max:
+            self.wait_max = seconds
+
+
+class _TimedQueue(AsyncAdaptedQueue):
+    """Pool queue that records how long checkouts wait for a returned connection."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.stats = PoolStats()
+
+    def get(self, block=True, timeout=None):
+        start = time.perf_counter()
+        try:
+            connection = super().get(block, timeout)
+        except Empty:
+            # A non-blocking miss only means the pool may grow instead
+            if block:
+                self.stats.timeouts += 1
+            raise
+        self.stats.record_wait(time.perf_counter() - start)
+        return connection
+
+
+class InstrumentedAsyncQueuePool(AsyncAdaptedQueuePool):
+    """Queue pool that records how long each checkout waited for a connection.
+
+    Only the wait in the pool's queue is timed. A checkout that grows the pool
+    records no wait, so the time spent connecting is not reported as contention.
+    """
+
+    _queue_class = _TimedQueue
+
+    @property
+    def stats(self) -> PoolStats:
+        return self._pool.stats
+
+    def _create_connection(self):
+        self.stats.record_wait(0.0)
+        return super()._create_connection()
+
+
+def engine_options(database_url: str) -> dict:
+    """Build create_async_engine() keyword arguments from settings and dialect defaults.
+
+    Settings: DB_ECHO, DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_TIMEOUT, DB_POOL_RECYCLE,
+    DB_POOL_PRE_PING and DB_STATEMENT_TIMEOUT_MS (MySQL and PostgreSQL only).
+    """
+    url = make_url(database_url)
+    backend = url.get_backend_name()
+    options = {"echo": _env_bool("DB_ECHO", False), "future": True}
+
+    # In-memory SQLite must keep its single static connection
+    if backend == "sqlite" and url.database in (None, "", ":memory:"):
+        return options
+
+    defaults = _DIALECT_DEFAULTS.get(backend, _DIALECT_DEFAULTS["mysql"])
+    options.update(
+        poolclass=InstrumentedAsyncQueuePool,
+        pool_size=_env_int("DB_POOL_SIZE", defaults["pool_size"]),
+        max_overflow=_env_int("DB_MAX_OVERFLOW", defaults["max_overflow"]),
+        pool_timeout=_env_int("DB_POOL_TIMEOUT", defaults["pool_timeout"]),
+        pool_recycle=_env_int("DB_POOL_RECYCLE", defaults["pool_recycle"]),
+        pool_pre_ping=_env_bool("DB_POOL_PRE_PING", defaults["pool_pre_ping"]),
+    )
+
+    statement_timeout_ms = _env_int("DB_STATEMENT_TIMEOUT_MS", 0)
+    if statement_timeout_ms > 0:
+        if backend == "mysql":
+            # Applies to read-only SELECT statements, which is what the hot path runs
+            options["connect_args"] = {"init_command": f"SET SESSION max_execution_time={statement_timeout_ms}"}
+        elif backend == "postgresql":
+            options["connect_args"] = {"server_settings": {"statement_timeout": str(statement_timeout_ms)}}
+    return options
+
+# SQLite production mode: WAL journaling so admin writes do not block authorize
+# reads, plus connect-time pragmas and a separate pool of read-only connections.
+SQLITE_TUNING = _env_bool("SQLITE_TUNING", False)
+SQLITE_MMAP_SIZE = _env_int("SQLITE_MMAP_SIZE", 256 * 1024 * 1024)
+SQLITE_CACHE_SIZE = _env_int("SQLITE_CACHE_SIZE", -64 * 1024)  # negative = KiB
+SQLITE_BUSY_TIMEOUT_MS = _env_int("SQLITE_BUSY_TIMEOUT_MS", 5000)
+SQLITE_READ_POOL_SIZE = _env_int("SQLITE_READ_POOL_SIZE", 4)
+
+def is_sqlite_file(database_url: str) -> bool:
+    url = make_url(database_url)
+    return url.get_backend_name() == "sqlite" and url.database not in (None, "", ":memory:")
+
+def sqlite_pragmas(read_only: bool = False) -> list:
+    """Pragmas run on every new SQLite connection in tuning mode."""
+    pragmas = [
+        f"PRAGMA mmap_size={SQLITE_MMAP_SIZE}",
+        f"PRAGMA cache_size={SQLITE_CACHE_SIZE}",
+        f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}",
+    ]
+    if read_only:
+        return pragmas + ["PRAGMA query_only=ON"]
+    return ["PRAGMA journal_mode=WAL", "PRAGMA synchronous=NORMAL"] + pragmas
+
+def install_sqlite_pragmas(engine, pragmas: list) -> None:
+    @event.listens_for(engine.sync_engine, "connect")
+    def _apply_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for pragma in pragmas:
+            cursor.execute(pragma)
+        cursor.close()
+
 # Defer engine creation to avoid import issues during migrations
 _engine = None
 _async_session = None
+_read_engine = None
+_read_session = None
 
 def get_engine():
     global _engine
     if _engine is None:
-        _engine = create_async_engine(DATABASE_URL, echo=True, future=True)
+        _engine = create_async_engine(DATABASE_URL, **engine_options(DATABASE_URL))
+        if SQLITE_TUNING and is_sqlite_file(DATABASE_URL):
+            install_sqlite_pragmas(_engine, sqlite_pragmas())
     return _engine
 
 def get_async_session_maker():
@@ -31,9 +191,145 @@ def get_async_session_maker():
         _async_session = async_sessionmaker(get_engine(), expire_on_commit=False, class_=AsyncSession)
     return _async_session
 
+def get_read_engine():
+    """Engine for read-only work, or None when reads should use the primary engine."""
+    global _read_engine
+    if _read_engine is None and DATABASE_READ_URL:
+        _read_engine = create_async_engine(DATABASE_READ_URL, **engine_options(DATABASE_READ_URL))
+        if SQLITE_TUNING and is_sqlite_file(DATABASE_READ_URL):
+            install_sqlite_pragmas(_read_engine, sqlite_pragmas(read_only=True))
+    elif _read_engine is None and SQLITE_TUNING and is_sqlite_file(DATABASE_URL):
+        # Make sure the primary engine exists first so WAL mode is set before readers connect
+        get_engine()
+        options = engine_options(DATABASE_URL)
+        options.update(pool_size=SQLITE_READ_POOL_SIZE, max_overflow=0)
+        _read_engine = create_async_engine(DATABASE_URL, **options)
+        install_sqlite_pragmas(_read_engine, sqlite_pragmas(read_only=True))
+    return _read_engine
+
+def get_read_session_maker():
+    global _read_session
+    if _read_session is None and get_read_engine() is not None:
+        _read_session = async_sessionmaker(get_read_engine(), expire_on_commit=False, class_=AsyncSession)
+    return _read_session
+
+def pool_status(engine) -> dict:
+    """Occupancy and checkout wait statistics for an engine's pool."""
+    pool = engine.sync_engine.pool
+    status = {}
+    stats = getattr(pool, "stats", None)
+    if stats is not None:
+        status.update(
+            checkouts=stats.checkouts,
+            wait_avg_ms=round(stats.wait_total / stats.checkouts * 1000, 3) if stats.checkouts else 0.0,
+            wait_max_ms=round(stats.wait_max * 1000, 3),
+            timeouts=stats.timeouts,
+        )
+    if isinstance(pool, AsyncAdaptedQueuePool):
+        # max_overflow of -1 means unbounded, in which case saturation is not meaningful
+        max_overflow = engine_options(engine.url.render_as_string(hide_password=False)).get("max_overflow", -1)
+        capacity = pool.size() + max_overflow if pool.size() > 0 and max_overflow >= 0 else 0
+        status.update(
+            size=pool.size(),
+            checked_out=pool.checkedout(),
+            overflow=max(pool.overflow(), 0),
+            saturation=round(pool.checkedout() / capacity, 3) if capacity > 0 else 0.0,
+        )
+    return status
+
+def get_pool_status() -> dict:
+    """Pool status of every engine created so far, keyed by role."""
+    status = {}
+    if _engine is not None:
+        status["primary"] = pool_status(_engine)
+    if _read_engine is not None:
+        status["read"] = pool_status(_read_engine)
+    return status
+
 Base = declarative_base()
 
+class LazySession:
+    """Stand-in for an AsyncSession that only creates it on first use.
+
+    Routes that can answer from memory (web assets, shed requests) never build
+    a session, let alone check a connection out of the pool. Attribute access
+    is forwarded to the real session once it exists. ``replica`` marks sessions
+    on the read engine, whose data may lag behind the primary.
+    """
+
+    def __init__(self, session_maker, replica: bool = False):
+        self._session_maker = session_maker
+        self._session = None
+        self.replica = replica
+
+    @property
+    def started(self) -> bool:
+        return self._session is not None
+
+    def __getattr__(self, name):
+        if self._session is None:
+            self._session = self._session_maker()
+        return getattr(self._session, name)
+
+    async def aclose(self) -> None:
+        if self._session is not None:
+            await self._session.close()
+
 # Dependency for FastAPI
 async def get_async_session() -> AsyncSession:
-    async with get_async_session_maker()() as session:
+    session = LazySession(get_async_session_maker())
+    try:
         yield session
+    finally:
+        await session.aclose()
+
+# Read-your-writes: after a request commits on the primary, the client gets a
+# short-lived cookie that keeps its reads on the primary while the replica catches up.
+READ_AFTER_WRITE_COOKIE = "authfilter_read_primary"
+READ_AFTER_WRITE_SECONDS = _env_int("DATABASE_READ_AFTER_WRITE_SECONDS", 5)
+_request_writes: ContextVar = ContextVar("request_writes", default=None)
+
+@event.listens_for(Session, "after_commit")
+def _record_commit(session):
+    writes = _request_writes.get()
+    if writes is not None:
+        writes.append(True)
+
+def track_request_writes():
+    """Start tracking commits for the current request; returns the tracking list."""
+    writes = []
+    _request_writes.set(writes)
+    return writes
+
+# Dependency for read-only routes: a session on the read replica (or SQLite read
+# pool) when one is configured, otherwise the regular request session
+async def get_read_session(request: Request, session: AsyncSession = Depends(get_async_session)) -> AsyncSession:
+    read_session_maker = get_read_session_maker()
+    if read_session_maker is None or request.cookies.get(READ_AFTER_WRITE_COOKIE):
+        yield session
+        return
+    read_session = LazySession(read_session_maker, replica=True)
+    try:
+        yield read_session
+    finally:
+        await read_session.aclose()
+
+async def dispose_engines() -> None:
+    """Close every pooled connection; engines are recreated on next use."""
+    global _engine, _async_session, _read_engine, _read_session
+    for engine in (_read_engine, _engine):
+        if engine is not None:
+            await engine.dispose()
+    _engine = _async_session = _read_engine = _read_session = None
+
+async def prewarm_pool(engine, connections: Optional[int] = None) -> int:
+    """Open ``connections`` (default: the pool size) connections at once so the pool starts full."""
+    size = connections or getattr(engine.sync_engine.pool, "size", lambda: 1)()
+    opened = await asyncio.gather(*(engine.connect().start() for _ in range(size)), return_exceptions=True)
+    errors = [conn for conn in opened if isinstance(conn, BaseException)]
+    for conn in opened:
+        if not isinstance(conn, BaseException):
+            await conn.close()
+    if errors:
+        raise errors[0]
+    return size
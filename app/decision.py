@@ -0,0 +1,43 @@
+"""
+Slim decision-node entry point: ``uvicorn app.decision:app``.
+
+Serves only ``/api/authorize``, the OAuth2 login/callback/logout routes,
+``/api/metrics`` and the health probes. It never imports the admin UI (Jinja2
+templates, static files, the management routers, bulk import and backup), so
+it starts faster and uses less memory than ``app.main``. Run many small
+replicas of it behind the proxy and one ``app.main`` for administration.
+"""
+from dotenv import load_dotenv
+load_dotenv()
+
+import asyncio
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI
+
+from app.api.endpoints.authorize import router as authorize_router
+from app.api.endpoints.health import router as health_router
+from app.api.endpoints.metrics import router as metrics_router
+from app.api.endpoints.oauth import router as oauth_router
+from app.audit import audit_log
+from app.policy import shared_policy
+from app.logpipeline import configure_logging
+from app.startup import shutdown, warm_up, warmup_tasks
+
+configure_logging()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Decision nodes only read; schema migrations and protected group seeding
+    # are left to the admin application
+    app.state.warm_up = asyncio.create_task(warm_up(warmup_tasks()))
+    audit_log.start()
+    shared_policy.start()
+    yield
+    await shutdown(app)
+
+app = FastAPI(title="auth-filter decision node", lifespan=lifespan)
+app.include_router(authorize_router)
+app.include_router(oauth_router)
+app.include_router(metrics_router)
+app.include_router(health_router)
@@ -0,0 +1,90 @@
+"""
+Authorization decision counters and sampled decision logs.
+
+Every decision returned by ``crud.is_user_allowed_full_url`` is counted by
+application, outcome and the rule that matched, and reported in
+``/api/metrics``. Only a sample of decisions is logged, one line each:
+``AUTHORIZE_LOG_SAMPLE_ALLOW`` of allows at INFO and
+``AUTHORIZE_LOG_SAMPLE_DENY`` of denies at WARNING. Denies for paths under
+``AUTHORIZE_LOG_ALWAYS_PATHS`` (the internal and admin areas by default) are
+always logged.
+
+Rules are ``everyone``, ``authenticated``, ``internal`` and ``group`` for
+allows, ``no_match`` and ``unknown_host`` for denies, and ``web_asset``.
+Decisions the authorize route makes from memory are ``shed`` (admission
+control rejected the request) or ``unavailable`` (the database could not
+answer and no recent decision was cached), allowed or denied by
+``AUTHORIZE_SHED_MODE``.
+"""
+import logging
+import os
+import random
+from typing import Dict, List, NamedTuple, Tuple
+
+from app.utils import MaskedEmail, SanitizedLogger
+
+logger = SanitizedLogger(logging.getLogger(__name__))
+
+AUTHORIZE_LOG_SAMPLE_ALLOW = float(os.getenv("AUTHORIZE_LOG_SAMPLE_ALLOW", "0.01"))
+AUTHORIZE_LOG_SAMPLE_DENY = float(os.getenv("AUTHORIZE_LOG_SAMPLE_DENY", "0.1"))
+AUTHORIZE_LOG_ALWAYS_PATHS = tuple(
+    prefix.strip() for prefix in os.getenv("AUTHORIZE_LOG_ALWAYS_PATHS", "/admin,/internal").split(",") if prefix.strip()
+)
+
+# Label for decisions that are not made within an application
+NO_APP = "-"
+
+class Decision(NamedTuple):
+    allowed: bool
+    rule: str
+    app: str = NO_APP
+
+WEB_ASSET = Decision(True, "web_asset")
+UNKNOWN_HOST = Decision(False, "unknown_host")
+SHED = "shed"
+UNAVAILABLE = "unavailable"
+
+class DecisionLog:
+    def __init__(self, sample_allow: float, sample_deny: float, always_paths: Tuple[str, ...]):
+        self.sample_allow = sample_allow
+        self.sample_deny = sample_deny
+        self.always_paths = always_paths
+        self.counts: Dict[Tuple[str, bool, str], int] = {}
+        self.logged = 0
+
+    def record(self, decision: Decision, email: str, host: str, path: str) -> None:
+        key = (decision.app, decision.allowed, decision.rule)
+        self.counts[key] = self.counts.get(key, 0) + 1
+        if decision.allowed:
+            if random.random() >= self.sample_allow:
+                return
+            log, level = logger.info, logging.INFO
+        else:
+            if not path.startswith(self.always_paths) and random.random() >= self.sample_deny:
+                return
+            log, level = logger.warning, logging.WARNING
+        if not logger.isEnabledFor(level):
+            return
+        self.logged += 1
+        log(
+            "Authorization %s: user '%s' host '%s' path '%s' app '%s' rule %s",
+            "allowed" if decision.allowed else "denied", MaskedEmail(email), host, path, decision.app, decision.rule,
+        )
+
+    def reset(self) -> None:
+        self.counts.clear()
+        self.logged = 0
+
+    def stats(self) -> Dict[str, object]:
+        counts: List[dict] = [
+            {"app": app, "outcome": "allow" if allowed else "deny", "rule": rule, "count": count}
+            for (app, allowed, rule), count in sorted(self.counts.items())
+        ]
+        return {
+            "allowed": sum(c["count"] for c in counts if c["outcome"] == "allow"),
+            "denied": sum(c["count"] for c in counts if c["outcome"] == "deny"),
+            "logged": self.logged,
+            "counts": counts,
+        }
+
+decision_log = DecisionLog(AUTHORIZE_LOG_SAMPLE_ALLOW, AUTHORIZE_LOG_SAMPLE_DENY, AUTHORIZE_LOG_ALWAYS_PATHS)
@@ -0,0 +1,196 @@
+"""
+Non-blocking log pipeline.
+
+``configure_logging()`` installs one root handler that only puts records on a
+bounded in-memory queue. A listener thread takes them off the queue, sanitizes
+them again (``SanitizedLogger`` already has; records from plain loggers have
+not) and writes them to stderr, as one JSON object per line
+(``LOG_FORMAT=json``, the default) or as plain text (``LOG_FORMAT=text``). A
+slow stderr therefore delays the listener thread, not the event loop.
+
+Once the queue is ``LOG_QUEUE_HIGH_WATER`` full, records below WARNING are
+dropped. When it is completely full, every new record is dropped. Drops are
+counted per level and reported in ``/api/metrics``.
+
+The pipeline survives ``fork()``: each worker started by ``app.serve`` gets its
+own queue and listener thread.
+"""
+import copy
+import json
+import logging
+import os
+import queue
+import sys
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, Optional
+
+from app.utils import sanitize_log_message
+
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json").strip().lower()
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+LOG_QUEUE_HIGH_WATER = float(os.getenv("LOG_QUEUE_HIGH_WATER", "0.8"))
+
+# How long stopping waits for the listener to make room for its end marker in
+# a full queue
+LOG_STOP_TIMEOUT = 5.0
+
+# Third-party loggers that are too chatty for production below WARNING
+LIBRARY_LOGGERS = ("aiosqlite", "asyncio", "httpcore", "httpx", "multipart", "urllib3")
+
+def default_level() -> str:
+    """``LOG_LEVEL`` if set; otherwise WARNING in production and INFO elsewhere."""
+    configured = os.getenv("LOG_LEVEL")
+    if configured:
+        return configured.upper()
+    return "WARNING" if os.getenv("APP_ENV") == "production" else "INFO"
+
+class JsonFormatter(logging.Formatter):
+    """One sanitized JSON object per record."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": sanitize_log_message(record.getMessage()),
+            "source": f"{record.filename}:{record.lineno}",
+        }
+        if record.exc_text:
+            entry["exc"] = sanitize_log_message(record.exc_text)
+        if record.stack_info:
+            entry["stack"] = record.stack_info
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+class TextFormatter(logging.Formatter):
+    """The usual one-line text format, sanitized."""
+
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+    def format(self, record: logging.LogRecord) -> str:
+        return sanitize_log_message(super().format(record))
+
+class _StderrHandler(logging.StreamHandler):
+    """Writes to whatever ``sys.stderr`` is at the time, like logging's last resort handler."""
+
+    def __init__(self):
+        logging.Handler.__init__(self)
+
+    @property
+    def stream(self):
+        return sys.stderr
+
+class PipelineListener(QueueListener):
+    """A QueueListener whose stop() drains a full queue instead of failing."""
+
+    def enqueue_sentinel(self) -> None:
+        # put_nowait would raise queue.Full when the queue is full at shutdown;
+        # the listener thread is still draining it, so wait for a free slot
+        self.queue.put(self._sentinel, timeout=LOG_STOP_TIMEOUT)
+
+    def stop(self) -> None:
+        if self._thread is None:
+            return
+        try:
+            self.enqueue_sentinel()
+        except queue.Full:
+            # The target has not taken a record for LOG_STOP_TIMEOUT seconds;
+            # leave the (daemon) thread rather than hang the exit
+            self._thread = None
+            return
+        self._thread.join()
+        self._thread = None
+
+class PipelineHandler(QueueHandler):
+    """Enqueue records without blocking, shedding low-severity ones under pressure."""
+
+    def __init__(self, log_queue: queue.Queue, high_water: float = LOG_QUEUE_HIGH_WATER):
+        super().__init__(log_queue)
+        self.high_water = high_water
+        self.dropped: Dict[str, int] = {}
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Merge the arguments now, as they may change once the caller moves on.
+        # Sanitizing and formatting is left to the listener thread.
+        record = copy.copy(record)
+        record.msg = record.message = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        capacity = self.queue.maxsize
+        if record.levelno < logging.WARNING and self.queue.qsize() >= capacity * self.high_water:
+            self._drop(record)
+            return
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self._drop(record)
+
+    def _drop(self, record: logging.LogRecord) -> None:
+        self.dropped[record.levelname] = self.dropped.get(record.levelname, 0) + 1
+
+    def close(self) -> None:
+        # logging.shutdown() closes handlers at exit; deliver what is still queued
+        if self.listener is not None:
+            self.listener.stop()
+        super().close()
+
+class LogPipeline:
+    def __init__(self, target: logging.Handler, queue_size: int = LOG_QUEUE_SIZE):
+        self.target = target
+        self.queue_size = queue_size
+        self.handler = PipelineHandler(queue.Queue(queue_size))
+        self._start()
+
+    def _start(self) -> None:
+        self.handler.listener = PipelineListener(self.handler.queue, self.target, respect_handler_level=True)
+        self.handler.listener.start()
+
+    def restart_after_fork(self) -> None:
+        # The parent's listener thread does not exist in the child, and its
+        # queue's lock may have been held at the moment of the fork
+        self.handler.queue = queue.Queue(self.queue_size)
+        self.handler.dropped = {}
+        self._start()
+
+    def stop(self) -> None:
+        if self.handler.listener is not None:
+            self.handler.listener.stop()
+
+    def stats(self) -> dict:
+        return {
+            "queue_depth": self.handler.queue.qsize(),
+            "queue_size": self.queue_size,
+            "dropped": dict(self.handler.dropped),
+            "dropped_total": sum(self.handler.dropped.values()),
+        }
+
+log_pipeline: Optional[LogPipeline] = None
+
+def configure_logging(level: Optional[str] = None, fmt: Optional[str] = None, queue_size: Optional[int] = None) -> LogPipeline:
+    """Route the root logger through the queue pipeline, replacing a previous one."""
+    global log_pipeline
+    root = logging.getLogger()
+    if log_pipeline is not None:
+        root.removeHandler(log_pipeline.handler)
+        log_pipeline.stop()
+
+    target = _StderrHandler()
+    target.setFormatter(TextFormatter() if (fmt or LOG_FORMAT) == "text" else JsonFormatter())
+    log_pipeline = LogPipeline(target, LOG_QUEUE_SIZE if queue_size is None else queue_size)
+    root.addHandler(log_pipeline.handler)
+    root.setLevel(level or default_level())
+    for name in LIBRARY_LOGGERS:
+        logging.getLogger(name).setLevel(max(root.level, logging.WARNING))
+    return log_pipeline
+
+def _after_fork_in_child() -> None:
+    if log_pipeline is not None:
+        log_pipeline.restart_after_fork()
+
+os.register_at_fork(after_in_child=_after_fork_in_child)
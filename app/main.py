@@ -13,37 +13,32 @@ from app.api.endpoints import url_groups_router
 from app.api.endpoints import associations_router
 from app.api.endpoints import authorize_router
 from app.api.endpoints import applications_router
+from app.api.endpoints import metrics_router
+from app.api.endpoints import policy_router
+from app.api.endpoints import users_router
+from app.api.endpoints import health_router
+from app.api.endpoints import oauth_router
 from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi import Depends
-from app.db import get_async_session
+from app.db import get_async_session, get_read_session, get_read_session_maker, track_request_writes, READ_AFTER_WRITE_COOKIE, READ_AFTER_WRITE_SECONDS
 from app import crud
+from app.stats import get_dashboard_counts, get_member_counts
+from app.startup import ensure_protected_groups, warm_up, warmup_tasks, shutdown
+from app.logpipeline import configure_logging
+from app.audit import audit_log
+from app.policy import shared_policy
+from app.querystats import track_queries, query_budget, get_query_budget, route_name, QUERY_STATS_HEADER, QUERY_BUDGET_MODE
 from app.schemas import UserGroupCreate, UserCreate
 from sqlalchemy import text
 from sqlalchemy.exc import IntegrityError
-from collections import defaultdict
 from sqlalchemy import delete
 from app.models import user_group_members, Url
 from app.models import UserGroup, UrlGroup
 import os
-import requests
-from urllib.parse import urlencode, quote, unquote, urlparse
-from jose import jwt, JWTError
 import json
-import time
 import logging
 
 
-OAUTH2_CLIENT_ID = os.getenv("OAUTH2_CLIENT_ID", "your-client-id")
-OAUTH2_CLIENT_SECRET = os.getenv("OAUTH2_CLIENT_SECRET", "your-client-secret")
-OAUTH2_AUTH_URL = os.getenv("OAUTH2_AUTH_URL", "https://example.com/oauth2/v2/auth")
-OAUTH2_TOKEN_URL = os.getenv("OAUTH2_TOKEN_URL", "https://example.com/oauth2/token")
-OAUTH2_JWKS_URL = os.getenv("OAUTH2_JWKS_URL", "https://example.com/.well-known/jwks.json")
-OAUTH2_AUDIENCE = os.getenv("OAUTH2_AUDIENCE", OAUTH2_CLIENT_ID)
-OAUTH2_ISSUER = os.getenv("OAUTH2_ISSUER", "https://example.com")
-COOKIE_NAME = os.getenv("OAUTH2_COOKIE_NAME", "auth_token")
-REDIRECT_URI = os.getenv("OAUTH2_REDIRECT_URI", "http://localhost:8000/auth/callback")
-OAUTH2_SCOPE = os.getenv("OAUTH2_SCOPE", "openid email profile")
-
 app = FastAPI()
 
 # Mount static files (for htmx, shadcn, CSS, JS)
@@ -53,12 +48,38 @@ app.mount("/static", StaticFiles(directory="app/static"), name="static")
 templates = Jinja2Templates(directory="app/templates")
 
 logger = logging.getLogger("authfilter")
-logging.basicConfig(level=logging.DEBUG)
+configure_logging()
 
 # Use sanitized logger to automatically mask sensitive information
 from app.utils import SanitizedLogger, sanitize_url, sanitize_email
 logger = SanitizedLogger(logger)
 
+@app.middleware("http")
+async def read_after_write(request: Request, call_next):
+    """Keep a client's reads on the primary for a few seconds after it writes."""
+    writes = track_request_writes()
+    response = await call_next(request)
+    if writes and get_read_session_maker() is not None:
+        response.set_cookie(READ_AFTER_WRITE_COOKIE, "1", max_age=READ_AFTER_WRITE_SECONDS, httponly=True, samesite="lax")
+    return response
+
+@app.middleware("http")
+async def query_stats(request: Request, call_next):
+    """Count each request's SQL statements and check them against the route's budget."""
+    with track_queries(request.scope) as stats:
+        response = await call_next(request)
+    name = route_name(request.scope)
+    db_ms = stats.seconds * 1000
+    logger.debug("Request %s queries=%s db_ms=%.1f", name, stats.statements, db_ms)
+    if QUERY_STATS_HEADER:
+        response.headers["X-Query-Count"] = str(stats.statements)
+        response.headers["Server-Timing"] = f'db;dur={db_ms:.1f};desc="{stats.statements} queries"'
+    budget = get_query_budget(request.scope.get("endpoint"))
+    # In raise mode the statement that went over budget already failed the request
+    if budget is not None and stats.statements > budget and QUERY_BUDGET_MODE == "warn":
+        logger.warning("Request %s ran %s SQL statements, over its budget of %s", name, stats.statements, budget)
+    return response
+
 @app.on_event("startup")
 async def on_startup():
     # Auto-create tables in dev (SQLite). In prod, use Alembic for migrations.
@@ -81,105 +102,59 @@ async def on_startup():
         print("DEBUG: Skipping migrations (RUN_MIGRATIONS != 'true')")
 
     # Ensure internal groups exist
-    from sqlalchemy.ext.asyncio import AsyncSession
-    from sqlalchemy.future import select
-    from app.models import UserGroup, UrlGroup
-    from sqlalchemy.orm import sessionmaker
-
-    # Use an async session for startup
     from app.db import get_async_session_maker
-    async_session = get_async_session_maker()
-    async with async_session() as session:
-        # Internal User Group
-        internal_user_group_name = "Internal User Group"
-        q = await session.execute(select(UserGroup).where(UserGroup.name == internal_user_group_name))
-        group = q.scalar_one_or_none()
-        if not group:
-            session.add(UserGroup(name=internal_user_group_name, protected=1))
-        elif not group.protected:
-            group.protected = 1
-        # Everyone Url Group
-        everyone_url_group_name = "Everyone"
-        q = await session.execute(select(UrlGroup).where(UrlGroup.name == everyone_url_group_name))
-        group = q.scalar_one_or_none()
-        if not group:
-            session.add(UrlGroup(name=everyone_url_group_name, protected=1))
-        elif not group.protected:
-            group.protected = 1
-        # Authenticated Url Group
-        authenticated_url_group_name = "Authenticated"
-        q = await session.execute(select(UrlGroup).where(UrlGroup.name == authenticated_url_group_name))
-        group = q.scalar_one_or_none()
-        if not group:
-            session.add(UrlGroup(name=authenticated_url_group_name, protected=1))
-        elif not group.protected:
-            group.protected = 1
-        await session.commit()
+    async with get_async_session_maker()() as session:
+        await ensure_protected_groups(session)
+
+    # Warm caches in the background; /readyz reports ready once they are hot
+    app.state.warm_up = asyncio.create_task(warm_up(warmup_tasks(templates)))
+    audit_log.start()
+    shared_policy.start()
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    await shutdown(app)
 
 async def run_migrations():
-    """Run Alembic migrations if requested via environment variable."""
-    import subprocess
+    """Run Alembic migrations in-process if requested via environment variable."""
     import sys
+    from app.migrations import run_migrations as upgrade_to_head
     try:
         print("Running Alembic migrations...")
-        print(f"DEBUG: Current working directory: {os.getcwd()}")
-        print(f"DEBUG: Environment variables in subprocess:")
-        from app.utils import sanitize_environment_variables
-        sensitive_env_vars = {k: v for k, v in os.environ.items() 
-                            if k in ['RUN_MIGRATIONS', 'DATABASE_URL', 'DB_USER', 'DB_PASSWORD', 'DB_HOST', 'DB_PORT', 'DB_NAME']}
-        sanitized_env_vars = sanitize_environment_variables(sensitive_env_vars)
-        for key, value in sanitized_env_vars.items():
-            print(f"  {key} = {value}")
-        
-        result = subprocess.run(
-            ["uv", "run", "alembic", "upgrade", "head"],
-            capture_output=True,
-            text=True,
-            check=True,
-            env=os.environ.copy()  # Pass current environment variables including those from .env
-        )
-        print("Migrations completed successfully")
-        print(f"Output: {result.stdout}")
-    except subprocess.CalledProcessError as e:
-        print(f"Migration failed: {e}")
-        # Sanitize stdout/stderr to avoid logging sensitive information
-        from app.utils import sanitize_log_message
-        print(f"stdout: {sanitize_log_message(e.stdout)}")
-        print(f"stderr: {sanitize_log_message(e.stderr)}")
-        print("Exiting application due to migration failure")
-        sys.exit(1)
+        await upgrade_to_head()
     except Exception as e:
-        print(f"Unexpected error during migration: {e}")
+        print(f"Migration failed: {e}")
         import traceback
         traceback.print_exc()
-        print("Exiting application due to migration error")
+        print("Exiting application due to migration failure")
         sys.exit(1)
 
 @app.get("/", response_class=HTMLResponse)
-async def root(request: Request, session: AsyncSession = Depends(get_async_session)):
+@query_budget(1)
+async def root(request: Request, session: AsyncSession = Depends(get_read_session)):
     """Dashboard page with links to all sections."""
-    # Get some basic stats
-    app_count = (await session.execute(text("SELECT COUNT(*) FROM applications"))).scalar()
-    user_group_count = (await session.execute(text("SELECT COUNT(*) FROM user_groups"))).scalar()
-    url_group_count = (await session.execute(text("SELECT COUNT(*) FROM url_groups"))).scalar()
-    user_count = (await session.execute(text("SELECT COUNT(*) FROM users"))).scalar()
+    # Basic stats, cached until the policy changes
+    counts = await get_dashboard_counts(session)
     
     return templates.TemplateResponse("dashboard.html", {
         "request": request,
-        "app_count": app_count,
-        "user_group_count": user_group_count,
-        "url_group_count": url_group_count,
-        "user_count": user_count
+        **counts
     })
 
+async def _with_user_counts(session: AsyncSession, groups):
+    """Set ``user_count`` on each group from the cached member counts."""
+    counts = await get_member_counts(session)
+    for group in groups:
+        group.user_count = counts.get(group.group_id, 0)
+    return groups
+
 @app.get("/user-groups", response_class=HTMLResponse)
-async def user_groups(request: Request, session: AsyncSession = Depends(get_async_session)):
+@query_budget(2)
+async def user_groups(request: Request, session: AsyncSession = Depends(get_read_session)):
     """User groups page."""
     groups = await crud.get_all_user_groups(session)
     
-    # Add user count to each group
-    for group in groups:
-        group.user_count = await crud.get_user_count_in_group(session, group.group_id)
+    await _with_user_counts(session, groups)
     
     return templates.TemplateResponse("user_groups.html", {
         "request": request,
@@ -204,9 +179,7 @@ async def create_user_group_ui(
         await crud.create_user_group(session, name)
         groups = await crud.get_all_user_groups(session)
         
-        # Add user count to each group
-        for group in groups:
-            group.user_count = await crud.get_user_count_in_group(session, group.group_id)
+        await _with_user_counts(session, groups)
         
         return templates.TemplateResponse("partials/user_groups_list.html", {
             "request": request, 
@@ -220,15 +193,15 @@ async def create_user_group_ui(
 async def user_group_detail(
     request: Request, 
     group_id: int, 
-    session: AsyncSession = Depends(get_async_session)
+    session: AsyncSession = Depends(get_read_session)
 ):
     """User group detail page."""
     group = await crud.get_user_group(session, group_id)
     if not group:
         raise HTTPException(status_code=404, detail="User group not found")
     
-    # Get users in the group
-    users = await crud.get_users_in_group(session, group_id)
+    # First page of users in the group; the rest load on demand
+    users_page = await crud.get_users_in_group_page(session, group_id)
     
     # Get associated URL groups
     url_groups = []
@@ -238,10 +211,33 @@ async def user_group_detail(
     return templates.TemplateResponse("user_group_detail.html", {
         "request": request, 
         "group": group,
-        "users": users,
+        "users": users_page.items,
+        "next_cursor": users_page.next_cursor,
         "url_groups": url_groups
     })
 
+@app.get("/user-groups/{group_id}/users", response_class=HTMLResponse)
+async def user_group_users_page(
+    request: Request,
+    group_id: int,
+    q: str = None,
+    cursor: str = None,
+    session: AsyncSession = Depends(get_read_session)
+):
+    """One page of a group's users (HTMX partial), for search and "load more"."""
+    group = await crud.get_user_group(session, group_id)
+    if not group:
+        raise HTTPException(status_code=404, detail="User group not found")
+    users_page = await crud.get_users_in_group_page(session, group_id, q=q, cursor=cursor)
+    return templates.TemplateResponse("partials/users_rows.html", {
+        "request": request,
+        "group": group,
+        "users": users_page.items,
+        "next_cursor": users_page.next_cursor,
+        "cursor": cursor,
+        "q": q
+    })
+
 @app.get("/user-groups/{group_id}/edit-form", response_class=HTMLResponse)
 async def user_groups_edit_form(
     request: Request, 
@@ -278,9 +274,7 @@ async def update_user_group_ui(
             # We're on the list page, return the updated list
             groups = await crud.get_all_user_groups(session)
             
-            # Add user count to each group
-            for group in groups:
-                group.user_count = await crud.get_user_count_in_group(session, group.group_id)
+            await _with_user_counts(session, groups)
             
             return templates.TemplateResponse("partials/user_groups_list.html", {
                 "request": request, 
@@ -303,9 +297,7 @@ async def delete_user_group_ui(
     
     groups = await crud.get_all_user_groups(session)
     
-    # Add user count to each group
-    for group in groups:
-        group.user_count = await crud.get_user_count_in_group(session, group.group_id)
+    await _with_user_counts(session, groups)
     
     return templates.TemplateResponse("partials/user_groups_list.html", {
         "request": request, 
@@ -368,11 +360,12 @@ async def add_user_to_group_ui(
         await crud.add_user_to_group(session, group_id, email)
         
         # Return updated users list
-        users = await crud.get_users_in_group(session, group_id)
+        users_page = await crud.get_users_in_group_page(session, group_id)
         
         return templates.TemplateResponse("partials/users_list.html", {
             "request": request, 
-            "users": users,
+            "users": users_page.items,
+            "next_cursor": users_page.next_cursor,
             "group": group
         })
     except ValueError as e:
@@ -396,12 +389,13 @@ async def remove_user_from_group_ui(
             await session.commit()
         
         # Return updated users list
-        users = await crud.get_users_in_group(session, group_id)
+        users_page = await crud.get_users_in_group_page(session, group_id)
         group = await crud.get_user_group(session, group_id)
         
         return templates.TemplateResponse("partials/users_list.html", {
             "request": request, 
-            "users": users,
+            "users": users_page.items,
+            "next_cursor": users_page.next_cursor,
             "group": group
         })
     except Exception as e:
@@ -421,51 +415,90 @@ async def delete_user_group(request: Request, group_id: int, session: AsyncSessi
     return RedirectResponse(url="/user-groups", status_code=status.HTTP_303_SEE_OTHER)
 
 @app.get("/url-groups")
-async def url_groups(request: Request, session: AsyncSession = Depends(get_async_session)):
+async def url_groups(request: Request, session: AsyncSession = Depends(get_read_session)):
     selected = request.query_params.get("selected")
-    result = await session.execute(text("SELECT group_id, name FROM url_groups ORDER BY group_id"))
-    groups = result.fetchall()
-    # Fetch urls in each group
-    url_map = defaultdict(list)
-    url_rows = await session.execute(text("SELECT url_group_id, path FROM urls ORDER BY url_group_id, path"))
-    for row in url_rows:
-        url_map[row.url_group_id].append(row.path)
-    # Fetch associations for delete button logic and for user group lookup
-    assoc_rows = await session.execute(text('''
-        SELECT a.user_group_id, a.url_group_id
-        FROM user_group_url_group_associations a
-    '''))
-    associations = assoc_rows.fetchall()
-    associated_url_group_ids = set(row.url_group_id for row in associations)
-    # Fetch all user groups
+    q = request.query_params.get("q", "")
+    # Sidebar shows the first page of groups; more load via /url-groups/items
+    groups_page = await crud.get_url_groups_page(session, q=q)
+    # Fetch all user groups for the link dropdown
     user_group_rows = await session.execute(text("SELECT group_id, name FROM user_groups ORDER BY group_id"))
     user_groups = user_group_rows.fetchall()
-    # Prepare selected group data
+    # Prepare selected group data; only the selected group's URLs and associations are loaded
     selected_group = None
     selected_group_urls = []
-    selected_group_user_group_ids = []
+    selected_group_next_cursor = None
     selected_group_user_groups = []
+    associated_url_group_ids = set()
     if selected:
         try:
             selected_id = int(selected)
-            selected_group = next((g for g in groups if g.group_id == selected_id), None)
+            selected_group = (await session.execute(
+                text("SELECT group_id, name, protected FROM url_groups WHERE group_id = :group_id"),
+                {"group_id": selected_id}
+            )).first()
             if selected_group:
-                selected_group_urls = url_map.get(selected_id, [])
-                selected_group_user_group_ids = [a.user_group_id for a in associations if a.url_group_id == selected_id]
-                selected_group_user_groups = [g for g in user_groups if g.group_id in selected_group_user_group_ids]
+                urls_page = await crud.get_urls_in_group_page(session, selected_id)
+                selected_group_urls = urls_page.items
+                selected_group_next_cursor = urls_page.next_cursor
+                selected_group_user_groups = (await session.execute(text('''
+                    SELECT g.group_id, g.name
+                    FROM user_groups g
+                    JOIN user_group_url_group_associations a ON a.user_group_id = g.group_id
+                    WHERE a.url_group_id = :group_id
+                    ORDER BY g.group_id
+                '''), {"group_id": selected_id})).fetchall()
+                if selected_group_user_groups:
+                    associated_url_group_ids.add(selected_id)
         except Exception:
             selected_group = None
     return templates.TemplateResponse("url_groups.html", {
         "request": request,
-        "groups": groups,
-        "urls_in_group": url_map,
-        "associations": associations,
+        "groups": groups_page.items,
+        "groups_next_cursor": groups_page.next_cursor,
         "associated_url_group_ids": associated_url_group_ids,
         "user_groups": user_groups,
         "selected_group": selected_group,
         "selected_group_urls": selected_group_urls,
+        "selected_group_next_cursor": selected_group_next_cursor,
         "selected_group_user_groups": selected_group_user_groups,
-        "selected": selected
+        "selected": selected,
+        "q": q
+    })
+
+@app.get("/url-groups/items", response_class=HTMLResponse)
+async def url_groups_items(
+    request: Request,
+    q: str = "",
+    cursor: str = None,
+    selected: str = None,
+    session: AsyncSession = Depends(get_read_session)
+):
+    """One page of sidebar URL group links (HTMX partial), for search and "load more"."""
+    page = await crud.get_url_groups_page(session, q=q, cursor=cursor)
+    return templates.TemplateResponse("partials/url_groups_items.html", {
+        "request": request,
+        "groups": page.items,
+        "groups_next_cursor": page.next_cursor,
+        "cursor": cursor,
+        "selected": selected,
+        "q": q
+    })
+
+@app.get("/url-groups/{group_id}/url-items", response_class=HTMLResponse)
+async def url_group_url_items(
+    request: Request,
+    group_id: int,
+    cursor: str = None,
+    session: AsyncSession = Depends(get_read_session)
+):
+    """One page of the URLs in a group (HTMX partial), for "load more"."""
+    page = await crud.get_urls_in_group_page(session, group_id, cursor=cursor)
+    return templates.TemplateResponse("partials/url_group_urls.html", {
+        "request": request,
+        "group_id": group_id,
+        "urls": page.items,
+        "next_cursor": page.next_cursor,
+        "cursor": cursor
     })
 
 @app.post("/url-groups")
@@ -512,32 +545,44 @@ async def delete_url_group(request: Request, group_id: int, session: AsyncSessio
     return RedirectResponse(url="/url-groups", status_code=status.HTTP_303_SEE_OTHER)
 
 @app.get("/associations")
-async def associations(request: Request, session: AsyncSession = Depends(get_async_session)):
+async def associations(request: Request, session: AsyncSession = Depends(get_read_session)):
     sort = request.query_params.get("sort", "user_group")
     order = request.query_params.get("order", "asc")
-    # Get all associations with group names
-    result = await session.execute(text('''
-        SELECT a.user_group_id, ug.name as user_group_name, a.url_group_id, ugg.name as url_group_name
-        FROM user_group_url_group_associations a
-        JOIN user_groups ug ON a.user_group_id = ug.group_id
-        JOIN url_groups ugg ON a.url_group_id = ugg.group_id
-    '''))
-    associations = result.fetchall()
-    # Sort in Python for flexibility
-    reverse = (order == "desc")
-    if sort == "user_group":
-        associations = sorted(associations, key=lambda a: (a.user_group_name or ""), reverse=reverse)
-    elif sort == "url_group":
-        associations = sorted(associations, key=lambda a: (a.url_group_name or ""), reverse=reverse)
+    q = request.query_params.get("q", "")
+    # First page only, sorted and filtered in SQL; further pages load via /associations/rows
+    page = await crud.get_associations_page(session, sort=sort, order=order, q=q)
     user_groups = (await session.execute(text("SELECT group_id, name FROM user_groups ORDER BY name"))).fetchall()
     url_groups = (await session.execute(text("SELECT group_id, name FROM url_groups ORDER BY name"))).fetchall()
     return templates.TemplateResponse("associations.html", {
         "request": request,
-        "associations": associations,
+        "associations": page.items,
+        "next_cursor": page.next_cursor,
         "user_groups": user_groups,
         "url_groups": url_groups,
         "sort": sort,
-        "order": order
+        "order": order,
+        "q": q
+    })
+
+@app.get("/associations/rows", response_class=HTMLResponse)
+async def associations_rows(
+    request: Request,
+    sort: str = "user_group",
+    order: str = "asc",
+    q: str = "",
+    cursor: str = None,
+    session: AsyncSession = Depends(get_read_session)
+):
+    """One page of association table rows (HTMX partial), for search and "load more"."""
+    page = await crud.get_associations_page(session, sort=sort, order=order, q=q, cursor=cursor)
+    return templates.TemplateResponse("partials/associations_rows.html", {
+        "request": request,
+        "associations": page.items,
+        "next_cursor": page.next_cursor,
+        "cursor": cursor,
+        "sort": sort,
+        "order": order,
+        "q": q
     })
 
 @app.post("/associations")
@@ -561,39 +606,6 @@ async def remove_association(request: Request, user_group_id: int = Form(...), u
         return RedirectResponse(url=redirect, status_code=status.HTTP_303_SEE_OTHER)
     return RedirectResponse(url="/associations", status_code=status.HTTP_303_SEE_OTHER)
 
-# Helper to fetch and cache JWKS
-_jwks_cache = None
-_jwks_cache_time = 0
-_JWKS_CACHE_TTL = 3600
-
-def get_jwks():
-    global _jwks_cache, _jwks_cache_time
-    now = time.time()
-    if _jwks_cache and (now - _jwks_cache_time) < _JWKS_CACHE_TTL:
-        return _jwks_cache
-    resp = requests.get(OAUTH2_JWKS_URL)
-    resp.raise_for_status()
-    _jwks_cache = resp.json()
-    _jwks_cache_time = now
-    return _jwks_cache
-
-async def get_current_user_from_cookie(auth_token: str = Cookie(None)):
-    if not auth_token:
-        raise HTTPException(status_code=401, detail="Not authenticated")
-    jwks = get_jwks()
-    try:
-        payload = jwt.decode(
-            auth_token,
-            jwks,
-            algorithms=["RS256"],
-            audience=OAUTH2_AUDIENCE,
-            issuer=OAUTH2_ISSUER,
-            options={"verify_at_hash": False}
-        )
-        return payload
-    except JWTError as e:
-        raise HTTPException(status_code=401, detail="Invalid token")
-
 # /authorize UI - no authentication required
 @app.get("/authorize", response_class=HTMLResponse)
 async def authorize_page(request: Request):
@@ -603,7 +615,7 @@ async def authorize_page(request: Request):
     return templates.TemplateResponse("authorize.html", {"request": request, "allowed": None, "user": None, "next": next_path, "url_path": url_path, "email": email})
 
 @app.post("/authorize", response_class=HTMLResponse)
-async def authorize_check(request: Request, email: str = Form(None), url_path: str = Form(None), session: AsyncSession = Depends(get_async_session)):
+async def authorize_check(request: Request, email: str = Form(None), url_path: str = Form(None), session: AsyncSession = Depends(get_read_session)):
     # Fallback to query string if not present in form
     if not url_path:
         url_path = request.query_params.get("url_path", "")
@@ -616,120 +628,8 @@ async def authorize_check(request: Request, email: str = Form(None), url_path: s
     
     return templates.TemplateResponse("authorize.html", {"request": request, "allowed": allowed, "email": email, "url_path": url_path, "user": None})
 
-def is_safe_next_path(url: str) -> bool:
-    return url.startswith("/") or url.startswith("http://") or url.startswith("https://")
-
-@app.get("/auth/login")
-def auth_login(request: Request):
-    next_path = request.query_params.get("next", "/")
-    logger.debug(f"/auth/login: received next param: {next_path}")
-    if not is_safe_next_path(next_path):
-        logger.debug(f"/auth/login: next_path '{next_path}' is not safe, defaulting to '/'")
-        next_path = "/"
-    else:
-        logger.debug(f"/auth/login: using next_path: {next_path}")
-    params = {
-        "client_id": OAUTH2_CLIENT_ID,
-        "response_type": "code",
-        "scope": OAUTH2_SCOPE,
-        "redirect_uri": REDIRECT_URI,
-        "access_type": "offline",
-        "prompt": "consent",
-        "state": quote(next_path),
-    }
-    url = f"{OAUTH2_AUTH_URL}?{urlencode(params)}"
-    logger.debug(f"/auth/login: redirecting to OAuth2 URL: {sanitize_url(url, ['code', 'state'])}")
-    return RedirectResponse(url)
-
-@app.get("/auth/callback")
-def auth_callback(request: Request):
-    code = request.query_params.get("code")
-    state = request.query_params.get("state", "%2F")
-    next_path = unquote(unquote(state))
-    logger.debug(f"/auth/callback: received state param: ***, decoded next_path: {next_path}")
-    if not is_safe_next_path(next_path):
-        logger.debug(f"/auth/callback: next_path '{next_path}' is not safe, defaulting to '/'")
-        next_path = "/"
-    else:
-        logger.debug(f"/auth/callback: using next_path: {next_path}")
-    if not code:
-        logger.error("/auth/callback: Missing code parameter")
-        return HTMLResponse("Missing code", status_code=400)
-    data = {
-        "code": code,
-        "client_id": OAUTH2_CLIENT_ID,
-        "client_secret": OAUTH2_CLIENT_SECRET,
-        "redirect_uri": REDIRECT_URI,
-        "grant_type": "authorization_code",
-    }
-    logger.debug(f"/auth/callback: exchanging code for token at {sanitize_url(OAUTH2_TOKEN_URL)}")
-    token_resp = requests.post(OAUTH2_TOKEN_URL, data=data)
-    if not token_resp.ok:
-        logger.error(f"/auth/callback: OAuth2 token exchange error: ***")
-        return HTMLResponse("Token exchange failed", status_code=400)
-    token_data = token_resp.json()
-    id_token = token_data.get("id_token")
-    if not id_token:
-        logger.error("/auth/callback: No id_token in token response")
-        return HTMLResponse("No id_token", status_code=400)
-    # Extract email from id_token
-    try:
-        jwks = get_jwks()
-        payload = jwt.decode(
-            id_token,
-            jwks,
-            algorithms=["RS256"],
-            audience=OAUTH2_AUDIENCE,
-            issuer=OAUTH2_ISSUER,
-            options={"verify_at_hash": False}
-        )
-        email = payload.get("email")
-        if not email:
-            logger.error("/auth/callback: No email in token payload")
-            return HTMLResponse("No email in token", status_code=400)
-        logger.debug(f"/auth/callback: extracted email: {sanitize_email(email)}")
-    except Exception as e:
-        logger.error(f"/auth/callback: Token decode error: ***")
-        return HTMLResponse("Token decode error", status_code=400)
-    # Determine cookie domain
-    cookie_domain = None
-    if next_path.startswith("http://") or next_path.startswith("https://"):
-        parsed = urlparse(next_path)
-        cookie_domain = parsed.hostname
-        logger.debug(f"/auth/callback: setting cookie domain to {cookie_domain}")
-    # Set cookies and redirect to next_path
-    response = RedirectResponse(url=next_path)
-    APP_ENV = os.getenv("APP_ENV", "development")
-    COOKIE_SECURE = APP_ENV == "production"
-    response.set_cookie(
-        COOKIE_NAME,
-        id_token,
-        httponly=True,
-        secure=COOKIE_SECURE,
-        samesite="lax",
-        max_age=3600,
-        domain=cookie_domain
-    )
-    response.set_cookie(
-        "x-auth-email",
-        email,
-        httponly=True,
-        secure=COOKIE_SECURE,
-        samesite="lax",
-        max_age=3600,
-        domain=cookie_domain
-    )
-    logger.debug(f"/auth/callback: set cookies and redirecting to: {next_path}")
-    return response
-
-@app.get("/logout")
-def logout():
-    response = RedirectResponse(url="/")
-    response.delete_cookie(COOKIE_NAME)
-    return response
-
 @app.get("/applications", response_class=HTMLResponse)
-async def applications(request: Request, session: AsyncSession = Depends(get_async_session)):
+async def applications(request: Request, session: AsyncSession = Depends(get_read_session)):
     """Applications list page."""
     applications = await crud.get_all_applications_with_url_groups_count(session)
     return templates.TemplateResponse("applications.html", {
@@ -766,7 +666,7 @@ async def create_application_ui(
 async def application_detail(
     request: Request, 
     app_id: int, 
-    session: AsyncSession = Depends(get_async_session)
+    session: AsyncSession = Depends(get_read_session)
 ):
     """Application detail page."""
     app = await crud.get_application(session, app_id)
@@ -1113,3 +1013,8 @@ app.include_router(url_groups_router)
 app.include_router(associations_router)
 app.include_router(authorize_router)
 app.include_router(applications_router)
+app.include_router(metrics_router)
+app.include_router(policy_router)
+app.include_router(users_router)
+app.include_router(health_router)
+app.include_router(oauth_router)
@@ -0,0 +1,165 @@
+"""
+In-process Alembic migrations.
+
+``run_migrations()`` first compares the database's ``alembic_version`` with the
+heads in the migration scripts, which costs one query, and returns straight away
+when they match. Otherwise it takes a database-wide migration lock so that, when
+several replicas start together, one migrates while the others wait. Each one
+checks the version again once it holds the lock and skips if another replica
+has already migrated.
+
+The lock is an advisory lock on PostgreSQL, ``GET_LOCK`` on MySQL and an
+exclusive lock on a file next to the database on SQLite.
+"""
+import asyncio
+import logging
+import os
+import time
+import zlib
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import Optional, Set
+
+from alembic import command
+from alembic.config import Config
+from alembic.runtime.migration import MigrationContext
+from alembic.script import ScriptDirectory
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
+
+from app.utils import SanitizedLogger
+
+logger = SanitizedLogger(logging.getLogger(__name__))
+
+ALEMBIC_CONFIG = os.getenv("ALEMBIC_CONFIG", str(Path(__file__).resolve().parent.parent / "alembic.ini"))
+MIGRATION_LOCK_TIMEOUT = float(os.getenv("MIGRATION_LOCK_TIMEOUT", "300"))
+MIGRATION_LOCK_POLL = 0.5
+
+LOCK_NAME = "authfilter_migrations"
+# pg advisory locks take a bigint key
+PG_LOCK_KEY = zlib.crc32(LOCK_NAME.encode())
+
+class MigrationLockTimeout(Exception):
+    """Raised when the migration lock is not acquired within MIGRATION_LOCK_TIMEOUT."""
+
+def alembic_config(path: Optional[str] = None) -> Config:
+    config = Config(path or ALEMBIC_CONFIG)
+    # Keep the application's logging setup; env.py would otherwise load the
+    # [loggers] sections of alembic.ini
+    config.attributes["configure_logger"] = False
+    return config
+
+def head_revisions(config: Config) -> Set[str]:
+    """Revisions the scripts lead to. Read from disk, no database access."""
+    return set(ScriptDirectory.from_config(config).get_heads())
+
+async def current_revisions(engine: AsyncEngine) -> Set[str]:
+    """Revisions recorded in ``alembic_version``; empty if the table does not exist yet."""
+    async with engine.connect() as conn:
+        try:
+            result = await conn.execute(text("SELECT version_num FROM alembic_version"))
+        except Exception:
+            return set()
+        return {row[0] for row in result}
+
+class _FileLock:
+    def __init__(self, path: str):
+        self.path = path
+        self._fd = None
+
+    def try_acquire(self) -> bool:
+        import fcntl
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.close(fd)
+            return False
+        self._fd = fd
+        return True
+
+    def release(self) -> None:
+        import fcntl
+        if self._fd is not None:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+            os.close(self._fd)
+            self._fd = None
+
+async def _try_lock(conn: AsyncConnection, file_lock: Optional[_FileLock]) -> bool:
+    dialect = conn.dialect.name
+    if dialect == "postgresql":
+        return bool((await conn.execute(text("SELECT pg_try_advisory_lock(:key)"), {"key": PG_LOCK_KEY})).scalar())
+    if dialect == "mysql":
+        return (await conn.execute(text("SELECT GET_LOCK(:name, 0)"), {"name": LOCK_NAME})).scalar() == 1
+    if file_lock is not None:
+        return file_lock.try_acquire()
+    return True
+
+async def _unlock(conn: AsyncConnection, file_lock: Optional[_FileLock]) -> None:
+    dialect = conn.dialect.name
+    if dialect == "postgresql":
+        await conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": PG_LOCK_KEY})
+    elif dialect == "mysql":
+        await conn.execute(text("SELECT RELEASE_LOCK(:name)"), {"name": LOCK_NAME})
+    if file_lock is not None:
+        file_lock.release()
+
+@asynccontextmanager
+async def migration_lock(conn: AsyncConnection, timeout: Optional[float] = None):
+    """Hold the cross-replica migration lock on ``conn`` for the duration of the block."""
+    timeout = MIGRATION_LOCK_TIMEOUT if timeout is None else timeout
+    file_lock = None
+    database = conn.engine.url.database
+    if conn.dialect.name == "sqlite" and database and database != ":memory:":
+        file_lock = _FileLock(f"{database}.migrate.lock")
+    elif conn.dialect.name not in ("sqlite", "postgresql", "mysql"):
+        logger.warning("No migration lock for dialect '%s', replicas may migrate concurrently", conn.dialect.name)
+
+    deadline = time.monotonic() + timeout
+    waited = False
+    while not await _try_lock(conn, file_lock):
+        if not waited:
+            logger.info("Another replica is migrating the database, waiting")
+            waited = True
+        if time.monotonic() >= deadline:
+            raise MigrationLockTimeout(f"Migration lock not acquired within {timeout}s")
+        await asyncio.sleep(MIGRATION_LOCK_POLL)
+    try:
+        yield
+    except BaseException:
+        await conn.rollback()
+        raise
+    finally:
+        await _unlock(conn, file_lock)
+        await conn.commit()
+
+def _upgrade(sync_conn, config: Config, heads: Set[str]) -> bool:
+    current = set(MigrationContext.configure(sync_conn).get_current_heads())
+    if current == heads:
+        return False
+    logger.info("Upgrading database schema from %s to %s", sorted(current) or "empty", sorted(heads))
+    config.attributes["connection"] = sync_conn
+    command.upgrade(config, "head")
+    return True
+
+async def run_migrations(engine: Optional[AsyncEngine] = None, config: Optional[Config] = None) -> bool:
+    """Upgrade the database to head. Returns False when there was nothing to do."""
+    if engine is None:
+        from app.db import get_engine
+        engine = get_engine()
+    config = config or alembic_config()
+    heads = head_revisions(config)
+    if await current_revisions(engine) == heads:
+        logger.info("Database schema is up to date")
+        return False
+
+    async with engine.connect() as conn:
+        async with migration_lock(conn):
+            # Another replica may have migrated while we waited for the lock
+            migrated = await conn.run_sync(_upgrade, config, heads)
+            await conn.commit()
+    if migrated:
+        logger.info("Database migrations completed")
+    else:
+        logger.info("Database schema was migrated by another replica")
+    return migrated
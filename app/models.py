@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, Table, DateTime, UniqueConstraint
+from sqlalchemy import Column, Integer, String, ForeignKey, Table, DateTime, UniqueConstraint, Index
 from sqlalchemy.orm import relationship, Mapped, mapped_column
 from sqlalchemy.sql import func
 from .db import Base
@@ -7,7 +7,7 @@ from typing import Optional
 class User(Base):
     __tablename__ = "users"
     user_id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
-    email: Mapped[str] = mapped_column(String(255), nullable=False)
+    email: Mapped[str] = mapped_column(String(255), nullable=False, unique=True, index=True)
     created_at: Mapped[DateTime] = mapped_column(DateTime, server_default=func.now())
     # Relationship to user_groups via association table
     groups = relationship("UserGroup", secondary="user_group_members", back_populates="users")
@@ -31,13 +31,15 @@ user_group_members = Table(
     Column("user_id", Integer, ForeignKey("users.user_id"), primary_key=True),
     # Composite unique constraint: user can only be in a group once
     UniqueConstraint('user_group_id', 'user_id', name='uq_user_group_member'),
+    # Reverse lookup: which groups is a user in (authorize joins, offboarding)
+    Index('ix_user_group_members_user_id', 'user_id'),
 )
 
 class Application(Base):
     __tablename__ = "applications"
     app_id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
     name: Mapped[str] = mapped_column(String(255), nullable=False)
-    host: Mapped[str] = mapped_column(String(255), nullable=False)
+    host: Mapped[str] = mapped_column(String(255), nullable=False, index=True)
     description: Mapped[Optional[str]] = mapped_column(String(500), nullable=True)
     created_at: Mapped[DateTime] = mapped_column(DateTime, server_default=func.now())
     # Relationship to url_groups
@@ -49,7 +51,7 @@ class UrlGroup(Base):
     name: Mapped[str] = mapped_column(String(255), nullable=False)
     created_at: Mapped[DateTime] = mapped_column(DateTime, server_default=func.now())
     protected: Mapped[bool] = mapped_column(Integer, default=0, nullable=False)  # 0=False, 1=True
-    app_id: Mapped[int] = mapped_column(Integer, ForeignKey("applications.app_id"), nullable=True)
+    app_id: Mapped[int] = mapped_column(Integer, ForeignKey("applications.app_id"), nullable=True, index=True)
     # Relationship to application
     application = relationship("Application", back_populates="url_groups")
     # Relationship to urls
@@ -60,13 +62,15 @@ class UrlGroup(Base):
     # Composite unique constraint: name must be unique within an application (or globally if no app)
     __table_args__ = (
         UniqueConstraint('name', 'app_id', name='uq_url_group_name_per_app'),
+        # Protected system group lookups ('Everyone', 'Authenticated')
+        Index('ix_url_groups_name_protected', 'name', 'protected'),
     )
 
 class Url(Base):
     __tablename__ = "urls"
     url_id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
     path: Mapped[str] = mapped_column(String(255), nullable=False)
-    url_group_id: Mapped[int] = mapped_column(Integer, ForeignKey("url_groups.group_id"))
+    url_group_id: Mapped[int] = mapped_column(Integer, ForeignKey("url_groups.group_id"), index=True)
     url_group = relationship("UrlGroup", back_populates="urls")
     
     # Composite unique constraint: path must be unique within a url_group
@@ -80,4 +84,24 @@ user_group_url_group_associations = Table(
     Base.metadata,
     Column("user_group_id", Integer, ForeignKey("user_groups.group_id"), primary_key=True),
     Column("url_group_id", Integer, ForeignKey("url_groups.group_id"), primary_key=True),
+    # Reverse lookup: which user groups can reach a URL group
+    Index('ix_user_group_url_group_associations_url_group_id', 'url_group_id'),
 )
+
+class AuditEvent(Base):
+    """One authorization decision, written in batches by app.audit."""
+    __tablename__ = "audit_log"
+    audit_id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    decided_at: Mapped[DateTime] = mapped_column(DateTime, nullable=False, index=True)
+    user: Mapped[str] = mapped_column(String(255), nullable=False)  # sanitized email
+    host: Mapped[str] = mapped_column(String(255), nullable=False)
+    path: Mapped[str] = mapped_column(String(2048), nullable=False)
+    allowed: Mapped[bool] = mapped_column(Integer, nullable=False)  # 0=False, 1=True
+    rule: Mapped[str] = mapped_column(String(32), nullable=False)
+    app: Mapped[str] = mapped_column(String(255), nullable=False)
+
+class PolicyState(Base):
+    """A single row holding the policy version shared by every process (app.policy)."""
+    __tablename__ = "policy_state"
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=False)
+    version: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
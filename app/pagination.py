@@ -0,0 +1,60 @@
+"""
+Keyset pagination helpers.
+
+A page is fetched with ``ORDER BY <keys> LIMIT n+1`` and the next page starts
+strictly after the last row's keys, so every page costs the same index range
+scan however deep the client has scrolled. Cursors handed to the browser are the
+last row's key values, JSON encoded and base64url wrapped.
+"""
+import base64
+import json
+import os
+from typing import Any, List, Optional, Sequence
+
+from sqlalchemy import and_, or_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+ADMIN_PAGE_SIZE = int(os.getenv("ADMIN_PAGE_SIZE", "50"))
+
+class Page:
+    def __init__(self, items: List[Any], next_cursor: Optional[str]):
+        self.items = items
+        self.next_cursor = next_cursor
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    return base64.urlsafe_b64encode(json.dumps(list(values)).encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: Optional[str]) -> Optional[list]:
+    """Decode a cursor; a missing or malformed cursor means the first page."""
+    if not cursor:
+        return None
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except ValueError:
+        return None
+    return values if isinstance(values, list) else None
+
+def after(keys, last, descending: bool = False):
+    """WHERE clause for rows that sort after ``last`` on the composite key."""
+    head = keys[0] < last[0] if descending else keys[0] > last[0]
+    if len(keys) == 1:
+        return head
+    return or_(head, and_(keys[0] == last[0], after(keys[1:], last[1:], descending)))
+
+async def keyset_page(
+    session: AsyncSession,
+    stmt,
+    keys,
+    cursor: Optional[str] = None,
+    page_size: Optional[int] = None,
+    descending: bool = False,
+) -> Page:
+    """Fetch one page of ``stmt``, whose leading columns must be ``keys``."""
+    page_size = page_size or ADMIN_PAGE_SIZE
+    last = decode_cursor(cursor)
+    if last is not None and len(last) == len(keys):
+        stmt = stmt.where(after(keys, last, descending))
+    order = [key.desc() for key in keys] if descending else list(keys)
+    rows = (await session.execute(stmt.order_by(*order).limit(page_size + 1))).all()
+    next_cursor = encode_cursor(rows[page_size - 1][:len(keys)]) if len(rows) > page_size else None
+    return Page(rows[:page_size], next_cursor)
@@ -0,0 +1,192 @@
+"""
+Process-local policy version.
+
+Every committed write to the database bumps the version, so anything that caches
+authorization state can tell when it may be stale. Callbacks registered with
+``on_policy_change`` run after each bump.
+
+Bulk operations wrap their chunked transactions in ``deferred_policy_bump()`` so
+that a whole import bumps the version once instead of once per chunk.
+
+Changes that must take effect for specific users right away (offboarding,
+membership sync) call ``invalidate_users``, which runs every callback
+registered with ``on_users_invalidated`` so each cache can drop what it holds
+for those emails.
+
+Other prefork workers and replicas do not see those callbacks. Such changes
+also call ``shared_policy.bump(session)`` inside their transaction, which
+increments the version in the ``policy_state`` table. Every process polls it
+every ``POLICY_POLL_SECONDS``; when it has moved, the process bumps its local
+version and, not knowing which users were affected, invalidates all of them.
+"""
+import asyncio
+import logging
+import os
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Collection, List, Optional
+
+from sqlalchemy import event, text
+from sqlalchemy.orm import Session
+
+from app.models import PolicyState
+from app.utils import SanitizedLogger
+
+logger = SanitizedLogger(logging.getLogger(__name__))
+
+POLICY_POLL_SECONDS = float(os.getenv("POLICY_POLL_SECONDS", "5"))
+
+_version = 0
+_listeners: List[Callable[[int], None]] = []
+_user_listeners: List[Callable[[Collection[str]], None]] = []
+_deferred: ContextVar[Optional[list]] = ContextVar("policy_bump_deferred", default=None)
+
+def get_policy_version() -> int:
+    return _version
+
+def on_policy_change(callback: Callable[[int], None]) -> Callable[[int], None]:
+    """Register ``callback(version)`` to run after every policy version bump."""
+    _listeners.append(callback)
+    return callback
+
+def bump_policy_version() -> int:
+    global _version
+    _version += 1
+    logger.debug("Policy version bumped to %s", _version)
+    for callback in list(_listeners):
+        try:
+            callback(_version)
+        except Exception as e:
+            logger.error("Policy change listener %r failed: %s", callback, e)
+    return _version
+
+def on_users_invalidated(
+    callback: Callable[[Optional[Collection[str]]], None],
+) -> Callable[[Optional[Collection[str]]], None]:
+    """Register ``callback(emails)`` to drop anything cached for those users.
+
+    ``emails`` is None when every user may be affected.
+    """
+    _user_listeners.append(callback)
+    return callback
+
+def invalidate_users(emails: Collection[str]) -> None:
+    emails = frozenset(emails)
+    if not emails:
+        return
+    logger.info("Invalidating cached state for %s users", len(emails))
+    _notify_user_listeners(emails)
+
+def invalidate_all_users() -> None:
+    logger.info("Invalidating cached state for every user")
+    _notify_user_listeners(None)
+
+def _notify_user_listeners(emails: Optional[Collection[str]]) -> None:
+    for callback in list(_user_listeners):
+        try:
+            callback(emails)
+        except Exception as e:
+            logger.error("User invalidation listener %r failed: %s", callback, e)
+
+@contextmanager
+def deferred_policy_bump():
+    """Collect commits made inside the block and bump the version once at the end."""
+    pending = []
+    token = _deferred.set(pending)
+    try:
+        yield
+    finally:
+        _deferred.reset(token)
+        if pending:
+            bump_policy_version()
+
+# A session is marked as soon as it flushes ORM changes or runs an
+# INSERT/UPDATE/DELETE; the mark is turned into a bump when it commits
+_CHANGED = "policy_changed"
+
+@event.listens_for(Session, "after_flush")
+def _mark_flush(session, flush_context):
+    session.info[_CHANGED] = True
+
+@event.listens_for(Session, "do_orm_execute")
+def _mark_dml(orm_execute_state):
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        orm_execute_state.session.info[_CHANGED] = True
+
+@event.listens_for(Session, "after_soft_rollback")
+def _clear_mark(session, previous_transaction):
+    session.info.pop(_CHANGED, None)
+
+@event.listens_for(Session, "after_commit")
+def _bump_on_commit(session):
+    if not session.info.pop(_CHANGED, False):
+        return
+    pending = _deferred.get()
+    if pending is not None:
+        pending.append(True)
+    else:
+        bump_policy_version()
+
+SHARED_VERSION_STMT = text("SELECT version FROM policy_state WHERE id = 1")
+BUMP_SHARED_VERSION_STMT = text("UPDATE policy_state SET version = version + 1 WHERE id = 1")
+
+class SharedPolicyVersion:
+    """The policy version in the ``policy_state`` table, shared by every process."""
+
+    def __init__(self, poll_interval: float, get_engine: Optional[Callable] = None):
+        self.poll_interval = poll_interval
+        self.get_engine = get_engine or _primary_engine
+        self.seen: Optional[int] = None
+        self.changes = 0
+        self._task: Optional[asyncio.Task] = None
+
+    async def bump(self, session) -> None:
+        """Increment the shared version as part of ``session``'s transaction."""
+        from app.bulk import insert_ignore
+
+        # Databases created without migrations have no row yet. Two first bumps
+        # may race to create it, so the insert skips an existing row instead of
+        # failing the transaction it runs in.
+        await session.execute(insert_ignore(session.get_bind().dialect.name, PolicyState.__table__, [{"id": 1, "version": 0}]))
+        await session.execute(BUMP_SHARED_VERSION_STMT)
+
+    async def check(self) -> bool:
+        """Read the shared version; bump the local one if another process moved it."""
+        async with self.get_engine().connect() as conn:
+            version = (await conn.execute(SHARED_VERSION_STMT)).scalar() or 0
+        changed = self.seen is not None and version != self.seen
+        self.seen = version
+        if changed:
+            self.changes += 1
+            logger.info("Shared policy version moved to %s", version)
+            bump_policy_version()
+            invalidate_all_users()
+        return changed
+
+    def start(self) -> None:
+        """Start polling on the running event loop."""
+        if self._task is None and self.poll_interval > 0:
+            self._task = asyncio.create_task(self._run())
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.check()
+            except Exception as e:
+                logger.warning("Could not read the shared policy version: %s", e)
+            await asyncio.sleep(self.poll_interval)
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+def _primary_engine():
+    from app.db import get_engine
+    return get_engine()
+
+shared_policy = SharedPolicyVersion(POLICY_POLL_SECONDS)
@@ -0,0 +1,109 @@
+"""
+Per-request SQL statement counts and database time.
+
+``track_queries()`` starts counting for the current task; engine events add
+every statement executed while it is active, whichever engine runs it. Routes
+declare how many statements they may run with ``@query_budget(n)``. The HTTP
+middleware in main.py logs each request's counts, reports them in response
+headers when ``QUERY_STATS_HEADER`` is on, and handles routes that go over
+budget according to ``QUERY_BUDGET_MODE``:
+
+- ``warn`` (default) logs a warning once the request has finished
+- ``raise`` raises ``QueryBudgetExceeded`` in place of the first statement
+  over budget, so it never runs and the request (and tests) fail before
+  anything after it is committed
+- ``off`` ignores budgets
+"""
+import os
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+QUERY_STATS_HEADER = os.getenv("QUERY_STATS_HEADER", "false").strip().lower() in ("1", "true", "yes", "on")
+QUERY_BUDGET_MODE = os.getenv("QUERY_BUDGET_MODE", "warn").strip().lower()
+
+class QueryBudgetExceeded(Exception):
+    """Raised in ``raise`` mode when a route runs more statements than its budget."""
+
+    def __init__(self, route: str, statements: int, budget: int):
+        super().__init__(f"{route} ran {statements} SQL statements, budget is {budget}")
+        self.route = route
+        self.statements = statements
+        self.budget = budget
+
+class QueryStats:
+    __slots__ = ("statements", "seconds", "scope")
+
+    def __init__(self, scope: Optional[dict] = None):
+        self.statements = 0
+        self.seconds = 0.0
+        # The ASGI scope of the request being counted; routing adds the endpoint
+        self.scope = scope
+
+_current: ContextVar[Optional[QueryStats]] = ContextVar("query_stats", default=None)
+
+@contextmanager
+def track_queries(scope: Optional[dict] = None):
+    """Count the statements run by this task (and tasks it starts) inside the block.
+
+    With the request's ``scope``, ``raise`` mode enforces the budget of the
+    endpoint it is routed to.
+    """
+    stats = QueryStats(scope)
+    token = _current.set(stats)
+    try:
+        yield stats
+    finally:
+        _current.reset(token)
+
+def query_budget(max_statements: int) -> Callable:
+    """Declare the most SQL statements a route may run per request."""
+    def decorate(endpoint):
+        endpoint.query_budget = max_statements
+        return endpoint
+    return decorate
+
+def get_query_budget(endpoint) -> Optional[int]:
+    return getattr(endpoint, "query_budget", None)
+
+def route_name(scope: dict) -> str:
+    """``METHOD /route/path`` for a request's ASGI scope."""
+    route = scope.get("route")
+    return f"{scope.get('method')} {route.path if route else scope.get('path')}"
+
+_STARTED = "query_stats_started"
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = _current.get()
+    if stats is None:
+        return
+    if QUERY_BUDGET_MODE == "raise" and stats.scope is not None:
+        budget = get_query_budget(stats.scope.get("endpoint"))
+        if budget is not None and stats.statements >= budget:
+            raise QueryBudgetExceeded(route_name(stats.scope), stats.statements + 1, budget)
+    conn.info.setdefault(_STARTED, []).append(time.perf_counter())
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = _current.get()
+    started = conn.info.get(_STARTED)
+    if stats is None or not started:
+        return
+    stats.statements += 1
+    stats.seconds += time.perf_counter() - started.pop()
+
+@event.listens_for(Engine, "handle_error")
+def _handle_error(exception_context):
+    # A failed statement never reaches after_cursor_execute; count it here
+    conn = exception_context.connection
+    started = conn.info.get(_STARTED) if conn is not None else None
+    stats = _current.get()
+    if stats is None or not started:
+        return
+    stats.statements += 1
+    stats.seconds += time.perf_counter() - started.pop()
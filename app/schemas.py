@@ -1,5 +1,5 @@
 from pydantic import BaseModel, EmailStr, Field
-from typing import Optional, List
+from typing import Optional, List, Dict
 from datetime import datetime
 
 # User schemas
@@ -96,6 +96,61 @@ class AuthorizeRequest(BaseModel):
 class AuthorizeResponse(BaseModel):
     allowed: bool
 
+# Bulk import schemas
+class BulkImportError(BaseModel):
+    line: int
+    error: str
+
+class BulkImportReport(BaseModel):
+    rows: int = 0
+    users_created: int = 0
+    memberships_created: int = 0
+    failed: int = 0
+    # Only the first BULK_IMPORT_MAX_ERRORS failures are listed
+    errors: List[BulkImportError] = Field(default_factory=list)
+
+class UrlImportError(BaseModel):
+    # Line number for path lists, None for OpenAPI documents
+    line: Optional[int] = None
+    path: Optional[str] = None
+    error: str
+
+class UrlImportReport(BaseModel):
+    paths: int = 0
+    urls_created: int = 0
+    unassigned: int = 0
+    failed: int = 0
+    errors: List[UrlImportError] = Field(default_factory=list)
+
+class MembershipSync(BaseModel):
+    # The complete desired membership of the group
+    emails: List[EmailStr]
+
+class MembershipSyncReport(BaseModel):
+    added: int = 0
+    removed: int = 0
+    unchanged: int = 0
+    users_created: int = 0
+    dry_run: bool = False
+
+class OffboardRequest(BaseModel):
+    emails: List[EmailStr]
+    # Also delete the users rows, not just their memberships
+    delete_users: bool = False
+
+class OffboardReport(BaseModel):
+    users_found: int = 0
+    memberships_removed: int = 0
+    users_deleted: int = 0
+    not_found: List[str] = Field(default_factory=list)
+
+class PolicyImportReport(BaseModel):
+    records: int = 0
+    # Rows inserted per record type; existing rows are not counted
+    created: Dict[str, int] = Field(default_factory=dict)
+    failed: int = 0
+    errors: List[BulkImportError] = Field(default_factory=list)
+
 # For forward references
 UrlGroupRead.update_forward_refs()
 ApplicationRead.update_forward_refs()
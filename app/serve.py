@@ -0,0 +1,196 @@
+"""
+Production launcher: ``python -m app.serve`` (or ``uv run serve``).
+
+The master process imports the application once, compiles its templates and
+calls ``gc.freeze()``, then forks the workers. The already-imported modules live
+in memory pages that all workers share copy-on-write; freezing moves those
+objects out of the garbage collector's reach, so collections in the workers do
+not write to (and thereby copy) the shared pages.
+
+Workers all accept on one socket bound by the master. Each worker runs its own
+uvicorn server, which uses uvloop and httptools when they are installed, and
+its own lifespan: database pools and warm-up are per worker, created after the
+fork. On SIGTERM or SIGINT the master forwards SIGTERM to every worker. The
+workers finish in-flight requests and run their shutdown handlers (disposing
+database pools and closing HTTP clients) before exiting. Workers that die are
+replaced, unless their startup failed, in which case the whole server stops.
+"""
+import argparse
+import gc
+import importlib
+import logging
+import math
+import os
+import signal
+import sys
+import time
+from typing import Dict, Optional
+
+from app.utils import SanitizedLogger
+
+logger = SanitizedLogger(logging.getLogger("authfilter.serve"))
+
+SERVE_APP = os.getenv("SERVE_APP", "app.main:app")
+SERVE_GRACEFUL_TIMEOUT = int(os.getenv("SERVE_GRACEFUL_TIMEOUT", "30"))
+# uvicorn's exit code when the application's startup handlers fail
+STARTUP_FAILURE = 3
+# A worker that dies sooner than this after starting is restarted with a delay
+WORKER_MIN_UPTIME = 5.0
+
+def cpu_quota(cgroup_root: str = "/sys/fs/cgroup") -> Optional[float]:
+    """CPUs allowed by the container's cgroup quota, or None when unlimited."""
+    try:
+        with open(os.path.join(cgroup_root, "cpu.max")) as f:  # cgroup v2
+            quota, period = f.read().split()[:2]
+        if quota != "max":
+            return int(quota) / int(period)
+        return None
+    except (OSError, ValueError):
+        pass
+    try:  # cgroup v1
+        with open(os.path.join(cgroup_root, "cpu", "cpu.cfs_quota_us")) as f:
+            quota = int(f.read())
+        with open(os.path.join(cgroup_root, "cpu", "cpu.cfs_period_us")) as f:
+            period = int(f.read())
+        if quota > 0 and period > 0:
+            return quota / period
+    except (OSError, ValueError):
+        pass
+    return None
+
+def default_workers(cgroup_root: str = "/sys/fs/cgroup") -> int:
+    """``WEB_CONCURRENCY`` if set, else one worker per CPU of the quota (or of the affinity mask)."""
+    configured = os.getenv("WEB_CONCURRENCY")
+    if configured:
+        return max(1, int(configured))
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = os.cpu_count() or 1
+    quota = cpu_quota(cgroup_root)
+    if quota is not None:
+        cpus = min(cpus, math.ceil(quota))
+    return max(1, cpus)
+
+def preload(app_path: str):
+    """Import the ASGI app and compile its templates, then freeze the heap for sharing."""
+    module_name, _, attribute = app_path.partition(":")
+    module = importlib.import_module(module_name)
+    app = getattr(module, attribute or "app")
+    templates = getattr(module, "templates", None)
+    if templates is not None:
+        for name in templates.env.list_templates():
+            templates.env.get_template(name)
+    gc.collect()
+    gc.freeze()
+    logger.info("Preloaded %s; %s objects frozen", app_path, gc.get_freeze_count())
+    return app
+
+def _exit_worker(signum, frame):
+    sys.exit(0)
+
+class Prefork:
+    """Fork ``workers`` uvicorn servers sharing one listening socket and keep them running."""
+
+    def __init__(self, config, workers: int):
+        self.config = config
+        self.workers = workers
+        self.socket = config.bind_socket()
+        self.children: Dict[int, float] = {}
+        self.stopping = False
+        self.exit_code = 0
+
+    def spawn(self) -> None:
+        pid = os.fork()
+        if pid == 0:
+            self._run_worker()
+        self.children[pid] = time.monotonic()
+
+    def _run_worker(self) -> None:
+        # The master's handlers must not run in the worker. uvicorn installs its
+        # own, and re-raises the signal after shutting down; exiting through
+        # SystemExit then still runs logging.shutdown() below, which delivers
+        # the records left in the log queue.
+        signal.signal(signal.SIGTERM, _exit_worker)
+        signal.signal(signal.SIGINT, _exit_worker)
+        import uvicorn
+        code = 0
+        try:
+            uvicorn.Server(self.config).run(sockets=[self.socket])
+        except SystemExit as e:
+            code = e.code if isinstance(e.code, int) else 1
+        except BaseException as e:
+            logger.error("Worker %s crashed: %s", os.getpid(), e)
+            code = 1
+        finally:
+            logging.shutdown()
+            os._exit(code)
+
+    def stop(self, signum, frame) -> None:
+        if self.stopping:
+            return
+        self.stopping = True
+        logger.info("Received signal %s, stopping %s workers", signum, len(self.children))
+        for pid in list(self.children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    def run(self) -> int:
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+        for _ in range(self.workers):
+            self.spawn()
+        logger.info("Started %s workers on %s:%s", self.workers, self.config.host, self.config.port)
+        while self.children:
+            try:
+                pid, status = os.wait()
+            except ChildProcessError:
+                break
+            started = self.children.pop(pid, None)
+            if started is None or self.stopping:
+                continue
+            code = os.waitstatus_to_exitcode(status)
+            if code == STARTUP_FAILURE:
+                # Restarting would fail the same way (bad config, database unreachable)
+                logger.error("Worker %s failed to start, shutting down", pid)
+                self.stop(signal.SIGTERM, None)
+                self.exit_code = code
+                continue
+            logger.warning("Worker %s exited with status %s, restarting", pid, code)
+            if time.monotonic() - started < WORKER_MIN_UPTIME:
+                time.sleep(1)
+            if not self.stopping:
+                self.spawn()
+        self.socket.close()
+        logger.info("All workers stopped")
+        return self.exit_code
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Run the application with preloaded, forked workers")
+    parser.add_argument("--app", default=SERVE_APP, help="ASGI app as module:attribute (default %(default)s)")
+    parser.add_argument("--host", default=os.getenv("HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", "8000")))
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: WEB_CONCURRENCY or the CPU quota)")
+    args = parser.parse_args(argv)
+
+    import uvicorn
+    from app import logpipeline
+    app = preload(args.app)
+    config = uvicorn.Config(
+        app,
+        host=args.host,
+        port=args.port,
+        loop="auto",
+        http="auto",
+        timeout_graceful_shutdown=SERVE_GRACEFUL_TIMEOUT,
+        log_level=logpipeline.default_level().lower(),
+        # When the app set up the log pipeline, uvicorn's loggers propagate to it
+        # instead of getting handlers of their own
+        log_config=None if logpipeline.log_pipeline else uvicorn.config.LOGGING_CONFIG,
+    )
+    return Prefork(config, args.workers or default_workers()).run()
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,63 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+
+class SingleFlight:
+    """Deduplicate concurrent calls that share a key.
+
+    The first caller for a key starts the evaluation as a task; callers that
+    arrive while it is still running await the same task and receive the same
+    result (or exception). Nothing is cached once the task has finished.
+    """
+
+    def __init__(self, name: str = "singleflight"):
+        self.name = name
+        self._in_flight: Dict[Hashable, asyncio.Task] = {}
+        self.started = 0
+        self.coalesced = 0
+
+    def __len__(self) -> int:
+        return len(self._in_flight)
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        while True:
+            task = self._in_flight.get(key)
+            if task is None:
+                task = asyncio.ensure_future(fn())
+                self._in_flight[key] = task
+                task.add_done_callback(lambda t, key=key: self._forget(key, t))
+                self.started += 1
+                # The caller that started the evaluation owns it: cancelling
+                # this caller cancels the shared task.
+                return await task
+
+            self.coalesced += 1
+            try:
+                # Shield so that one waiter going away does not cancel the
+                # evaluation for everybody else.
+                return await asyncio.shield(task)
+            except asyncio.CancelledError:
+                if not task.cancelled():
+                    raise
+                # The owner was cancelled, not us: start a fresh evaluation.
+                continue
+
+    def forget(self, key: Hashable) -> None:
+        """Detach an in-flight evaluation so the next caller starts a new one."""
+        self._in_flight.pop(key, None)
+
+    def forget_where(self, predicate: Callable[[Hashable], bool]) -> None:
+        """Detach every in-flight evaluation whose key matches ``predicate``."""
+        for key in [k for k in self._in_flight if predicate(k)]:
+            self._in_flight.pop(key, None)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "in_flight": len(self._in_flight),
+            "started": self.started,
+            "coalesced": self.coalesced,
+        }
+
+    def _forget(self, key: Hashable, task: asyncio.Task) -> None:
+        if self._in_flight.get(key) is task:
+            del self._in_flight[key]
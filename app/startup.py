@@ -0,0 +1,187 @@
+"""
+Startup pipeline and readiness state.
+
+Before the application serves requests, startup makes sure the protected
+groups exist. It reads them in one query and writes only what is missing, so a
+restart against a seeded database makes no writes. Writes happen under the
+migration lock: the protected URL groups have no application, so the unique
+constraint on (name, app_id) cannot stop two workers from both creating them.
+Warm-up tasks then run concurrently in the background: opening pool
+connections, JWKS prefetch, preparing the authorization statements, loading
+the count caches and compiling the templates.
+
+``/readyz`` reports ready once every required warm-up task has succeeded, and
+not ready again once shutdown has begun.
+Failed required tasks are retried every ``STARTUP_RETRY_SECONDS``; optional
+ones are logged and left to load lazily.
+"""
+import asyncio
+import logging
+import os
+import time
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from sqlalchemy import insert, text, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import UrlGroup, UserGroup
+from app.utils import SanitizedLogger
+
+logger = SanitizedLogger(logging.getLogger(__name__))
+
+STARTUP_RETRY_SECONDS = float(os.getenv("STARTUP_RETRY_SECONDS", "5"))
+
+PROTECTED_USER_GROUPS = ("Internal User Group",)
+PROTECTED_URL_GROUPS = ("Everyone", "Authenticated")
+
+PROTECTED_GROUPS_STMT = text("""
+    SELECT 'user' AS kind, name, protected FROM user_groups
+    WHERE name = 'Internal User Group'
+    UNION ALL
+    SELECT 'url' AS kind, name, protected FROM url_groups
+    WHERE name IN ('Everyone', 'Authenticated')
+""")
+
+async def ensure_protected_groups(session: AsyncSession) -> bool:
+    """Create missing protected groups and re-protect existing ones. Returns True if anything changed."""
+    if not _changes(await _protected_groups(session)):
+        return False
+    # Not imported at module level: the decision node never seeds groups and should not load Alembic
+    from app.migrations import migration_lock
+    await session.rollback()
+    async with session.bind.connect() as conn:
+        async with migration_lock(conn):
+            # Another worker may have fixed them while we waited for the lock
+            changes = _changes(await _protected_groups(conn))
+            for model, missing, unprotected in changes:
+                if missing:
+                    logger.info("Creating protected groups: %s", ", ".join(missing))
+                    await conn.execute(insert(model), [{"name": name, "protected": 1} for name in missing])
+                if unprotected:
+                    logger.info("Re-protecting groups: %s", ", ".join(unprotected))
+                    await conn.execute(update(model).where(model.name.in_(unprotected)).values(protected=1))
+    return bool(changes)
+
+async def _protected_groups(conn) -> Dict[tuple, bool]:
+    """(kind, name) of every protected group that exists, and whether it is still protected."""
+    found: Dict[tuple, bool] = {}
+    for row in await conn.execute(PROTECTED_GROUPS_STMT):
+        key = (row.kind, row.name)
+        found[key] = found.get(key, False) or bool(row.protected)
+    return found
+
+def _changes(found: Dict[tuple, bool]) -> List[tuple]:
+    """(model, missing names, unprotected names) for each group kind that needs writes."""
+    changes = []
+    for kind, model, names in (("user", UserGroup, PROTECTED_USER_GROUPS), ("url", UrlGroup, PROTECTED_URL_GROUPS)):
+        missing = [name for name in names if (kind, name) not in found]
+        unprotected = [name for name in names if found.get((kind, name)) is False]
+        if missing or unprotected:
+            changes.append((model, missing, unprotected))
+    return changes
+
+class WarmupTask:
+    def __init__(self, name: str, run: Callable[[], Awaitable[None]], required: bool = True):
+        self.name = name
+        self.run = run
+        self.required = required
+
+class Readiness:
+    """What each warm-up task did, and whether the pod should receive traffic."""
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self) -> None:
+        self.ready = False
+        self.tasks: Dict[str, dict] = {}
+
+    def snapshot(self) -> dict:
+        return {"ready": self.ready, "tasks": dict(self.tasks)}
+
+readiness = Readiness()
+
+async def _run(task: WarmupTask) -> bool:
+    started = time.perf_counter()
+    try:
+        await task.run()
+    except Exception as e:
+        error = (str(e).splitlines() or [type(e).__name__])[0]
+        readiness.tasks[task.name] = {"status": "failed", "error": error, "required": task.required}
+        log = logger.error if task.required else logger.warning
+        log("Warm-up task '%s' failed: %s", task.name, e)
+        return False
+    elapsed_ms = round((time.perf_counter() - started) * 1000, 1)
+    readiness.tasks[task.name] = {"status": "ok", "ms": elapsed_ms, "required": task.required}
+    logger.info("Warm-up task '%s' finished in %sms", task.name, elapsed_ms)
+    return True
+
+async def warm_up(tasks: List[WarmupTask], retry_seconds: Optional[float] = None) -> None:
+    """Run ``tasks`` concurrently, retrying failed required ones until all have succeeded."""
+    retry_seconds = STARTUP_RETRY_SECONDS if retry_seconds is None else retry_seconds
+    for task in tasks:
+        readiness.tasks[task.name] = {"status": "pending", "required": task.required}
+    pending = list(tasks)
+    while True:
+        results = await asyncio.gather(*(_run(task) for task in pending))
+        pending = [task for task, ok in zip(pending, results) if not ok and task.required]
+        if not pending:
+            break
+        await asyncio.sleep(retry_seconds)
+    readiness.ready = True
+    logger.info("Warm-up complete, ready to serve")
+
+async def shutdown(app) -> None:
+    """Stop warm-up, flush the audit log, close the database pools and the identity provider session."""
+    from app.api.endpoints.oauth import close_http_session
+    from app.audit import audit_log
+    from app.db import dispose_engines
+    from app.policy import shared_policy
+    task = getattr(app.state, "warm_up", None)
+    if task is not None and not task.done():
+        task.cancel()
+    readiness.ready = False
+    await shared_policy.close()
+    # Before the pools go away: the database sink needs them
+    await audit_log.close()
+    await dispose_engines()
+    close_http_session()
+    logger.info("Shut down: database pools disposed")
+
+def warmup_tasks(templates=None) -> List[WarmupTask]:
+    """The standard warm-up tasks. The admin UI ones (count caches, template
+    compilation) are included when its ``templates`` are given."""
+    from app import crud
+    from app.db import get_engine, get_read_engine, get_read_session_maker, get_async_session_maker, prewarm_pool
+    from app.stats import get_dashboard_counts, get_member_counts
+
+    def read_session():
+        return (get_read_session_maker() or get_async_session_maker())()
+
+    async def prepare_statements():
+        async with read_session() as session:
+            await crud.warm_authorization(session)
+
+    async def load_counts():
+        async with read_session() as session:
+            await get_dashboard_counts(session)
+            await get_member_counts(session)
+
+    async def compile_templates():
+        for name in templates.env.list_templates():
+            templates.env.get_template(name)
+
+    async def prefetch_jwks():
+        from app.api.endpoints.oauth import get_jwks
+        await asyncio.to_thread(get_jwks)
+
+    tasks = [WarmupTask("db_pool", lambda: prewarm_pool(get_engine()))]
+    if get_read_engine() is not None:
+        tasks.append(WarmupTask("db_read_pool", lambda: prewarm_pool(get_read_engine())))
+    tasks.append(WarmupTask("authorization_statements", prepare_statements))
+    if templates is not None:
+        tasks.append(WarmupTask("count_caches", load_counts))
+        tasks.append(WarmupTask("templates", compile_templates, required=False))
+    if os.getenv("OAUTH2_JWKS_URL"):
+        tasks.append(WarmupTask("jwks", prefetch_jwks, required=False))
+    return tasks
@@ -0,0 +1,108 @@
+"""
+Cached counts for the dashboard and list pages.
+
+Counts are computed with one aggregate query each and kept in memory until the
+policy version changes, so rendering the dashboard or the user group list costs
+no count queries at all while nothing is being written. The policy version is
+process-local: writes made through another worker are picked up once
+``STATS_CACHE_TTL`` seconds have passed.
+
+When a read replica is configured, cached counts may have been read from it
+while it lagged behind a write. A request that reads from the primary anyway
+(its client carries the read-after-write cookie) skips the cache and counts
+again, so an admin sees the effect of their own write straight away.
+"""
+import logging
+import os
+import time
+from typing import Any, Awaitable, Callable, Dict, Hashable, Tuple
+
+from sqlalchemy import func, select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db import get_read_session_maker
+from app.models import UrlGroup, user_group_members
+from app.policy import get_policy_version, on_policy_change
+from app.utils import SanitizedLogger
+
+logger = SanitizedLogger(logging.getLogger(__name__))
+
+STATS_CACHE_TTL = float(os.getenv("STATS_CACHE_TTL", "30"))
+
+DASHBOARD_COUNTS_STMT = text("""
+    SELECT
+        (SELECT COUNT(*) FROM applications) AS app_count,
+        (SELECT COUNT(*) FROM user_groups) AS user_group_count,
+        (SELECT COUNT(*) FROM url_groups) AS url_group_count,
+        (SELECT COUNT(*) FROM users) AS user_count
+""")
+
+class StatsCache:
+    """Values keyed by name, valid for one policy version and at most ``ttl`` seconds."""
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self._entries: Dict[Hashable, Tuple[int, float, Any]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    async def get(self, key: Hashable, load: Callable[[], Awaitable[Any]], fresh: bool = False) -> Any:
+        """Cached value for ``key``, or ``load()``'s result. ``fresh`` skips the cached value."""
+        version = get_policy_version()
+        entry = self._entries.get(key)
+        if not fresh and entry and entry[0] == version and time.monotonic() - entry[1] < self.ttl:
+            self.hits += 1
+            return entry[2]
+        self.misses += 1
+        value = await load()
+        # A write committed while we were counting makes this value stale already
+        if get_policy_version() == version:
+            self._entries[key] = (version, time.monotonic(), value)
+        return value
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def stats(self) -> Dict[str, int]:
+        return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+stats_cache = StatsCache(STATS_CACHE_TTL)
+
+@on_policy_change
+def _forget_stats(version: int) -> None:
+    stats_cache.clear()
+
+def _reads_own_writes(session: AsyncSession) -> bool:
+    """Whether ``session`` is the primary standing in for a configured read replica."""
+    return get_read_session_maker() is not None and not getattr(session, "replica", False)
+
+async def get_dashboard_counts(session: AsyncSession) -> Dict[str, int]:
+    """Row counts of applications, user groups, URL groups and users."""
+    async def load():
+        logger.debug("Counting dashboard rows")
+        row = (await session.execute(DASHBOARD_COUNTS_STMT)).one()
+        return dict(row._mapping)
+    return await stats_cache.get("dashboard", load, fresh=_reads_own_writes(session))
+
+async def get_member_counts(session: AsyncSession) -> Dict[int, int]:
+    """Number of members per user group id; groups without members are absent."""
+    async def load():
+        logger.debug("Counting user group members")
+        result = await session.execute(
+            select(user_group_members.c.user_group_id, func.count())
+            .group_by(user_group_members.c.user_group_id)
+        )
+        return dict(result.all())
+    return await stats_cache.get("members", load, fresh=_reads_own_writes(session))
+
+async def get_url_group_counts(session: AsyncSession) -> Dict[int, int]:
+    """Number of URL groups per application id; applications without any are absent."""
+    async def load():
+        logger.debug("Counting URL groups per application")
+        result = await session.execute(
+            select(UrlGroup.app_id, func.count())
+            .where(UrlGroup.app_id.is_not(None))
+            .group_by(UrlGroup.app_id)
+        )
+        return dict(result.all())
+    return await stats_cache.get("url_groups", load, fresh=_reads_own_writes(session))
@@ -1,5 +1,7 @@
 import re
 import hashlib
+import logging
+from collections.abc import Mapping
 from typing import Any, Dict, List, Optional, Union
 from urllib.parse import urlparse, parse_qs, urlencode, urlunparse
 
@@ -137,52 +139,93 @@ def sanitize_environment_variables(env_dict: Dict[str, str], sensitive_keys: Opt
     return sanitized
 
 
+# Possessive quantifiers where the next character cannot be in the class:
+# same matches, without backtracking through every word of the message.
+# An address right after a '*' has already been masked, so sanitizing twice
+# gives the same message.
+EMAIL_PATTERN = re.compile(r'(?<!\*)\b[A-Za-z0-9._%+-]++@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b')
+TOKEN_PATTERN = re.compile(r'\b[A-Za-z0-9-_]++\.[A-Za-z0-9-_]++\.[A-Za-z0-9-_]+\b')
+DB_URL_PATTERN = re.compile(r'(?:mysql|postgresql|sqlite)(?:\+[a-z]+)?://[^\s]+')
+
+
 def sanitize_log_message(message: str) -> str:
     """Sanitize log messages by masking common sensitive patterns."""
     if not message:
         return message
     
+    # Each pattern is only run when the message has the character it needs to match
     # Mask email addresses
-    email_pattern = r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b'
-    message = re.sub(email_pattern, lambda m: sanitize_email(m.group()), message)
+    if '@' in message:
+        message = EMAIL_PATTERN.sub(lambda m: sanitize_email(m.group()), message)
     
     # Mask tokens (JWT-like patterns)
-    token_pattern = r'\b[A-Za-z0-9-_]+\.[A-Za-z0-9-_]+\.[A-Za-z0-9-_]+\b'
-    message = re.sub(token_pattern, lambda m: sanitize_token(m.group()), message)
+    if message.count('.') >= 2:
+        message = TOKEN_PATTERN.sub(lambda m: sanitize_token(m.group()), message)
     
     # Mask database URLs
-    db_url_pattern = r'(?:mysql|postgresql|sqlite)(?:\+[a-z]+)?://[^\s]+'
-    message = re.sub(db_url_pattern, lambda m: sanitize_database_url(m.group()), message)
+    if '://' in message:
+        message = DB_URL_PATTERN.sub(lambda m: sanitize_database_url(m.group()), message)
     
     return message
 
 
+class MaskedEmail:
+    """Log argument that masks an email address only if the record is emitted."""
+
+    __slots__ = ("email",)
+
+    def __init__(self, email: Optional[str]):
+        self.email = email
+
+    def __str__(self) -> str:
+        return str(sanitize_email(self.email))
+
+
 class SanitizedLogger:
-    """A logger wrapper that automatically sanitizes sensitive information."""
+    """A logger wrapper that automatically sanitizes sensitive information.
+
+    The level is checked first; messages are only formatted and sanitized when
+    they will be emitted. Pass values as ``%``-style arguments
+    (``logger.debug("Found user %s", MaskedEmail(email))``) rather than in an
+    f-string, so that a disabled call costs only the level check. Records are
+    sanitized before they reach any handler, whoever attached it.
+    """
     
     def __init__(self, logger):
         self.logger = logger
     
+    def isEnabledFor(self, level: int) -> bool:
+        return self.logger.isEnabledFor(level)
+    
+    def _log(self, level: int, message: str, args: tuple, kwargs: dict):
+        if not self.logger.isEnabledFor(level):
+            return
+        # Report the caller's file and line rather than this wrapper's
+        kwargs.setdefault("stacklevel", 3)
+        message = str(message)
+        if args:
+            if len(args) == 1 and isinstance(args[0], Mapping) and args[0]:
+                args = args[0]
+            try:
+                message = message % args
+            except (TypeError, ValueError, KeyError):
+                message = f"{message} {args!r}"
+        self.logger.log(level, sanitize_log_message(message), **kwargs)
+    
     def debug(self, message: str, *args, **kwargs):
-        sanitized_message = sanitize_log_message(message)
-        self.logger.debug(sanitized_message, *args, **kwargs)
+        self._log(logging.DEBUG, message, args, kwargs)
     
     def info(self, message: str, *args, **kwargs):
-        sanitized_message = sanitize_log_message(message)
-        self.logger.info(sanitized_message, *args, **kwargs)
+        self._log(logging.INFO, message, args, kwargs)
     
     def warning(self, message: str, *args, **kwargs):
-        sanitized_message = sanitize_log_message(message)
-        self.logger.warning(sanitized_message, *args, **kwargs)
+        self._log(logging.WARNING, message, args, kwargs)
     
     def error(self, message: str, *args, **kwargs):
-        sanitized_message = sanitize_log_message(message)
-        self.logger.error(sanitized_message, *args, **kwargs)
+        self._log(logging.ERROR, message, args, kwargs)
     
     def critical(self, message: str, *args, **kwargs):
-        sanitized_message = sanitize_log_message(message)
-        self.logger.critical(sanitized_message, *args, **kwargs)
+        self._log(logging.CRITICAL, message, args, kwargs)
     
-    def exception(self, message: str, *args, **kwargs):
-        sanitized_message = sanitize_log_message(message)
-        self.logger.exception(sanitized_message, *args, **kwargs) 
\ No newline at end of file
+    def exception(self, message: str, *args, exc_info=True, **kwargs):
+        self._log(logging.ERROR, message, args, {"exc_info": exc_info, **kwargs})
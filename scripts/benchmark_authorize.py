@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Benchmark the per-request cost of an authorization check.
+
+Compares the previous approach, which looked up the application and then built
+new select() constructs for each step on every check, with
+``crud.is_user_allowed_full_url``, which is what ``/api/authorize`` runs. Both
+run against the same seeded in-memory SQLite database, so the difference is
+Python-side overhead and round trips (statement construction, cache key
+generation, compilation).
+
+Usage:
+    python scripts/benchmark_authorize.py [iterations]
+"""
+
+import asyncio
+import logging
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import and_, insert, select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from app import crud
+from app.db import Base
+from app.models import (
+    Application, Url, UrlGroup, User, UserGroup,
+    user_group_members, user_group_url_group_associations,
+)
+
+
+async def legacy_is_user_allowed_full_url(session, email, full_url):
+    """The select()-per-call implementation, kept here for comparison."""
+    _, host, path = crud.parse_full_url(full_url)
+    app = (await session.execute(select(Application).where(Application.host == host))).scalar_one_or_none()
+    if app is None:
+        return False
+    app_id = app.app_id
+    for group_name in ("Everyone", "Authenticated"):
+        q = (
+            select(UrlGroup)
+            .join(Url, UrlGroup.group_id == Url.url_group_id)
+            .where(UrlGroup.name == group_name, UrlGroup.protected == 1, UrlGroup.app_id == app_id, Url.path == path)
+        )
+        if (await session.execute(q)).scalar_one_or_none() and (group_name == "Everyone" or email):
+            return True
+    q = (
+        select(User)
+        .join(user_group_members, User.user_id == user_group_members.c.user_id)
+        .join(UserGroup, user_group_members.c.user_group_id == UserGroup.group_id)
+        .where(User.email == email, UserGroup.name == "Internal User Group", UserGroup.protected == 1)
+    )
+    if (await session.execute(q)).scalar_one_or_none():
+        return True
+    q = (
+        select(User)
+        .join(user_group_members, User.user_id == user_group_members.c.user_id)
+        .join(UserGroup, user_group_members.c.user_group_id == UserGroup.group_id)
+        .join(user_group_url_group_associations, UserGroup.group_id == user_group_url_group_associations.c.user_group_id)
+        .join(UrlGroup, user_group_url_group_associations.c.url_group_id == UrlGroup.group_id)
+        .join(Url, UrlGroup.group_id == Url.url_group_id)
+        .where(and_(User.email == email, Url.path == path, UrlGroup.app_id == app_id))
+    )
+    return (await session.execute(q)).scalar_one_or_none() is not None
+
+
+async def seed(engine):
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.execute(insert(Application).values(app_id=1, name="App", host="app.example.com"))
+        await conn.execute(insert(User).values(user_id=1, email="member@example.com"))
+        await conn.execute(insert(UserGroup).values(group_id=1, name="Members", protected=0))
+        await conn.execute(insert(UrlGroup).values(group_id=1, name="Reports", protected=0, app_id=1))
+        await conn.execute(insert(Url).values(url_id=1, path="/reports", url_group_id=1))
+        await conn.execute(insert(user_group_members).values(user_group_id=1, user_id=1))
+        await conn.execute(insert(user_group_url_group_associations).values(user_group_id=1, url_group_id=1))
+
+
+URL = "https://app.example.com/reports"
+
+
+async def run(label, check, session, iterations):
+    # Warm up the statement caches before timing
+    for _ in range(50):
+        assert await check(session, "member@example.com", URL)
+    start = time.perf_counter()
+    for _ in range(iterations):
+        await check(session, "member@example.com", URL)
+    elapsed = time.perf_counter() - start
+    print(f"{label:<12} {iterations / elapsed:>10.0f} checks/s  {elapsed / iterations * 1e6:>8.1f} us/check")
+    return elapsed
+
+
+async def main_async(iterations):
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+    await seed(engine)
+    session_maker = async_sessionmaker(engine, expire_on_commit=False)
+    async with session_maker() as session:
+        before = await run("before", legacy_is_user_allowed_full_url, session, iterations)
+        after = await run("after", crud.is_user_allowed_full_url, session, iterations)
+    await engine.dispose()
+    print(f"speedup      {before / after:>10.2f}x")
+
+
+def main():
+    # Keep sampled decision logs out of the timings
+    logging.disable(logging.CRITICAL)
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    asyncio.run(main_async(iterations))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Benchmark what logging adds to an authorization check.
+
+Times app.crud.is_user_allowed_full_url against a seeded in-memory SQLite
+database with logging disabled and at each log level, with records written to
+a discarding handler. The levels are timed in alternating rounds and the median
+per level is reported, so drift over the run is not charged to whichever level
+happens to go last. Also compares one disabled debug call written the old way
+(f-string, eager sanitization) with a lazy ``%``-style call.
+
+Usage:
+    python scripts/benchmark_logging.py [iterations]
+"""
+
+import asyncio
+import io
+import logging
+import os
+import statistics
+import sys
+import time
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from app import crud
+from app.utils import MaskedEmail, SanitizedLogger, sanitize_email, sanitize_log_message
+from scripts.benchmark_authorize import seed
+
+URL = "https://app.example.com/reports"
+EMAIL = "member@example.com"
+ROUNDS = 10
+
+
+async def time_checks(session, iterations):
+    for _ in range(50):
+        assert await crud.is_user_allowed_full_url(session, EMAIL, URL)
+    start = time.perf_counter()
+    for _ in range(iterations):
+        await crud.is_user_allowed_full_url(session, EMAIL, URL)
+    return (time.perf_counter() - start) / iterations
+
+
+async def main_async(iterations):
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+    await seed(engine)
+    session_maker = async_sessionmaker(engine, expire_on_commit=False)
+    root = logging.getLogger()
+    handler = logging.StreamHandler(io.StringIO())
+    handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+    root.handlers[:] = [handler]
+
+    levels = ("disabled", "WARNING", "INFO", "DEBUG")
+    timings = {level: [] for level in levels}
+    async with session_maker() as session:
+        for _ in range(ROUNDS):
+            for level in levels:
+                if level == "disabled":
+                    logging.disable(logging.CRITICAL)
+                else:
+                    logging.disable(logging.NOTSET)
+                    root.setLevel(level)
+                handler.stream.seek(0)
+                handler.stream.truncate()
+                timings[level].append(await time_checks(session, iterations // ROUNDS))
+    logging.disable(logging.NOTSET)
+    await engine.dispose()
+
+    baseline = statistics.median(timings["disabled"])
+    for level in levels:
+        elapsed = statistics.median(timings[level])
+        print(f"{level:<10} {elapsed * 1e6:>8.1f} us/check  overhead {(elapsed - baseline) * 1e6:>7.1f} us")
+
+
+def disabled_call_costs(iterations):
+    logger = SanitizedLogger(logging.getLogger("benchmark"))
+    logger.logger.setLevel(logging.INFO)
+
+    def eager():
+        # What every debug line did before: build the message, then sanitize it
+        sanitize_log_message(f"Looking up user with email: {sanitize_email(EMAIL)}")
+
+    def lazy():
+        logger.debug("Looking up user with email: %s", MaskedEmail(EMAIL))
+
+    for label, fn in (("eager", eager), ("lazy", lazy)):
+        seconds = timeit.timeit(fn, number=iterations) / iterations
+        print(f"disabled debug call, {label:<5} {seconds * 1e9:>8.0f} ns")
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    asyncio.run(main_async(iterations))
+    disabled_call_costs(iterations * 10)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+Bulk import users and user group memberships from a CSV or NDJSON file.
+
+CSV rows are "email,group" (an optional header row naming the columns is
+allowed); NDJSON rows are {"email": ..., "group": ...}. Use "-" to read stdin.
+
+Usage:
+    uv run import-memberships users.csv
+    uv run import-memberships --format ndjson --chunk-size 1000 - < users.ndjson
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dotenv import load_dotenv
+
+# Load environment variables from .env file
+load_dotenv()
+
+from app import bulk
+from app.db import get_async_session_maker, get_engine
+
+
+async def read_lines(stream):
+    for line in stream:
+        yield line.rstrip("\r\n")
+
+
+async def run(args):
+    fmt = args.format or bulk.detect_format(None, args.file)
+    stream = sys.stdin if args.file == "-" else open(args.file, encoding="utf-8")
+    try:
+        async with get_async_session_maker()() as session:
+            report = await bulk.import_memberships(session, read_lines(stream), fmt, args.chunk_size)
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+        await get_engine().dispose()
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk import users and group memberships")
+    parser.add_argument("file", help="CSV or NDJSON file, or - for stdin")
+    parser.add_argument("--format", choices=["csv", "ndjson"], help="defaults from the file extension")
+    parser.add_argument("--chunk-size", type=int, default=None, help="rows per transaction")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    print(report.json(indent=2))
+    sys.exit(1 if report.failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Export or restore the whole authorization policy as NDJSON.
+
+Usage:
+    uv run policy-backup export policy.ndjson
+    uv run policy-backup import policy.ndjson
+    uv run policy-backup export - | gzip > policy.ndjson.gz
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dotenv import load_dotenv
+
+# Load environment variables from .env file
+load_dotenv()
+
+from app import backup
+from app.db import get_async_session_maker, get_engine
+
+
+async def read_lines(stream):
+    for line in stream:
+        yield line.rstrip("\r\n")
+
+
+async def run_export(path):
+    stream = sys.stdout if path == "-" else open(path, "w", encoding="utf-8")
+    try:
+        async for line in backup.export_policy(get_engine()):
+            stream.write(line)
+    finally:
+        if stream is not sys.stdout:
+            stream.close()
+        await get_engine().dispose()
+
+
+async def run_import(path):
+    stream = sys.stdin if path == "-" else open(path, encoding="utf-8")
+    try:
+        async with get_async_session_maker()() as session:
+            return await backup.import_policy(session, read_lines(stream))
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+        await get_engine().dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export or restore the authorization policy")
+    parser.add_argument("command", choices=["export", "import"])
+    parser.add_argument("file", help="NDJSON file, or - for stdout/stdin")
+    args = parser.parse_args()
+
+    if args.command == "export":
+        asyncio.run(run_export(args.file))
+        return
+
+    try:
+        report = asyncio.run(run_import(args.file))
+    except ValueError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+    print(report.json(indent=2))
+    sys.exit(1 if report.failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""
+Shared fixtures: a fresh SQLite database for each test, and an HTTP client
+whose requests use it.
+
+Modules seed their own data by overriding ``engine``::
+
+    @pytest_asyncio.fixture
+    async def engine(engine):
+        async with engine.begin() as conn:
+            await conn.execute(insert(UserGroup).values(group_id=1, name="Staff", protected=0))
+        return engine
+"""
+import pytest
+import pytest_asyncio
+from fastapi import Depends
+from httpx import AsyncClient, ASGITransport
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from app.db import Base, get_async_session, get_read_session
+
+
+@pytest_asyncio.fixture
+async def engine(tmp_path):
+    """A SQLite database file with every table created."""
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'test.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    yield engine
+    await engine.dispose()
+
+
+@pytest.fixture
+def asgi_app():
+    """The application the ``client`` fixture talks to."""
+    from app.main import app
+    return app
+
+
+@pytest.fixture
+def session_maker(engine, asgi_app):
+    """Sessions on ``engine``, which the application's requests use as well."""
+    sessions = async_sessionmaker(engine, expire_on_commit=False)
+
+    async def override():
+        async with sessions() as session:
+            yield session
+
+    # Like production without a replica: reads share the request's session
+    async def read_override(session: AsyncSession = Depends(get_async_session)):
+        yield session
+
+    asgi_app.dependency_overrides[get_async_session] = override
+    asgi_app.dependency_overrides[get_read_session] = read_override
+    yield sessions
+    asgi_app.dependency_overrides.pop(get_async_session, None)
+    asgi_app.dependency_overrides.pop(get_read_session, None)
+
+
+@pytest_asyncio.fixture
+async def client(session_maker, asgi_app):
+    async with AsyncClient(transport=ASGITransport(app=asgi_app), base_url="http://test") as ac:
+        yield ac
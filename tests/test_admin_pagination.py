@@ -0,0 +1,90 @@
+import re
+import pytest
+import pytest_asyncio
+from sqlalchemy import insert
+from app.models import User, UserGroup, UrlGroup, Url, user_group_members, user_group_url_group_associations
+
+
+@pytest.fixture(autouse=True)
+def page_size(monkeypatch):
+    monkeypatch.setattr("app.pagination.ADMIN_PAGE_SIZE", 2)
+
+
+@pytest_asyncio.fixture
+async def engine(engine):
+    async with engine.begin() as conn:
+        await conn.execute(insert(UserGroup).values(group_id=1, name="Engineering", protected=0))
+        await conn.execute(insert(UserGroup).values(group_id=2, name="Finance", protected=0))
+        for i in range(5):
+            await conn.execute(insert(User).values(user_id=i + 1, email=f"user{i}@example.com"))
+            await conn.execute(insert(user_group_members).values(user_group_id=1, user_id=i + 1))
+        for i in range(3):
+            await conn.execute(insert(UrlGroup).values(group_id=i + 1, name=f"Reports {i}", protected=0))
+            await conn.execute(insert(user_group_url_group_associations).values(user_group_id=1, url_group_id=i + 1))
+        await conn.execute(insert(user_group_url_group_associations).values(user_group_id=2, url_group_id=1))
+        # Created last but sorts first by name
+        await conn.execute(insert(UrlGroup).values(group_id=4, name="Archive", protected=0))
+        for i in range(5):
+            await conn.execute(insert(Url).values(path=f"/reports/{i}", url_group_id=1))
+    return engine
+
+
+def next_cursor(html):
+    match = re.search(r"cursor=([A-Za-z0-9_-]+)", html)
+    return match.group(1) if match else None
+
+
+@pytest.mark.asyncio
+async def test_group_members_page_through(client):
+    resp = await client.get("/user-groups/1/users")
+    seen = re.findall(r"user\d@example\.com", resp.text)
+    cursor = next_cursor(resp.text)
+    while cursor:
+        resp = await client.get(f"/user-groups/1/users?cursor={cursor}")
+        seen += re.findall(r"user\d@example\.com", resp.text)
+        cursor = next_cursor(resp.text)
+    assert sorted(set(seen)) == [f"user{i}@example.com" for i in range(5)]
+
+    resp = await client.get("/user-groups/1/users?q=user3")
+    assert set(re.findall(r"user\d@example\.com", resp.text)) == {"user3@example.com"}
+    assert next_cursor(resp.text) is None
+
+
+@pytest.mark.asyncio
+async def test_associations_sorted_and_paged(client):
+    resp = await client.get("/associations/rows?sort=url_group&order=desc")
+    assert resp.status_code == 200
+    first = re.findall(r"Reports \d", resp.text)
+    assert first == ["Reports 2", "Reports 1"]
+    resp = await client.get(f"/associations/rows?sort=url_group&order=desc&cursor={next_cursor(resp.text)}")
+    assert re.findall(r"Reports \d", resp.text) == ["Reports 0", "Reports 0"]
+    assert next_cursor(resp.text) is None
+
+    resp = await client.get("/associations/rows?q=fin")
+    assert re.findall(r"Reports \d", resp.text) == ["Reports 0"]
+
+
+@pytest.mark.asyncio
+async def test_url_group_urls_load_more(client):
+    resp = await client.get("/url-groups?selected=1")
+    assert resp.status_code == 200
+    assert "/reports/0" in resp.text and "/reports/2" not in resp.text
+    cursor = re.search(r"url-items\?cursor=([A-Za-z0-9_-]+)", resp.text).group(1)
+    resp = await client.get(f"/url-groups/1/url-items?cursor={cursor}")
+    assert "/reports/2" in resp.text and "/reports/3" in resp.text
+    assert "/url-groups/1/url-items?cursor=" in resp.text
+
+
+@pytest.mark.asyncio
+async def test_url_groups_paged_by_name(client):
+    resp = await client.get("/url-groups/items")
+    seen = re.findall(r"Archive|Reports \d", resp.text)
+    cursor = next_cursor(resp.text)
+    while cursor:
+        resp = await client.get(f"/url-groups/items?cursor={cursor}")
+        seen += re.findall(r"Archive|Reports \d", resp.text)
+        cursor = next_cursor(resp.text)
+    assert seen == ["Archive", "Reports 0", "Reports 1", "Reports 2"]
+
+    resp = await client.get("/url-groups/items?q=Reports%201")
+    assert re.findall(r"Reports \d", resp.text) == ["Reports 1"]
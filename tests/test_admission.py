@@ -0,0 +1,102 @@
+import asyncio
+import pytest
+from httpx import AsyncClient, ASGITransport
+from app.main import app
+from app import crud
+from app.admission import AdmissionController, AdmissionRejected
+from app.api.endpoints import authorize as authorize_endpoint
+
+
+@pytest.mark.asyncio
+async def test_admits_up_to_concurrency_limit():
+    controller = AdmissionController(max_concurrency=2, max_queue=0, queue_timeout=0.1)
+    async with controller.slot():
+        async with controller.slot():
+            assert controller.in_flight == 2
+            with pytest.raises(AdmissionRejected) as exc:
+                async with controller.slot():
+                    pass
+            assert exc.value.reason == "queue full"
+    stats = controller.stats()
+    assert stats["in_flight"] == 0
+    assert stats["admitted"] == 2
+    assert stats["rejected"] == 1
+
+
+@pytest.mark.asyncio
+async def test_queued_request_times_out():
+    controller = AdmissionController(max_concurrency=1, max_queue=1, queue_timeout=0.01)
+    async with controller.slot():
+        with pytest.raises(AdmissionRejected) as exc:
+            async with controller.slot():
+                pass
+    assert exc.value.reason == "queue timeout"
+    assert controller.stats()["rejected_timeout"] == 1
+    assert controller.stats()["queue_depth"] == 0
+
+
+@pytest.mark.asyncio
+async def test_queued_request_is_admitted_when_slot_frees():
+    controller = AdmissionController(max_concurrency=1, max_queue=1, queue_timeout=1.0)
+    order = []
+
+    async def worker(name):
+        async with controller.slot():
+            order.append(name)
+            await asyncio.sleep(0.01)
+
+    await asyncio.gather(worker("first"), worker("second"))
+    assert order == ["first", "second"]
+    assert controller.stats()["rejected"] == 0
+
+
+@pytest.mark.asyncio
+async def test_disabled_controller_never_rejects():
+    controller = AdmissionController(max_concurrency=0, max_queue=0, queue_timeout=0)
+    async with controller.slot():
+        async with controller.slot():
+            pass
+    assert controller.stats()["rejected"] == 0
+
+
+@pytest.mark.asyncio
+async def test_saturated_authorize_fails_closed(monkeypatch):
+    controller = AdmissionController(max_concurrency=1, max_queue=0, queue_timeout=0.01)
+    monkeypatch.setattr(authorize_endpoint, "authorize_admission", controller)
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        async with controller.slot():
+            resp = await ac.get("/api/authorize?url=https://app.example.com/dashboard")
+            assert resp.status_code == 503
+            assert resp.json()["allowed"] is False
+            assert resp.headers["retry-after"] == "1"
+
+            # Web assets never need the database and are still allowed
+            resp = await ac.get("/api/authorize?url=https://app.example.com/app.js")
+            assert resp.status_code == 200
+    assert controller.stats()["rejected_queue_full"] == 2
+
+
+@pytest.mark.asyncio
+async def test_saturated_authorize_fails_open_for_known_public_urls(monkeypatch):
+    controller = AdmissionController(max_concurrency=1, max_queue=0, queue_timeout=0.01)
+    monkeypatch.setattr(authorize_endpoint, "authorize_admission", controller)
+    monkeypatch.setattr(authorize_endpoint, "AUTHORIZE_SHED_MODE", "fail-open-public")
+    crud.remember_public_url("app.example.com", "/welcome")
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        async with controller.slot():
+            resp = await ac.get("/api/authorize?url=https://app.example.com/welcome")
+            assert resp.status_code == 200
+            assert resp.json()["allowed"] is True
+
+            resp = await ac.get("/api/authorize?url=https://app.example.com/private")
+            assert resp.status_code == 503
+
+
+@pytest.mark.asyncio
+async def test_metrics_expose_admission_counters():
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        resp = await ac.get("/api/metrics")
+        assert resp.status_code == 200
+        data = resp.json()
+        assert "queue_depth" in data["admission"]
+        assert "rejected" in data["admission"]
@@ -17,22 +17,22 @@ def override_get_async_session():
             yield session
     return _override
 
-app.dependency_overrides[get_async_session] = override_get_async_session()
-
-@pytest.fixture(scope="session", autouse=True)
+@pytest.fixture(scope="module", autouse=True)
 def setup_db():
+    app.dependency_overrides[get_async_session] = override_get_async_session()
     # Create tables
     async def init_models():
         async with engine_test.begin() as conn:
             await conn.run_sync(Base.metadata.create_all)
     import asyncio
-    asyncio.get_event_loop().run_until_complete(init_models())
+    asyncio.run(init_models())
     yield
     # Drop tables after tests
     async def drop_models():
         async with engine_test.begin() as conn:
             await conn.run_sync(Base.metadata.drop_all)
-    asyncio.get_event_loop().run_until_complete(drop_models())
+    asyncio.run(drop_models())
+    app.dependency_overrides.pop(get_async_session, None)
 
 @pytest.mark.asyncio
 async def test_create_application():
@@ -0,0 +1,222 @@
+import asyncio
+import gzip
+import json
+import pytest
+import pytest_asyncio
+from sqlalchemy import insert, select
+from sqlalchemy.exc import OperationalError
+from app import crud
+from app.api.endpoints import metrics as metrics_endpoint
+from app.audit import AuditLog, DatabaseSink, FileSink
+from app.breaker import authorize_breaker
+from app.decisionlog import Decision
+from app.models import Application, AuditEvent, UrlGroup, Url
+from app.policy import get_policy_version
+from app.querystats import track_queries
+
+ALLOWED = Decision(True, "group", "Wiki")
+DENIED = Decision(False, "no_match", "Wiki")
+
+
+def read_ndjson(directory):
+    records = []
+    for path in sorted(directory.glob("audit-*.ndjson.gz")):
+        with gzip.open(path, "rt") as f:
+            records.extend(json.loads(line) for line in f)
+    return records
+
+
+class FlakySink:
+    name = "flaky"
+
+    def __init__(self):
+        self.fail = True
+        self.batches = []
+
+    async def __call__(self, records):
+        if self.fail:
+            raise OSError("disk full")
+        self.batches.append(records)
+
+
+@pytest.mark.asyncio
+async def test_file_sink_writes_rotating_compressed_ndjson(tmp_path):
+    audit = AuditLog(FileSink(str(tmp_path), rotate_bytes=200), capacity=100, batch_size=3, flush_interval=60)
+    for i in range(7):
+        audit.record(ALLOWED if i % 2 else DENIED, "editor@example.com", "wiki.example.com", f"/page/{i}")
+    assert await audit.flush() == 7
+
+    records = read_ndjson(tmp_path)
+    assert [r["path"] for r in records] == [f"/page/{i}" for i in range(7)]
+    assert records[0]["user"] == "e****r@example.com"
+    assert records[0]["allowed"] is False
+    assert records[1]["rule"] == "group"
+    assert records[1]["app"] == "Wiki"
+    assert records[0]["ts"].endswith("+00:00")
+    # Three batches, each starting a new file once the previous one is over 200 bytes
+    assert len(list(tmp_path.glob("audit-*.ndjson.gz"))) > 1
+    assert audit.stats()["flushes"] == 3
+
+
+@pytest.mark.asyncio
+async def test_full_buffer_drops_new_records():
+    audit = AuditLog(FlakySink(), capacity=2, batch_size=10, flush_interval=60)
+    for _ in range(3):
+        audit.record(ALLOWED, "editor@example.com", "wiki.example.com", "/")
+    stats = audit.stats()
+    assert stats["buffered"] == 2
+    assert stats["recorded"] == 2
+    assert stats["dropped"] == 1
+
+
+@pytest.mark.asyncio
+async def test_failed_flush_keeps_records_for_the_next_one():
+    sink = FlakySink()
+    audit = AuditLog(sink, capacity=100, batch_size=2, flush_interval=60, max_attempts=1)
+    for i in range(3):
+        audit.record(ALLOWED, "editor@example.com", "wiki.example.com", f"/{i}")
+    # An outage is retried however long it lasts
+    for _ in range(3):
+        assert await audit.flush() == 0
+    assert audit.stats()["flush_errors"] == 3
+    assert audit.stats()["buffered"] == 3
+    assert audit.stats()["rejected"] == 0
+
+    sink.fail = False
+    assert await audit.flush() == 3
+    assert [[r["path"] for r in batch] for batch in sink.batches] == [["/0", "/1"], ["/2"]]
+    assert audit.stats()["buffered"] == 0
+
+
+class PickySink:
+    """Rejects every batch that contains the path '/bad'."""
+
+    name = "picky"
+
+    def __init__(self):
+        self.batches = []
+
+    async def __call__(self, records):
+        if any(r["path"] == "/bad" for r in records):
+            raise ValueError("value too long for column")
+        self.batches.append(records)
+
+
+@pytest.mark.asyncio
+async def test_rejected_records_are_set_aside(tmp_path):
+    sink = PickySink()
+    rejected = tmp_path / "rejected.ndjson"
+    audit = AuditLog(sink, capacity=100, batch_size=5, flush_interval=60, max_attempts=2, rejected_path=str(rejected))
+    for path in ("/0", "/1", "/bad", "/3", "/4", "/5"):
+        audit.record(ALLOWED, "editor@example.com", "wiki.example.com", path)
+
+    assert await audit.flush() == 0
+    assert await audit.flush() == 5
+    assert sorted(r["path"] for batch in sink.batches for r in batch) == ["/0", "/1", "/3", "/4", "/5"]
+    [line] = rejected.read_text().splitlines()
+    assert json.loads(line)["path"] == "/bad"
+    assert json.loads(line)["error"] == "value too long for column"
+    stats = audit.stats()
+    assert stats["buffered"] == 0
+    assert stats["rejected"] == 1
+    assert stats["written"] == 5
+
+
+@pytest.mark.asyncio
+async def test_records_fit_the_columns_and_drop_credentials():
+    audit = AuditLog(FlakySink(), capacity=10, batch_size=10, flush_interval=60)
+    audit.record(Decision(True, "group", "A" * 300), "editor@example.com", "bob:secret@wiki.example.com:8443", "/" + "p" * 3000)
+    [record] = audit._buffer
+    assert record["host"] == "wiki.example.com:8443"
+    assert len(record["app"]) == 255
+    assert len(record["path"]) == 2048
+
+
+@pytest.mark.asyncio
+async def test_background_flusher_and_close(tmp_path):
+    sink = FlakySink()
+    sink.fail = False
+    audit = AuditLog(sink, capacity=100, batch_size=2, flush_interval=60)
+    audit.start()
+    audit.record(ALLOWED, "", "wiki.example.com", "/a")
+    audit.record(ALLOWED, "", "wiki.example.com", "/b")
+    # A full batch wakes the flusher without waiting for the interval
+    for _ in range(50):
+        if sink.batches:
+            break
+        await asyncio.sleep(0.01)
+    assert len(sink.batches) == 1
+
+    audit.record(DENIED, "", "wiki.example.com", "/c")
+    await audit.close()
+    assert [r["path"] for r in sink.batches[-1]] == ["/c"]
+    assert audit.stats()["written"] == 3
+
+
+@pytest.mark.asyncio
+async def test_database_sink_uses_one_insert_per_batch(engine):
+    audit = AuditLog(DatabaseSink(lambda: engine), capacity=100, batch_size=50, flush_interval=60)
+    for i in range(20):
+        audit.record(ALLOWED, "editor@example.com", "wiki.example.com", f"/{i}")
+
+    version = get_policy_version()
+    with track_queries() as stats:
+        assert await audit.flush() == 20
+    assert stats.statements == 1
+    # Audit writes are not policy changes
+    assert get_policy_version() == version
+
+    async with engine.connect() as conn:
+        rows = (await conn.execute(select(AuditEvent).order_by(AuditEvent.audit_id))).all()
+    assert len(rows) == 20
+    assert rows[0].user == "e****r@example.com"
+    assert rows[0].allowed == 1
+    assert rows[0].rule == "group"
+
+
+@pytest_asyncio.fixture
+async def engine(engine):
+    async with engine.begin() as conn:
+        await conn.execute(insert(Application).values(app_id=1, name="Wiki", host="wiki.example.com"))
+        await conn.execute(insert(UrlGroup).values(group_id=1, name="Everyone", protected=1, app_id=1))
+        await conn.execute(insert(Url).values(path="/home", url_group_id=1))
+    return engine
+
+
+@pytest.mark.asyncio
+async def test_authorize_decisions_are_audited(client, tmp_path, monkeypatch):
+    audit = AuditLog(FileSink(str(tmp_path / "audit"), rotate_bytes=1 << 20), capacity=100, batch_size=100, flush_interval=60)
+    monkeypatch.setattr(crud, "audit_log", audit)
+    monkeypatch.setattr(metrics_endpoint, "audit_log", audit)
+    await client.get("/api/authorize?url=https://wiki.example.com/home")
+    await client.get("/api/authorize?url=https://wiki.example.com/private")
+
+    stats = (await client.get("/api/metrics")).json()["audit"]
+    assert stats["sink"] == "file"
+    assert stats["buffered"] == 2
+
+    await audit.close()
+    records = read_ndjson(tmp_path / "audit")
+    assert [(r["path"], r["allowed"], r["rule"]) for r in records] == [
+        ("/home", True, "everyone"),
+        ("/private", False, "no_match"),
+    ]
+
+
+@pytest.mark.asyncio
+async def test_decisions_made_without_the_database_are_audited(client, tmp_path, monkeypatch):
+    audit = AuditLog(FlakySink(), capacity=100, batch_size=100, flush_interval=60)
+    monkeypatch.setattr(crud, "audit_log", audit)
+
+    async def down(*args):
+        raise OperationalError("SELECT 1", {}, Exception("Lost connection to MySQL server"))
+
+    monkeypatch.setattr(crud, "_evaluate_full_url", down)
+    authorize_breaker.reset()
+    try:
+        resp = await client.get("/api/authorize?url=https://wiki.example.com/home")
+    finally:
+        authorize_breaker.reset()
+    assert resp.status_code == 503
+    [record] = audit._buffer
+    assert (record["path"], record["allowed"], record["rule"]) == ("/home", False, "unavailable")
@@ -0,0 +1,114 @@
+import json
+import pytest
+import pytest_asyncio
+from sqlalchemy import insert, select, func
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from app import bulk, policy
+from app.db import Base
+from app.models import User, UserGroup, user_group_members
+
+
+@pytest_asyncio.fixture
+async def engine(engine):
+    async with engine.begin() as conn:
+        await conn.execute(insert(UserGroup).values(group_id=1, name="Engineering", protected=0))
+        await conn.execute(insert(UserGroup).values(group_id=2, name="Finance", protected=0))
+        await conn.execute(insert(User).values(user_id=1, email="existing@example.com"))
+        await conn.execute(insert(user_group_members).values(user_group_id=1, user_id=1))
+    return engine
+
+
+async def counts(sessions):
+    async with sessions() as session:
+        users = (await session.execute(select(func.count()).select_from(User))).scalar()
+        members = (await session.execute(select(func.count()).select_from(user_group_members))).scalar()
+    return users, members
+
+
+@pytest.mark.asyncio
+async def test_csv_import_upserts_users_and_memberships(client, session_maker):
+    body = "\n".join([
+        "email,group",
+        "existing@example.com,Engineering",  # already a member
+        "existing@example.com,Finance",
+        "new1@example.com,Engineering",
+        "new2@example.com,Finance",
+        "new2@example.com,Finance",  # duplicate row
+    ])
+    resp = await client.post("/api/user-groups/import", content=body, headers={"content-type": "text/csv"})
+    assert resp.status_code == 200
+    report = resp.json()
+    assert report["rows"] == 5
+    assert report["users_created"] == 2
+    assert report["memberships_created"] == 3
+    assert report["failed"] == 0
+    assert await counts(session_maker) == (3, 4)
+
+
+@pytest.mark.asyncio
+async def test_ndjson_import_reports_row_errors(client, session_maker):
+    body = "\n".join([
+        json.dumps({"email": "ok@example.com", "group": "Finance"}),
+        json.dumps({"email": "not-an-email", "group": "Finance"}),
+        json.dumps({"email": "lost@example.com", "group": "No Such Group"}),
+        "{broken json",
+        json.dumps({"group": "Finance"}),
+    ])
+    resp = await client.post("/api/user-groups/import?format=ndjson", content=body)
+    report = resp.json()
+    assert report["rows"] == 5
+    assert report["users_created"] == 1
+    assert report["failed"] == 4
+    assert [e["line"] for e in report["errors"]] == [2, 3, 4, 5]
+    assert "unknown user group" in report["errors"][1]["error"]
+    assert await counts(session_maker) == (2, 2)
+
+
+@pytest.mark.asyncio
+async def test_import_bumps_policy_version_once(client, monkeypatch):
+    monkeypatch.setattr("app.bulk.BULK_IMPORT_CHUNK_SIZE", 2)
+    body = "\n".join(f"user{i}@example.com,Engineering" for i in range(7))
+    before = policy.get_policy_version()
+    resp = await client.post("/api/user-groups/import", content=body, headers={"content-type": "text/csv"})
+    assert resp.json()["memberships_created"] == 7
+    assert policy.get_policy_version() == before + 1
+
+
+@pytest.mark.asyncio
+async def test_single_writes_bump_policy_version(client):
+    before = policy.get_policy_version()
+    resp = await client.post("/api/user-groups", json={"name": "Support"})
+    assert resp.status_code == 200
+    assert policy.get_policy_version() == before + 1
+    # Reads do not bump the version
+    await client.get("/api/applications")
+    assert policy.get_policy_version() == before + 1
+
+
+async def _lines(*lines):
+    for line in lines:
+        yield line
+
+
+@pytest.mark.asyncio
+async def test_import_matches_users_stored_in_a_different_case(tmp_path):
+    # Stands in for MySQL's case-insensitive collation: the existing row is
+    # matched, and returned with its stored spelling
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'nocase.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.exec_driver_sql("DROP TABLE users")
+        await conn.exec_driver_sql(
+            "CREATE TABLE users (user_id INTEGER PRIMARY KEY AUTOINCREMENT, "
+            "email VARCHAR(255) COLLATE NOCASE NOT NULL UNIQUE, created_at DATETIME)"
+        )
+        await conn.execute(insert(UserGroup).values(group_id=1, name="Finance", protected=0))
+        await conn.execute(insert(User).values(user_id=7, email="Jane.Doe@example.com"))
+    async with async_sessionmaker(engine, expire_on_commit=False)() as session:
+        report = await bulk.import_memberships(session, _lines("email,group", "jane.doe@example.com,Finance"))
+        members = (await session.execute(select(user_group_members.c.user_id))).scalars().all()
+    await engine.dispose()
+    assert report.failed == 0
+    assert report.users_created == 0
+    assert report.memberships_created == 1
+    assert members == [7]
@@ -0,0 +1,225 @@
+import asyncio
+import pytest
+import pytest_asyncio
+from sqlalchemy import event, insert, text
+from sqlalchemy.exc import OperationalError, ProgrammingError
+from app import crud, policy
+from app.breaker import CircuitBreaker, DecisionUnavailable, authorize_breaker, cancellable_connection, CLOSED, OPEN
+from app.models import Application, User, UserGroup, UrlGroup, Url, user_group_members, user_group_url_group_associations
+
+
+def outage():
+    return OperationalError("SELECT 1", {}, Exception("Lost connection to MySQL server"))
+
+
+async def failing():
+    raise outage()
+
+
+async def healthy():
+    return None
+
+
+@pytest.fixture(autouse=True)
+def reset_breaker():
+    authorize_breaker.reset()
+    yield
+    authorize_breaker.reset()
+
+
+@pytest.mark.asyncio
+async def test_failure_serves_last_known_good_decision():
+    breaker = CircuitBreaker("test", failure_threshold=3, probe_interval=60, timeout=1, stale_seconds=60, cache_size=10)
+
+    async def allowed():
+        return True
+
+    assert await breaker.call("key", allowed, probe=healthy) is True
+    assert await breaker.call("key", failing, probe=healthy) is True
+    with pytest.raises(DecisionUnavailable):
+        await breaker.call("other", failing, probe=healthy)
+    stats = breaker.stats()
+    assert stats["state"] == CLOSED
+    assert stats["failures"] == 2
+    assert stats["stale_served"] == 1
+    assert stats["unavailable"] == 1
+
+
+@pytest.mark.asyncio
+async def test_stale_decisions_are_not_served():
+    breaker = CircuitBreaker("test", failure_threshold=3, probe_interval=60, timeout=1, stale_seconds=0, cache_size=10)
+
+    async def allowed():
+        return True
+
+    await breaker.call("key", allowed, probe=healthy)
+    await asyncio.sleep(0.01)
+    with pytest.raises(DecisionUnavailable):
+        await breaker.call("key", failing, probe=healthy)
+
+
+@pytest.mark.asyncio
+async def test_breaker_opens_and_probe_closes_it():
+    breaker = CircuitBreaker("test", failure_threshold=2, probe_interval=0.01, timeout=1, stale_seconds=60, cache_size=10)
+    database_up = False
+    evaluations = []
+
+    async def evaluate():
+        evaluations.append(1)
+        if not database_up:
+            raise outage()
+        return False
+
+    async def probe():
+        if not database_up:
+            raise outage()
+
+    for _ in range(2):
+        with pytest.raises(DecisionUnavailable):
+            await breaker.call("key", evaluate, probe=probe)
+    assert breaker.state == OPEN
+
+    # While open, requests do not reach the database
+    with pytest.raises(DecisionUnavailable) as exc:
+        await breaker.call("key", evaluate, probe=probe)
+    assert exc.value.reason == "circuit open"
+    assert len(evaluations) == 2
+
+    await asyncio.sleep(0.05)
+    assert breaker.state != CLOSED
+    database_up = True
+    for _ in range(50):
+        if breaker.state == CLOSED:
+            break
+        await asyncio.sleep(0.01)
+    assert breaker.state == CLOSED
+    assert await breaker.call("key", evaluate, probe=probe) is False
+    assert breaker.stats()["opened"] == 1
+
+
+@pytest.mark.asyncio
+async def test_hung_query_times_out():
+    breaker = CircuitBreaker("test", failure_threshold=5, probe_interval=60, timeout=0.05, stale_seconds=60, cache_size=10)
+
+    async def hang():
+        await asyncio.sleep(10)
+        return True
+
+    with pytest.raises(DecisionUnavailable) as exc:
+        await breaker.call("key", lambda: breaker.with_timeout(hang()), probe=healthy)
+    assert exc.value.reason == "timed out"
+    assert breaker.stats()["timeouts"] == 1
+
+
+@pytest.mark.asyncio
+async def test_only_invalidated_users_lose_cached_decisions():
+    async def allowed():
+        return True
+
+    await authorize_breaker.call(("leaver@example.com", "app", "/a"), allowed, probe=healthy)
+    await authorize_breaker.call(("stayer@example.com", "app", "/a"), allowed, probe=healthy)
+    policy.invalidate_users(["leaver@example.com"])
+    assert authorize_breaker.cache.get(("leaver@example.com", "app", "/a"), 60) is None
+    assert authorize_breaker.cache.get(("stayer@example.com", "app", "/a"), 60) is True
+
+    # Any admin write bumps the policy version; an outage right after it still has a fallback
+    policy.bump_policy_version()
+    assert authorize_breaker.cache.get(("stayer@example.com", "app", "/a"), 60) is True
+
+    # A change made by another process, for users this one does not know
+    policy.invalidate_all_users()
+    assert len(authorize_breaker.cache) == 0
+
+
+@pytest.mark.asyncio
+async def test_timed_out_evaluation_invalidates_its_connection(engine):
+    invalidated = []
+    event.listen(engine.sync_engine, "invalidate", lambda *args: invalidated.append(args))
+    breaker = CircuitBreaker("test", failure_threshold=5, probe_interval=60, timeout=0.01, stale_seconds=60, cache_size=10)
+
+    async def slow():
+        async with cancellable_connection(engine) as conn:
+            return (await conn.execute(text(
+                "WITH RECURSIVE c(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM c WHERE x < 300000) SELECT max(x) FROM c"
+            ))).scalar()
+
+    with pytest.raises(DecisionUnavailable):
+        await breaker.call("key", lambda: breaker.with_timeout(slow()), probe=healthy)
+    assert len(invalidated) == 1
+    assert engine.sync_engine.pool.checkedout() == 0
+
+
+@pytest.mark.asyncio
+async def test_programming_errors_are_not_outages():
+    breaker = CircuitBreaker("test", failure_threshold=1, probe_interval=60, timeout=1, stale_seconds=60, cache_size=10)
+
+    async def allowed():
+        return True
+
+    async def broken():
+        raise ProgrammingError("SELECT 1 FROM missing", {}, Exception("Table 'missing' doesn't exist"))
+
+    await breaker.call("key", allowed, probe=healthy)
+    with pytest.raises(ProgrammingError):
+        await breaker.call("key", broken, probe=healthy)
+    assert breaker.state == CLOSED
+    assert breaker.stats()["failures"] == 0
+    assert breaker.stats()["stale_served"] == 0
+
+
+@pytest.mark.asyncio
+async def test_coalesced_requests_count_one_failure(monkeypatch):
+    monkeypatch.setattr(authorize_breaker, "failure_threshold", 3)
+
+    async def slow_outage(*args):
+        await asyncio.sleep(0.01)
+        raise outage()
+
+    monkeypatch.setattr(crud, "_evaluate_full_url", slow_outage)
+    results = await asyncio.gather(
+        *(crud.is_user_allowed_full_url(None, "dev@example.com", "https://app.example.com/repo") for _ in range(10)),
+        return_exceptions=True,
+    )
+    assert all(isinstance(r, DecisionUnavailable) for r in results)
+    stats = authorize_breaker.stats()
+    assert stats["failures"] == 1
+    assert stats["consecutive_failures"] == 1
+    assert stats["state"] == CLOSED
+
+
+@pytest_asyncio.fixture
+async def engine(engine):
+    async with engine.begin() as conn:
+        await conn.execute(insert(Application).values(app_id=1, name="App", host="app.example.com"))
+        await conn.execute(insert(UserGroup).values(group_id=1, name="Engineering", protected=0))
+        await conn.execute(insert(User).values(user_id=1, email="dev@example.com"))
+        await conn.execute(insert(user_group_members).values(user_group_id=1, user_id=1))
+        await conn.execute(insert(UrlGroup).values(group_id=1, name="Code", protected=0, app_id=1))
+        await conn.execute(insert(Url).values(path="/repo", url_group_id=1))
+        await conn.execute(insert(user_group_url_group_associations).values(user_group_id=1, url_group_id=1))
+    return engine
+
+
+@pytest.mark.asyncio
+async def test_authorize_survives_database_outage(client, monkeypatch):
+    cookies = {"x-auth-email": "dev@example.com"}
+    resp = await client.get("/api/authorize?url=https://app.example.com/repo", cookies=cookies)
+    assert resp.status_code == 200
+
+    async def down(*args):
+        raise outage()
+
+    monkeypatch.setattr(crud, "_evaluate_full_url", down)
+    resp = await client.get("/api/authorize?url=https://app.example.com/repo", cookies=cookies)
+    assert resp.status_code == 200
+    assert resp.json()["allowed"] is True
+
+    # Nothing known about this URL: fail closed, asking the proxy to retry
+    resp = await client.get("/api/authorize?url=https://app.example.com/other", cookies=cookies)
+    assert resp.status_code == 503
+    assert resp.headers["retry-after"] == "1"
+
+    resp = await client.get("/api/metrics")
+    breaker = resp.json()["breaker"]
+    assert breaker["stale_served"] == 1
+    assert breaker["unavailable"] == 1
@@ -0,0 +1,76 @@
+import logging
+import pytest
+import pytest_asyncio
+from sqlalchemy import insert
+from app import crud
+from app.api.endpoints import metrics as metrics_endpoint
+from app.decisionlog import Decision, DecisionLog
+from app.models import Application, User, UserGroup, UrlGroup, Url, user_group_members, user_group_url_group_associations
+
+
+@pytest.fixture
+def decisions(monkeypatch):
+    log = DecisionLog(sample_allow=0.0, sample_deny=0.0, always_paths=("/admin",))
+    monkeypatch.setattr(crud, "decision_log", log)
+    monkeypatch.setattr(metrics_endpoint, "decision_log", log)
+    return log
+
+
+@pytest_asyncio.fixture
+async def engine(engine):
+    async with engine.begin() as conn:
+        await conn.execute(insert(Application).values(app_id=1, name="Wiki", host="wiki.example.com"))
+        await conn.execute(insert(UserGroup).values(group_id=1, name="Editors", protected=0))
+        await conn.execute(insert(User).values(user_id=1, email="editor@example.com"))
+        await conn.execute(insert(user_group_members).values(user_group_id=1, user_id=1))
+        await conn.execute(insert(UrlGroup).values(group_id=1, name="Pages", protected=0, app_id=1))
+        await conn.execute(insert(Url).values(path="/edit", url_group_id=1))
+        await conn.execute(insert(user_group_url_group_associations).values(user_group_id=1, url_group_id=1))
+    return engine
+
+
+@pytest.mark.asyncio
+async def test_decisions_are_counted_by_app_outcome_and_rule(client, decisions):
+    client.cookies.set("x-auth-email", "editor@example.com")
+    for url in (
+        "https://wiki.example.com/edit",
+        "https://wiki.example.com/edit",
+        "https://wiki.example.com/settings",
+        "https://unknown.example.com/edit",
+        "https://wiki.example.com/logo.png",
+    ):
+        await client.get(f"/api/authorize?url={url}")
+
+    stats = (await client.get("/api/metrics")).json()["decisions"]
+    assert stats["allowed"] == 3
+    assert stats["denied"] == 2
+    assert stats["logged"] == 0
+    assert {(c["app"], c["outcome"], c["rule"]): c["count"] for c in stats["counts"]} == {
+        ("Wiki", "allow", "group"): 2,
+        ("Wiki", "deny", "no_match"): 1,
+        ("-", "deny", "unknown_host"): 1,
+        ("-", "allow", "web_asset"): 1,
+    }
+
+
+def test_denies_for_sensitive_paths_are_always_logged(caplog, decisions):
+    denied = Decision(False, "no_match", "Wiki")
+    with caplog.at_level(logging.INFO, logger="app.decisionlog"):
+        decisions.record(denied, "editor@example.com", "wiki.example.com", "/settings")
+        decisions.record(Decision(True, "group", "Wiki"), "editor@example.com", "wiki.example.com", "/edit")
+        decisions.record(denied, "editor@example.com", "wiki.example.com", "/admin/users")
+    [record] = caplog.records
+    assert record.levelno == logging.WARNING
+    assert "denied" in record.getMessage()
+    assert "/admin/users" in record.getMessage()
+    assert "editor@example.com" not in record.getMessage()
+    assert decisions.logged == 1
+
+
+def test_sample_rates_apply_separately(caplog):
+    log = DecisionLog(sample_allow=1.0, sample_deny=0.0, always_paths=())
+    with caplog.at_level(logging.INFO, logger="app.decisionlog"):
+        for _ in range(3):
+            log.record(Decision(True, "everyone", "Wiki"), "", "wiki.example.com", "/")
+            log.record(Decision(False, "no_match", "Wiki"), "", "wiki.example.com", "/admin")
+    assert [r.levelno for r in caplog.records] == [logging.INFO] * 3
@@ -0,0 +1,88 @@
+import json
+import re
+import subprocess
+import sys
+from pathlib import Path
+import pytest
+import pytest_asyncio
+from sqlalchemy import insert
+from app.models import Application, UrlGroup, Url
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# Modules only the admin UI needs; the decision node must not import them.
+# (It does need sqlalchemy.orm, for the models its queries and sessions use.)
+ADMIN_ROUTERS = [
+    f"app.api.endpoints.{name}"
+    for name in ("applications", "associations", "policy", "url_groups", "user_groups", "users")
+]
+ADMIN_ONLY = ["jinja2", "requests", "jose", "app.main", "app.bulk", "app.backup", "starlette.staticfiles", *ADMIN_ROUTERS]
+
+# Python heap allocated by the import (tracemalloc) is steadier than max RSS,
+# which the interpreter and shared libraries dominate
+PROBE = """
+import json, resource, sys, tracemalloc
+tracemalloc.start()
+import {module}
+print(json.dumps({{
+    "modules": sorted(sys.modules),
+    "heap": tracemalloc.get_traced_memory()[0],
+    "maxrss": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+}}))
+"""
+
+
+def import_profile(module):
+    """Import ``module`` in a fresh interpreter; return (cumulative import µs, loaded modules, memory)."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", PROBE.format(module=module)],
+        cwd=ROOT, capture_output=True, text=True, check=True,
+    )
+    cumulative = 0
+    for line in proc.stderr.splitlines():
+        match = re.match(r"import time:\s+\d+ \|\s+(\d+) \| (\s*)(\S+)", line)
+        if match and match.group(3) == module:
+            cumulative = int(match.group(1))
+    result = json.loads(proc.stdout.strip().splitlines()[-1])
+    return cumulative, set(result["modules"]), result
+
+
+def test_decision_node_imports_less_than_full_app():
+    decision_us, decision_modules, decision_mem = import_profile("app.decision")
+    main_us, main_modules, main_mem = import_profile("app.main")
+    assert not [m for m in ADMIN_ONLY if m in decision_modules]
+    assert all(m in main_modules for m in ["jinja2", "app.bulk", *ADMIN_ROUTERS])
+    # Import times swing with machine load, so they are only reported on failure
+    assert decision_mem["heap"] < main_mem["heap"], (
+        f"import: decision {decision_us / 1000:.0f}ms, main {main_us / 1000:.0f}ms; "
+        f"heap: decision {decision_mem['heap'] // 1024}KiB, main {main_mem['heap'] // 1024}KiB; "
+        f"maxrss: decision {decision_mem['maxrss']}KiB, main {main_mem['maxrss']}KiB"
+    )
+
+
+@pytest.fixture
+def asgi_app():
+    from app.decision import app
+    return app
+
+
+@pytest_asyncio.fixture
+async def engine(engine):
+    async with engine.begin() as conn:
+        await conn.execute(insert(Application).values(app_id=1, name="App", host="app.example.com"))
+        await conn.execute(insert(UrlGroup).values(group_id=1, name="Everyone", protected=1, app_id=1))
+        await conn.execute(insert(Url).values(url_id=1, path="/public", url_group_id=1))
+    return engine
+
+
+@pytest.mark.asyncio
+async def test_decision_node_routes(client):
+    resp = await client.get("/api/authorize", params={"url": "https://app.example.com/public"})
+    assert resp.status_code == 200
+    resp = await client.get("/api/authorize", params={"url": "https://app.example.com/private"})
+    assert resp.status_code == 403
+    assert (await client.get("/healthz")).status_code == 200
+    assert (await client.get("/api/metrics")).status_code == 200
+    assert (await client.get("/auth/callback")).status_code == 400  # missing code
+    assert (await client.get("/user-groups")).status_code == 404
+    assert (await client.get("/api/user-groups")).status_code == 404
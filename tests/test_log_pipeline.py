@@ -0,0 +1,144 @@
+import io
+import json
+import logging
+import os
+import queue
+import threading
+import time
+import pytest
+from httpx import AsyncClient, ASGITransport
+from app import logpipeline
+from app.logpipeline import JsonFormatter, LogPipeline, PipelineHandler
+from app.main import app
+
+
+class SlowHandler(logging.Handler):
+    """A target that blocks like a stderr pipe nobody is reading."""
+
+    def __init__(self, unblock: threading.Event):
+        super().__init__()
+        self.unblock = unblock
+        self.records = []
+
+    def emit(self, record):
+        self.unblock.wait(5)
+        self.records.append(record)
+
+
+def pipeline_logger(name, pipeline):
+    logger = logging.getLogger(name)
+    logger.propagate = False
+    logger.handlers[:] = [pipeline.handler]
+    logger.setLevel(logging.DEBUG)
+    return logger
+
+
+def test_records_are_written_as_sanitized_json():
+    stream = io.StringIO()
+    target = logging.StreamHandler(stream)
+    target.setFormatter(JsonFormatter())
+    pipeline = LogPipeline(target, queue_size=100)
+    logger = pipeline_logger("test.pipeline.json", pipeline)
+    logger.info("User %s connected to %s", "john@example.com", "mysql://user:secret@db/prod")
+    try:
+        raise ValueError("boom")
+    except ValueError:
+        logger.exception("Failed for jane@example.com")
+    pipeline.stop()
+
+    first, second = [json.loads(line) for line in stream.getvalue().splitlines()]
+    assert first["level"] == "INFO"
+    assert first["logger"] == "test.pipeline.json"
+    assert first["message"] == "User j**n@example.com connected to mysql://user:***@db/prod"
+    assert first["source"].startswith("test_log_pipeline.py:")
+    assert second["message"] == "Failed for j**e@example.com"
+    assert "ValueError: boom" in second["exc"]
+
+
+def test_slow_output_does_not_block_callers():
+    release = threading.Event()
+    target = SlowHandler(release)
+    pipeline = LogPipeline(target, queue_size=1000)
+    logger = pipeline_logger("test.pipeline.slow", pipeline)
+    started = time.perf_counter()
+    for i in range(100):
+        logger.warning("record %d", i)
+    assert time.perf_counter() - started < 1
+    release.set()
+    pipeline.stop()
+    assert len(target.records) == 100
+
+
+def test_overload_drops_low_severity_records_first():
+    handler = PipelineHandler(queue.Queue(4), high_water=0.5)
+    logger = logging.getLogger("test.pipeline.drops")
+    logger.propagate = False
+    logger.handlers[:] = [handler]
+    for _ in range(3):
+        logger.warning("kept until the queue is full")
+    for _ in range(2):
+        logger.info("dropped above the high water mark")
+    logger.error("still fits")
+    logger.error("queue is full")
+    assert handler.queue.qsize() == 4
+    assert handler.dropped == {"INFO": 2, "ERROR": 1}
+
+
+def fill_behind_blocked_target(pipeline, logger, count):
+    """Log one record and wait until the listener is stuck writing it, then log ``count`` more."""
+    logger.warning("record 0")
+    while not pipeline.handler.queue.empty():
+        time.sleep(0.001)
+    for i in range(1, count + 1):
+        logger.warning("record %d", i)
+    assert pipeline.handler.queue.full()
+
+
+def test_stop_flushes_a_full_queue():
+    unblock = threading.Event()
+    target = SlowHandler(unblock)
+    pipeline = LogPipeline(target, queue_size=3)
+    fill_behind_blocked_target(pipeline, pipeline_logger("test.pipeline.full", pipeline), 3)
+    threading.Timer(0.1, unblock.set).start()
+    pipeline.stop()
+    assert [r.getMessage() for r in target.records] == [f"record {i}" for i in range(4)]
+
+
+def test_stop_gives_up_on_a_stuck_target(monkeypatch):
+    monkeypatch.setattr(logpipeline, "LOG_STOP_TIMEOUT", 0.05)
+    unblock = threading.Event()
+    pipeline = LogPipeline(SlowHandler(unblock), queue_size=1)
+    fill_behind_blocked_target(pipeline, pipeline_logger("test.pipeline.stuck", pipeline), 1)
+    started = time.perf_counter()
+    pipeline.stop()
+    assert time.perf_counter() - started < 1
+    unblock.set()
+
+
+def test_pipeline_restarts_in_forked_child(tmp_path, monkeypatch):
+    path = tmp_path / "child.log"
+    target = logging.FileHandler(path)
+    target.setFormatter(JsonFormatter())
+    pipeline = LogPipeline(target, queue_size=100)
+    monkeypatch.setattr(logpipeline, "log_pipeline", pipeline)
+    logger = pipeline_logger("test.pipeline.fork", pipeline)
+
+    pid = os.fork()
+    if pid == 0:
+        logger.warning("from the child")
+        pipeline.stop()
+        os._exit(0)
+    _, status = os.waitpid(pid, 0)
+    pipeline.stop()
+    target.close()
+    assert os.waitstatus_to_exitcode(status) == 0
+    assert json.loads(path.read_text())["message"] == "from the child"
+
+
+@pytest.mark.asyncio
+async def test_metrics_report_log_queue():
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        resp = await ac.get("/api/metrics")
+    stats = resp.json()["logging"]
+    assert stats["queue_size"] == logpipeline.LOG_QUEUE_SIZE
+    assert "dropped_total" in stats
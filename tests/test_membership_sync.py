@@ -0,0 +1,81 @@
+import pytest
+import pytest_asyncio
+from sqlalchemy import insert, select
+from app import policy
+from app.models import PolicyState, User, UserGroup, user_group_members
+
+
+@pytest_asyncio.fixture
+async def engine(engine):
+    async with engine.begin() as conn:
+        await conn.execute(insert(UserGroup).values(group_id=1, name="Staff", protected=0))
+        await conn.execute(insert(UserGroup).values(group_id=2, name="Other", protected=0))
+        await conn.execute(insert(User), [{"user_id": i, "email": f"user{i}@example.com"} for i in range(1, 6)])
+        await conn.execute(insert(user_group_members), [{"user_group_id": 1, "user_id": i} for i in range(1, 5)])
+        await conn.execute(insert(user_group_members).values(user_group_id=2, user_id=1))
+    return engine
+
+
+async def members(sessions, group_id):
+    async with sessions() as session:
+        result = await session.execute(
+            select(User.email)
+            .join(user_group_members, user_group_members.c.user_id == User.user_id)
+            .where(user_group_members.c.user_group_id == group_id)
+            .order_by(User.email)
+        )
+        return result.scalars().all()
+
+
+@pytest.mark.asyncio
+async def test_set_members_applies_only_the_difference(client, session_maker):
+    desired = ["user2@example.com", "user3@example.com", "user4@example.com", "user5@example.com", "new@example.com"]
+    before = policy.get_policy_version()
+    resp = await client.put("/api/user-groups/1/members", json={"emails": desired})
+    assert resp.status_code == 200
+    assert resp.json() == {"added": 2, "removed": 1, "unchanged": 3, "users_created": 1, "dry_run": False}
+    assert await members(session_maker, 1) == sorted(desired)
+    # Other groups are untouched
+    assert await members(session_maker, 2) == ["user1@example.com"]
+    assert policy.get_policy_version() == before + 1
+
+
+@pytest.mark.asyncio
+async def test_set_members_dry_run_and_noop(client, session_maker):
+    current = [f"user{i}@example.com" for i in range(1, 5)]
+    before = policy.get_policy_version()
+    resp = await client.put("/api/user-groups/1/members", params={"dry_run": "true"}, json={"emails": []})
+    assert resp.json()["removed"] == 4
+    assert resp.json()["dry_run"] is True
+
+    resp = await client.put("/api/user-groups/1/members", json={"emails": current})
+    assert resp.json()["unchanged"] == 4
+    assert resp.json()["added"] == resp.json()["removed"] == 0
+
+    resp = await client.put("/api/user-groups/99/members", json={"emails": current})
+    assert resp.status_code == 404
+    assert await members(session_maker, 1) == current
+    assert policy.get_policy_version() == before
+
+
+@pytest.mark.asyncio
+async def test_set_members_matches_emails_case_insensitively(client, session_maker):
+    desired = ["USER1@example.com", "User2@Example.com", "user3@example.com", "user4@example.com"]
+    resp = await client.put("/api/user-groups/1/members", json={"emails": desired})
+    assert resp.json() == {"added": 0, "removed": 0, "unchanged": 4, "users_created": 0, "dry_run": False}
+    assert await members(session_maker, 1) == [f"user{i}@example.com" for i in range(1, 5)]
+
+
+@pytest.mark.asyncio
+async def test_set_members_reaches_other_workers_and_caches(client, session_maker):
+    invalidated = []
+    callback = policy.on_users_invalidated(lambda emails: invalidated.extend(sorted(emails or [])))
+    try:
+        desired = ["user2@example.com", "user3@example.com", "user4@example.com", "user5@example.com"]
+        resp = await client.put("/api/user-groups/1/members", json={"emails": desired})
+        assert resp.status_code == 200
+    finally:
+        policy._user_listeners.remove(callback)
+    assert invalidated == ["user1@example.com", "user5@example.com"]
+    async with session_maker() as session:
+        assert (await session.execute(select(PolicyState.version))).scalar() == 1
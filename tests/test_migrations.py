@@ -0,0 +1,76 @@
+import asyncio
+import shutil
+from pathlib import Path
+import pytest
+from sqlalchemy import event, text
+from sqlalchemy.ext.asyncio import create_async_engine
+from app import migrations
+
+MIGRATION = '''
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table("widgets", sa.Column("id", sa.Integer(), primary_key=True))
+
+
+def downgrade():
+    op.drop_table("widgets")
+'''
+
+
+@pytest.fixture
+def config(tmp_path):
+    """Alembic config using the repo's env.py with a single test migration."""
+    scripts = tmp_path / "alembic"
+    (scripts / "versions").mkdir(parents=True)
+    root = Path(__file__).resolve().parent.parent / "alembic"
+    shutil.copy(root / "env.py", scripts / "env.py")
+    shutil.copy(root / "script.py.mako", scripts / "script.py.mako")
+    (scripts / "versions" / "0001_widgets.py").write_text(MIGRATION)
+    config = migrations.alembic_config(str(Path(__file__).resolve().parent.parent / "alembic.ini"))
+    config.set_main_option("script_location", str(scripts))
+    return config
+
+
+@pytest.mark.asyncio
+async def test_upgrade_then_skip_with_one_query(tmp_path, config):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'migrate.db'}")
+    assert await migrations.run_migrations(engine, config) is True
+    async with engine.connect() as conn:
+        assert (await conn.execute(text("SELECT version_num FROM alembic_version"))).scalar() == "0001"
+        await conn.execute(text("SELECT id FROM widgets"))
+
+    statements = []
+    event.listen(engine.sync_engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+    assert await migrations.run_migrations(engine, config) is False
+    assert len(statements) == 1
+    await engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_concurrent_replicas_migrate_once(tmp_path, config, monkeypatch):
+    monkeypatch.setattr(migrations, "MIGRATION_LOCK_POLL", 0.01)
+    database = tmp_path / "replicas.db"
+    engines = [create_async_engine(f"sqlite+aiosqlite:///{database}") for _ in range(3)]
+    results = await asyncio.gather(*(migrations.run_migrations(engine, config) for engine in engines))
+    assert sorted(results) == [False, False, True]
+    for engine in engines:
+        await engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_lock_timeout(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'locked.db'}")
+    async with engine.connect() as holder, engine.connect() as waiter:
+        async with migrations.migration_lock(holder):
+            with pytest.raises(migrations.MigrationLockTimeout):
+                async with migrations.migration_lock(waiter, timeout=0):
+                    pass
+    await engine.dispose()
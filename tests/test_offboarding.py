@@ -0,0 +1,109 @@
+import asyncio
+import pytest
+import pytest_asyncio
+from sqlalchemy import insert, select, func
+from app import policy
+from app.breaker import authorize_breaker
+from app.decisionlog import Decision
+from app.models import Application, PolicyState, User, UserGroup, UrlGroup, Url, user_group_members, user_group_url_group_associations
+
+
+@pytest_asyncio.fixture
+async def engine(engine):
+    async with engine.begin() as conn:
+        await conn.execute(insert(Application).values(app_id=1, name="App", host="app.example.com"))
+        await conn.execute(insert(UserGroup), [
+            {"group_id": 1, "name": "Engineering", "protected": 0},
+            {"group_id": 2, "name": "Oncall", "protected": 0},
+        ])
+        await conn.execute(insert(User), [
+            {"user_id": 1, "email": "leaver@example.com"},
+            {"user_id": 2, "email": "stayer@example.com"},
+        ])
+        await conn.execute(insert(user_group_members), [
+            {"user_group_id": 1, "user_id": 1},
+            {"user_group_id": 2, "user_id": 1},
+            {"user_group_id": 1, "user_id": 2},
+        ])
+        await conn.execute(insert(UrlGroup).values(group_id=1, name="Code", protected=0, app_id=1))
+        await conn.execute(insert(Url).values(path="/repo", url_group_id=1))
+        await conn.execute(insert(user_group_url_group_associations).values(user_group_id=1, url_group_id=1))
+    return engine
+
+
+@pytest.fixture
+def invalidated():
+    emails = []
+    callback = policy.on_users_invalidated(lambda e: emails.extend(sorted(e or [])))
+    yield emails
+    policy._user_listeners.remove(callback)
+
+
+async def authorize(ac, email):
+    resp = await ac.get("/api/authorize?url=https://app.example.com/repo", cookies={"x-auth-email": email})
+    return resp.status_code
+
+
+@pytest.mark.asyncio
+async def test_offboard_removes_all_memberships_immediately(client, session_maker, invalidated):
+    assert await authorize(client, "leaver@example.com") == 200
+    resp = await client.post("/api/users/offboard", json={"emails": ["leaver@example.com", "ghost@example.com"]})
+    assert resp.status_code == 200
+    assert resp.json() == {
+        "users_found": 1,
+        "memberships_removed": 2,
+        "users_deleted": 0,
+        "not_found": ["ghost@example.com"],
+    }
+    assert await authorize(client, "leaver@example.com") == 403
+    assert await authorize(client, "stayer@example.com") == 200
+    assert invalidated == ["ghost@example.com", "leaver@example.com"]
+
+    async with session_maker() as session:
+        assert (await session.execute(select(func.count()).select_from(user_group_members))).scalar() == 1
+        assert (await session.execute(select(User.email).order_by(User.email))).scalars().all() == [
+            "leaver@example.com", "stayer@example.com"
+        ]
+
+
+@pytest.mark.asyncio
+async def test_offboard_can_delete_users(client, session_maker, invalidated):
+    resp = await client.post("/api/users/offboard", json={"emails": ["leaver@example.com"], "delete_users": True})
+    assert resp.json()["users_deleted"] == 1
+    async with session_maker() as session:
+        assert (await session.execute(select(User.email))).scalars().all() == ["stayer@example.com"]
+
+
+@pytest.mark.asyncio
+async def test_offboarding_reaches_other_workers(client, session_maker, invalidated):
+    # Another worker's view of the shared version, and its cached decisions
+    engine = session_maker.kw["bind"]
+    other = policy.SharedPolicyVersion(poll_interval=0, get_engine=lambda: engine)
+    assert await other.check() is False
+    authorize_breaker.cache.put(("leaver@example.com", "app.example.com", "/repo"), Decision(True, "group", "App"))
+
+    for _ in range(2):
+        resp = await client.post("/api/users/offboard", json={"emails": ["leaver@example.com"]})
+        assert resp.status_code == 200
+    async with session_maker() as session:
+        assert (await session.execute(select(PolicyState.version))).scalar() == 2
+
+    version = policy.get_policy_version()
+    authorize_breaker.cache.put(("leaver@example.com", "app.example.com", "/repo"), Decision(True, "group", "App"))
+    assert await other.check() is True
+    assert policy.get_policy_version() == version + 1
+    assert len(authorize_breaker.cache) == 0
+    assert await other.check() is False
+
+
+@pytest.mark.asyncio
+async def test_first_shared_bumps_do_not_conflict(session_maker):
+    # No policy_state row yet: both bumps try to create it
+    async def bump():
+        async with session_maker() as session:
+            await policy.shared_policy.bump(session)
+            await session.commit()
+
+    await asyncio.gather(bump(), bump())
+    async with session_maker() as session:
+        assert (await session.execute(select(PolicyState.version))).scalar() == 2
@@ -0,0 +1,71 @@
+import pytest
+import pytest_asyncio
+from sqlalchemy import insert
+from app.api.endpoints.authorize import authorize
+from app.api.endpoints.users import offboard_users
+from app.models import Application, User, UserGroup, UrlGroup, Url, user_group_members, user_group_url_group_associations
+from app.querystats import QueryBudgetExceeded
+from app.stats import stats_cache
+
+
+@pytest.fixture(autouse=True)
+def budgets(monkeypatch):
+    monkeypatch.setattr("app.main.QUERY_STATS_HEADER", True)
+    monkeypatch.setattr("app.querystats.QUERY_BUDGET_MODE", "raise")
+    stats_cache.clear()
+
+
+@pytest_asyncio.fixture
+async def engine(engine):
+    async with engine.begin() as conn:
+        await conn.execute(insert(Application).values(app_id=1, name="App", host="app.example.com"))
+        await conn.execute(insert(User).values(user_id=1, email="member@example.com"))
+        for i in range(5):
+            await conn.execute(insert(UserGroup).values(group_id=i + 1, name=f"Group {i}", protected=0))
+            await conn.execute(insert(user_group_members).values(user_group_id=i + 1, user_id=1))
+        await conn.execute(insert(UrlGroup).values(group_id=1, name="Reports", protected=0, app_id=1))
+        await conn.execute(insert(Url).values(url_id=1, path="/reports", url_group_id=1))
+        await conn.execute(insert(user_group_url_group_associations).values(user_group_id=1, url_group_id=1))
+    return engine
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("email,url,status", [
+    ("member@example.com", "https://app.example.com/reports", 200),
+    ("outsider@example.com", "https://app.example.com/reports", 403),
+    ("member@example.com", "https://unknown.example.com/reports", 403),
+    ("member@example.com", "/reports", 200),
+])
+async def test_authorize_runs_one_query(client, email, url, status):
+    resp = await client.get("/api/authorize", params={"url": url}, cookies={"x-auth-email": email})
+    assert resp.status_code == status
+    assert resp.headers["X-Query-Count"] == "1"
+    assert resp.headers["Server-Timing"].startswith("db;dur=")
+
+
+@pytest.mark.asyncio
+async def test_admin_pages_within_budget(client):
+    for path in ["/", "/user-groups"]:
+        resp = await client.get(path)
+        assert resp.status_code == 200
+        assert int(resp.headers["X-Query-Count"]) <= 2
+
+
+@pytest.mark.asyncio
+async def test_over_budget_raises(client, monkeypatch):
+    monkeypatch.setattr(authorize, "query_budget", 0)
+    with pytest.raises(QueryBudgetExceeded) as info:
+        await client.get("/api/authorize", params={"url": "https://app.example.com/reports"})
+    assert info.value.statements == 1
+    assert info.value.route == "GET /api/authorize"
+
+
+@pytest.mark.asyncio
+async def test_over_budget_write_is_not_committed(client, monkeypatch):
+    monkeypatch.setattr(offboard_users, "query_budget", 2, raising=False)
+    with pytest.raises(QueryBudgetExceeded) as info:
+        await client.post("/api/users/offboard", json={"emails": ["member@example.com"]})
+    # The membership delete ran, the statement after it did not, and nothing was committed
+    assert info.value.statements == 3
+    resp = await client.get("/api/authorize", params={"url": "https://app.example.com/reports"}, cookies={"x-auth-email": "member@example.com"})
+    assert resp.status_code == 200
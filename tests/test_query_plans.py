@@ -0,0 +1,79 @@
+import pytest
+from sqlalchemy import event, insert
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from app.db import Base
+from app import crud
+from app.models import User, UserGroup, UrlGroup, Url, Application, user_group_members, user_group_url_group_associations
+
+
+async def seeded_engine():
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:", echo=False)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.execute(insert(Application).values(app_id=1, name="App", host="app.example.com"))
+        await conn.execute(insert(User).values(user_id=1, email="member@example.com"))
+        await conn.execute(insert(UserGroup).values(group_id=1, name="Members", protected=0))
+        await conn.execute(insert(UrlGroup).values(group_id=1, name="Reports", protected=0, app_id=1))
+        await conn.execute(insert(Url).values(url_id=1, path="/reports", url_group_id=1))
+        await conn.execute(insert(user_group_members).values(user_group_id=1, user_id=1))
+        await conn.execute(insert(user_group_url_group_associations).values(user_group_id=1, url_group_id=1))
+    return engine
+
+
+async def capture_authorize_statements(email, full_url):
+    """Run an authorization check on a seeded SQLite database and return the plans of every query it ran."""
+    engine = await seeded_engine()
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            statements.append((statement, parameters))
+
+    event.listen(engine.sync_engine, "before_cursor_execute", record)
+    session_maker = async_sessionmaker(engine, expire_on_commit=False)
+    async with session_maker() as session:
+        await crud.is_user_allowed_full_url(session, email, full_url)
+    event.remove(engine.sync_engine, "before_cursor_execute", record)
+
+    plans = []
+    async with engine.connect() as conn:
+        for statement, parameters in statements:
+            rows = await conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters)
+            plans.append((statement, [row[-1] for row in rows]))
+    await engine.dispose()
+    return plans
+
+
+def full_scans(plan):
+    # SQLite reports "SCAN <table>" for a full table scan and
+    # "SEARCH <table> USING ... INDEX" (or "SCAN ... USING COVERING INDEX") otherwise.
+    # "SCAN CONSTANT ROW" is a SELECT without FROM, not a table.
+    return [line for line in plan if line.startswith("SCAN") and "INDEX" not in line and line != "SCAN CONSTANT ROW"]
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("email,full_url", [
+    ("member@example.com", "https://app.example.com/reports"),
+    ("outsider@example.com", "https://app.example.com/reports"),
+    ("member@example.com", "https://unknown.example.com/reports"),
+    ("member@example.com", "/reports"),
+    ("outsider@example.com", "/reports"),
+])
+async def test_authorize_queries_use_indexes(email, full_url):
+    plans = await capture_authorize_statements(email, full_url)
+    assert len(plans) == 1, "authorization check should run exactly one query"
+    for statement, plan in plans:
+        assert not full_scans(plan), f"full table scan in plan {plan} for query:\n{statement}"
+
+
+@pytest.mark.asyncio
+async def test_path_and_application_checks_apply_the_same_rules():
+    engine = await seeded_engine()
+    async with async_sessionmaker(engine)() as session:
+        assert await crud.is_user_allowed_for_application(session, "member@example.com", "/reports", 1) is True
+        assert await crud.is_user_allowed_for_application(session, "outsider@example.com", "/reports", 1) is False
+        assert await crud.is_user_allowed_for_application(session, "member@example.com", "/reports", 2) is False
+        assert await crud.is_user_allowed(session, "member@example.com", "/reports") is True
+        assert await crud.is_user_allowed(session, "outsider@example.com", "/reports") is False
+        assert await crud.is_user_allowed(session, "", "/static/app.css") is True
+    await engine.dispose()
@@ -0,0 +1,122 @@
+import pytest
+import pytest_asyncio
+from httpx import AsyncClient, ASGITransport
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from app.main import app
+from app import db
+from app.db import Base, get_async_session
+from app.models import Application, User, UserGroup, UrlGroup, Url, user_group_members, user_group_url_group_associations
+
+
+@pytest_asyncio.fixture
+async def primary_and_replica(tmp_path, monkeypatch):
+    """Two SQLite files standing in for a primary database and its read replica."""
+    primary_url = f"sqlite+aiosqlite:///{tmp_path / 'primary.db'}"
+    replica_url = f"sqlite+aiosqlite:///{tmp_path / 'replica.db'}"
+    primary = create_async_engine(primary_url)
+    for url, label in ((primary_url, "primary"), (replica_url, "replica")):
+        engine = create_async_engine(url)
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+            await conn.execute(insert(Application).values(app_id=1, name=f"{label} app", host=f"{label}.example.com"))
+        await engine.dispose()
+
+    monkeypatch.setattr(db, "DATABASE_READ_URL", replica_url)
+    monkeypatch.setattr(db, "_read_engine", None)
+    monkeypatch.setattr(db, "_read_session", None)
+    primary_sessions = async_sessionmaker(primary, expire_on_commit=False)
+
+    async def override():
+        async with primary_sessions() as session:
+            yield session
+
+    app.dependency_overrides[get_async_session] = override
+    yield primary_url, replica_url
+    app.dependency_overrides.pop(get_async_session, None)
+    await primary.dispose()
+    if db._read_engine is not None:
+        await db._read_engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_list_reads_use_replica(primary_and_replica):
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        resp = await ac.get("/api/applications")
+        assert [a["name"] for a in resp.json()] == ["replica app"]
+
+
+@pytest.mark.asyncio
+async def test_writes_use_primary_and_reads_stick_to_primary(primary_and_replica):
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        resp = await ac.post("/api/applications", json={"name": "new app", "host": "new.example.com"})
+        assert resp.status_code == 200
+        assert resp.cookies.get(db.READ_AFTER_WRITE_COOKIE) == "1"
+
+        # The client now carries the read-after-write cookie, so it reads its own write
+        resp = await ac.get("/api/applications")
+        assert [a["name"] for a in resp.json()] == ["new app", "primary app"]
+
+        # Clients without the cookie keep reading from the replica
+        ac.cookies.clear()
+        resp = await ac.get("/api/applications")
+        assert [a["name"] for a in resp.json()] == ["replica app"]
+
+
+@pytest.mark.asyncio
+async def test_reads_do_not_set_read_after_write_cookie(primary_and_replica):
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        resp = await ac.get("/api/applications")
+        assert db.READ_AFTER_WRITE_COOKIE not in resp.cookies
+
+
+@pytest.mark.asyncio
+async def test_authorize_reads_from_replica(primary_and_replica):
+    primary_url, replica_url = primary_and_replica
+    engine = create_async_engine(replica_url)
+    async with engine.begin() as conn:
+        await conn.execute(insert(User).values(user_id=1, email="reader@example.com"))
+        await conn.execute(insert(UserGroup).values(group_id=1, name="Readers", protected=0))
+        await conn.execute(insert(UrlGroup).values(group_id=1, name="Reports", protected=0, app_id=1))
+        await conn.execute(insert(Url).values(url_id=1, path="/reports", url_group_id=1))
+        await conn.execute(insert(user_group_members).values(user_group_id=1, user_id=1))
+        await conn.execute(insert(user_group_url_group_associations).values(user_group_id=1, url_group_id=1))
+    await engine.dispose()
+
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        resp = await ac.get(
+            "/api/authorize?url=https://replica.example.com/reports",
+            cookies={"x-auth-email": "reader@example.com"},
+        )
+        assert resp.status_code == 200
+        assert resp.json()["allowed"] is True
+
+
+@pytest.mark.asyncio
+async def test_dashboard_counts_read_own_writes_from_primary(primary_and_replica):
+    from app.policy import bump_policy_version
+    from app.stats import get_dashboard_counts, stats_cache
+
+    primary_url, replica_url = primary_and_replica
+    primary = create_async_engine(primary_url)
+    primary_sessions = async_sessionmaker(primary, expire_on_commit=False)
+    stats_cache.clear()
+    try:
+        async with primary_sessions() as session:
+            await session.execute(insert(Application).values(app_id=2, name="new app", host="new.example.com"))
+            await session.commit()
+        bump_policy_version()
+
+        # A client without the cookie caches the lagging replica's count under the new version
+        replica_session = db.LazySession(db.get_read_session_maker(), replica=True)
+        try:
+            assert (await get_dashboard_counts(replica_session))["app_count"] == 1
+        finally:
+            await replica_session.aclose()
+
+        # The writer reads from the primary and sees its own write
+        async with primary_sessions() as session:
+            assert (await get_dashboard_counts(session))["app_count"] == 2
+    finally:
+        stats_cache.clear()
+        await primary.dispose()
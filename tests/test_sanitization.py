@@ -1,7 +1,10 @@
+import logging
 import pytest
+import app.main  # noqa: F401 - configures the log pipeline
 from app.utils import (
     sanitize_email, sanitize_url, sanitize_database_url, 
-    sanitize_token, sanitize_environment_variables, sanitize_log_message
+    sanitize_token, sanitize_environment_variables, sanitize_log_message,
+    SanitizedLogger, MaskedEmail
 )
 
 
@@ -89,4 +92,53 @@ def test_sanitize_log_message_with_database_url():
     sanitized = sanitize_log_message(message)
     
     assert "user:***" in sanitized
-    assert "password" not in sanitized 
\ No newline at end of file
+    assert "password" not in sanitized 
+
+
+def test_sanitize_log_message_is_idempotent():
+    """The log pipeline's formatters sanitize records SanitizedLogger already sanitized."""
+    message = "User john@example.com (a@b.com) connected to mysql://user:secret@db/prod"
+    once = sanitize_log_message(message)
+    assert once == "User j**n@example.com (*@b.com) connected to mysql://user:***@db/prod"
+    assert sanitize_log_message(once) == once
+
+
+def test_sanitize_log_message_without_sensitive_characters_is_unchanged():
+    """Messages without '@', '://' or two dots skip the patterns entirely."""
+    message = "Found 3 URL groups for user group 7"
+    assert sanitize_log_message(message) is message
+
+
+class Exploding:
+    def __str__(self):
+        raise AssertionError("formatted a disabled log record")
+
+
+def test_sanitized_logger_skips_disabled_levels(caplog):
+    """Arguments of a disabled call are never formatted."""
+    logger = SanitizedLogger(logging.getLogger("test.sanitized.lazy"))
+    with caplog.at_level(logging.INFO, logger="test.sanitized.lazy"):
+        logger.debug("Looking up %s", Exploding())
+    assert caplog.records == []
+
+
+def test_sanitized_logger_sanitizes_lazy_arguments(caplog):
+    """%-style arguments are formatted and sanitized when the record is emitted."""
+    logger = SanitizedLogger(logging.getLogger("test.sanitized.args"))
+    with caplog.at_level(logging.DEBUG, logger="test.sanitized.args"):
+        logger.info("User %s connected to %s", "john@example.com", "mysql://user:secret@db/prod")
+        logger.debug("Looking up %s", MaskedEmail("root@localhost"))
+    first, second = caplog.records
+    assert first.getMessage() == "User j**n@example.com connected to mysql://user:***@db/prod"
+    assert second.getMessage() == "Looking up r**t@localhost"
+    # The record points at the caller, not at the wrapper
+    assert first.filename == "test_sanitization.py"
+
+
+
+def test_sanitized_logger_masks_for_handlers_outside_the_pipeline(caplog):
+    """Configuring the log pipeline does not hand raw messages to other handlers."""
+    logger = SanitizedLogger(logging.getLogger("test.sanitized.other"))
+    with caplog.at_level(logging.INFO, logger="test.sanitized.other"):
+        logger.info("Token for %s", "john@example.com")
+    assert caplog.records[0].getMessage() == "Token for j**n@example.com"
@@ -0,0 +1,137 @@
+import asyncio
+import pytest
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from app import crud
+from app.db import Base
+from app.models import Application, UrlGroup, Url
+from app.singleflight import SingleFlight
+
+
+@pytest.mark.asyncio
+async def test_concurrent_calls_share_one_evaluation():
+    """Concurrent calls with the same key run the function once and share the result."""
+    flight = SingleFlight()
+    calls = 0
+
+    async def evaluate():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return calls
+
+    results = await asyncio.gather(*[flight.do("key", evaluate) for _ in range(20)])
+    assert results == [1] * 20
+    assert calls == 1
+    assert flight.stats() == {"in_flight": 0, "started": 1, "coalesced": 19}
+
+
+@pytest.mark.asyncio
+async def test_different_keys_are_not_coalesced():
+    flight = SingleFlight()
+
+    async def evaluate(value):
+        await asyncio.sleep(0.01)
+        return value
+
+    results = await asyncio.gather(
+        flight.do("a", lambda: evaluate("a")),
+        flight.do("b", lambda: evaluate("b")),
+    )
+    assert results == ["a", "b"]
+    assert flight.started == 2
+
+
+@pytest.mark.asyncio
+async def test_nothing_is_cached_after_completion():
+    flight = SingleFlight()
+    calls = 0
+
+    async def evaluate():
+        nonlocal calls
+        calls += 1
+        return calls
+
+    assert await flight.do("key", evaluate) == 1
+    assert await flight.do("key", evaluate) == 2
+    assert len(flight) == 0
+
+
+@pytest.mark.asyncio
+async def test_exception_is_shared_by_all_waiters():
+    flight = SingleFlight()
+
+    async def evaluate():
+        await asyncio.sleep(0.01)
+        raise RuntimeError("database unavailable")
+
+    results = await asyncio.gather(
+        *[flight.do("key", evaluate) for _ in range(5)], return_exceptions=True
+    )
+    assert all(isinstance(r, RuntimeError) for r in results)
+    assert flight.started == 1
+
+
+@pytest.mark.asyncio
+async def test_waiter_restarts_when_owner_is_cancelled():
+    """If the caller that owns the evaluation goes away, waiters start a new one."""
+    flight = SingleFlight()
+    calls = 0
+
+    async def evaluate():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.05)
+        return calls
+
+    owner = asyncio.ensure_future(flight.do("key", evaluate))
+    await asyncio.sleep(0)
+    waiter = asyncio.ensure_future(flight.do("key", evaluate))
+    await asyncio.sleep(0)
+    owner.cancel()
+
+    assert await waiter == 2
+    with pytest.raises(asyncio.CancelledError):
+        await owner
+
+
+@pytest.mark.asyncio
+async def test_forget_where_detaches_matching_keys():
+    flight = SingleFlight()
+    release = asyncio.Event()
+
+    async def evaluate():
+        await release.wait()
+        return True
+
+    tasks = [
+        asyncio.ensure_future(flight.do(("alice@example.com", "", "/a"), evaluate)),
+        asyncio.ensure_future(flight.do(("bob@example.com", "", "/a"), evaluate)),
+    ]
+    await asyncio.sleep(0)
+    flight.forget_where(lambda key: key[0] == "alice@example.com")
+    assert len(flight) == 1
+
+    release.set()
+    assert await asyncio.gather(*tasks) == [True, True]
+
+
+@pytest.mark.asyncio
+async def test_coalesced_checks_do_not_use_the_callers_session():
+    """The shared evaluation has its own connection, so no request's session is borrowed."""
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.execute(insert(Application).values(app_id=1, name="App", host="app.example.com"))
+        await conn.execute(insert(UrlGroup).values(group_id=1, name="Everyone", protected=1, app_id=1))
+        await conn.execute(insert(Url).values(path="/home", url_group_id=1))
+    sessions = [AsyncSession(engine) for _ in range(5)]
+
+    results = await asyncio.gather(
+        *(crud.is_user_allowed_full_url(session, "dev@example.com", "https://app.example.com/home") for session in sessions)
+    )
+    assert results == [True] * 5
+    assert not any(session.in_transaction() for session in sessions)
+    for session in sessions:
+        await session.close()
+    await engine.dispose()
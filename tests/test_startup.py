@@ -0,0 +1,98 @@
+import asyncio
+import pytest
+from httpx import AsyncClient, ASGITransport
+from sqlalchemy import event, insert, select
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from app.main import app
+from app.db import prewarm_pool
+from app.models import UserGroup, UrlGroup
+from app import startup
+from app.startup import ensure_protected_groups, readiness, warm_up, WarmupTask
+
+
+@pytest.fixture(autouse=True)
+def reset_readiness():
+    readiness.reset()
+    yield
+    readiness.reset()
+
+
+@pytest.mark.asyncio
+async def test_protected_groups_seeded_then_one_query(engine):
+    async with engine.begin() as conn:
+        await conn.execute(insert(UrlGroup).values(name="Everyone", protected=0))
+    sessions = async_sessionmaker(engine, expire_on_commit=False)
+    async with sessions() as session:
+        assert await ensure_protected_groups(session) is True
+    async with sessions() as session:
+        users = (await session.execute(select(UserGroup.name, UserGroup.protected))).all()
+        urls = (await session.execute(select(UrlGroup.name, UrlGroup.protected).order_by(UrlGroup.name))).all()
+    assert users == [("Internal User Group", 1)]
+    assert urls == [("Authenticated", 1), ("Everyone", 1)]
+
+    statements = []
+    event.listen(engine.sync_engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+    async with sessions() as session:
+        assert await ensure_protected_groups(session) is False
+    assert len(statements) == 1
+
+
+@pytest.mark.asyncio
+async def test_workers_starting_together_create_protected_groups_once(engine, monkeypatch):
+    sessions = async_sessionmaker(engine, expire_on_commit=False)
+    # Both workers find the groups missing before either of them writes
+    both_read = asyncio.Barrier(2)
+    first_reads = []
+    read = startup._protected_groups
+
+    async def read_together(conn):
+        found = await read(conn)
+        if len(first_reads) < 2:
+            first_reads.append(found)
+            await both_read.wait()
+        return found
+
+    monkeypatch.setattr(startup, "_protected_groups", read_together)
+
+    async def start_worker():
+        async with sessions() as session:
+            return await ensure_protected_groups(session)
+
+    assert sorted(await asyncio.gather(start_worker(), start_worker())) == [False, True]
+    async with sessions() as session:
+        names = (await session.execute(select(UrlGroup.name).order_by(UrlGroup.name))).scalars().all()
+    assert names == ["Authenticated", "Everyone"]
+
+
+@pytest.mark.asyncio
+async def test_prewarm_pool_fills_pool(engine):
+    assert await prewarm_pool(engine, 3) == 3
+    assert engine.sync_engine.pool.checkedin() == 3
+
+
+@pytest.mark.asyncio
+async def test_readyz_waits_for_required_tasks():
+    attempts = []
+
+    async def flaky():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise ConnectionError("database not reachable")
+
+    async def broken():
+        raise RuntimeError("no JWKS")
+
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        assert (await ac.get("/healthz")).status_code == 200
+        resp = await ac.get("/readyz")
+        assert resp.status_code == 503
+        assert resp.json()["ready"] is False
+
+        await warm_up([WarmupTask("db", flaky), WarmupTask("jwks", broken, required=False)], retry_seconds=0)
+
+        resp = await ac.get("/readyz")
+    assert resp.status_code == 200
+    assert len(attempts) == 2
+    tasks = resp.json()["tasks"]
+    assert tasks["db"]["status"] == "ok"
+    assert tasks["jwks"]["status"] == "failed"
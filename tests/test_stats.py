@@ -0,0 +1,61 @@
+import pytest
+import pytest_asyncio
+from sqlalchemy import event, insert
+from app.models import Application, User, UserGroup, UrlGroup, user_group_members
+from app.stats import stats_cache
+
+
+@pytest_asyncio.fixture
+async def engine(engine):
+    async with engine.begin() as conn:
+        await conn.execute(insert(Application).values(app_id=1, name="Portal", host="portal.example.com"))
+        await conn.execute(insert(UrlGroup).values(group_id=1, name="Portal pages", protected=0, app_id=1))
+        for i in range(3):
+            await conn.execute(insert(UserGroup).values(group_id=i + 1, name=f"Group {i}", protected=0))
+            await conn.execute(insert(User).values(user_id=i + 1, email=f"user{i}@example.com"))
+            await conn.execute(insert(user_group_members).values(user_group_id=1, user_id=i + 1))
+    stats_cache.clear()
+    return engine
+
+
+@pytest.fixture
+def statements(engine):
+    """SQL text of every statement run on the test database."""
+    statements = []
+    event.listen(engine.sync_engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+    return statements
+
+
+@pytest.mark.asyncio
+async def test_dashboard_counts_are_cached_until_a_write(client, statements):
+    resp = await client.get("/")
+    assert resp.status_code == 200
+    assert len([s for s in statements if "COUNT" in s.upper()]) == 1
+
+    statements.clear()
+    await client.get("/")
+    assert statements == []
+
+    resp = await client.post("/api/user-groups", json={"name": "Support"})
+    assert resp.status_code == 200
+    statements.clear()
+    resp = await client.get("/")
+    assert len([s for s in statements if "COUNT" in s.upper()]) == 1
+    assert stats_cache.stats()["entries"] == 1
+
+
+@pytest.mark.asyncio
+async def test_user_group_list_counts_members_in_one_query(client, statements):
+    resp = await client.get("/user-groups")
+    assert resp.status_code == 200
+    assert len([s for s in statements if "count(" in s.lower()]) == 1
+    resp = await client.get("/api/metrics")
+    assert resp.json()["stats_cache"]["misses"] >= 1
+
+
+@pytest.mark.asyncio
+async def test_application_url_group_counts(session_maker):
+    from app import crud
+    async with session_maker() as session:
+        applications = await crud.get_all_applications_with_url_groups_count(session)
+    assert [(a.name, a.url_groups_count) for a in applications] == [("Portal", 1)]
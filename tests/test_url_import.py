@@ -0,0 +1,75 @@
+import pytest
+import pytest_asyncio
+from sqlalchemy import insert, select
+from app.models import Application, UrlGroup, Url
+
+OPENAPI = {
+    "openapi": "3.0.0",
+    "paths": {
+        "/health": {"get": {"tags": ["public"]}},
+        "/admin/users": {"get": {"tags": ["admin"]}, "post": {"tags": ["admin", "users"]}},
+        "/reports": {"get": {"tags": ["reports"]}},
+        "/users/{user_id}": {"get": {"tags": ["users"]}},
+        "/misc": {"get": {}},
+    },
+}
+
+
+@pytest_asyncio.fixture
+async def engine(engine):
+    async with engine.begin() as conn:
+        await conn.execute(insert(Application).values(app_id=1, name="App", host="app.example.com"))
+        await conn.execute(insert(UrlGroup).values(group_id=1, name="Everyone", protected=1, app_id=1))
+        await conn.execute(insert(UrlGroup).values(group_id=2, name="Admin", protected=0, app_id=1))
+        await conn.execute(insert(UrlGroup).values(group_id=3, name="Reports", protected=0, app_id=1))
+        await conn.execute(insert(Url).values(path="/reports", url_group_id=3))
+    return engine
+
+
+async def urls_by_group(sessions):
+    async with sessions() as session:
+        rows = (await session.execute(select(Url.url_group_id, Url.path).order_by(Url.url_group_id, Url.path))).all()
+    return [tuple(row) for row in rows]
+
+
+@pytest.mark.asyncio
+async def test_openapi_import_assigns_by_tag(client, session_maker):
+    resp = await client.post(
+        "/api/applications/1/urls/import",
+        params=[("rule", "tag:public=Everyone"), ("rule", "tag:admin=Admin"), ("rule", "tag:reports=Reports")],
+        json=OPENAPI,
+    )
+    assert resp.status_code == 200
+    report = resp.json()
+    assert report["paths"] == 5
+    assert report["urls_created"] == 2  # /reports already exists
+    assert report["unassigned"] == 1  # /misc
+    assert [(e["path"], e["error"]) for e in report["errors"]] == [("/users/{user_id}", "path templates are not supported")]
+    assert await urls_by_group(session_maker) == [(1, "/health"), (2, "/admin/users"), (3, "/reports")]
+
+
+@pytest.mark.asyncio
+async def test_path_list_import_assigns_by_prefix(client, session_maker):
+    body = "# exported routes\n/admin/a\n/admin/b\n/public/x\nnot-a-path\n/admin/a\n"
+    resp = await client.post(
+        "/api/applications/1/urls/import",
+        params=[("rule", "prefix:/admin/=Admin"), ("default_group", "Everyone")],
+        content=body,
+        headers={"content-type": "text/plain"},
+    )
+    report = resp.json()
+    assert report["urls_created"] == 3
+    assert report["errors"] == [{"line": 5, "path": "not-a-path", "error": "path must start with '/' and be at most 255 characters"}]
+    assert await urls_by_group(session_maker) == [(1, "/public/x"), (2, "/admin/a"), (2, "/admin/b"), (3, "/reports")]
+
+
+@pytest.mark.asyncio
+async def test_import_rejects_unknown_groups_and_bad_rules(client, session_maker):
+    resp = await client.post("/api/applications/1/urls/import", params={"rule": "prefix:/x=Nope"}, content="/x\n")
+    assert resp.status_code == 400
+    assert "Nope" in resp.json()["detail"]
+    resp = await client.post("/api/applications/1/urls/import", params={"rule": "glob:*=Admin"}, content="/x\n")
+    assert resp.status_code == 400
+    resp = await client.post("/api/applications/99/urls/import", params={"default_group": "Admin"}, content="/x\n")
+    assert resp.status_code == 404
+    assert await urls_by_group(session_maker) == [(3, "/reports")]